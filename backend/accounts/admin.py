@@ -11,7 +11,10 @@ from .models import (
     Payment,
     TaxEstimation,
     Setting,
-    AuditLog
+    AuditLog,
+    AuditArchiveSegment,
+    MonthlySummary,
+    MonthlyExpenseCategory
 )
 
 # 1.  CustomUser  Admin 
@@ -33,10 +36,41 @@ admin.site.register(CustomUser, CustomUserAdmin) #  CustomUserAdmin
 # 3. （）
 admin.site.register(Client)
 admin.site.register(Invoice)
-admin.site.register(InvoiceItem)
 admin.site.register(TimeEntry)
 admin.site.register(Expense)
-admin.site.register(Payment)
-admin.site.register(TaxEstimation)
-admin.site.register(Setting)
-admin.site.register(AuditLog)
\ No newline at end of file
+
+
+# __str__ dereferences a related row; join it into the changelist query instead of one query per row
+class InvoiceItemAdmin(admin.ModelAdmin):
+    list_select_related = ('invoice',)
+
+
+class PaymentAdmin(admin.ModelAdmin):
+    list_select_related = ('invoice',)
+
+
+class UserOwnedSingletonAdmin(admin.ModelAdmin): # TaxEstimation / Setting
+    list_select_related = ('user',)
+
+
+admin.site.register(InvoiceItem, InvoiceItemAdmin)
+admin.site.register(Payment, PaymentAdmin)
+admin.site.register(TaxEstimation, UserOwnedSingletonAdmin)
+admin.site.register(Setting, UserOwnedSingletonAdmin)
+admin.site.register(AuditLog)
+
+
+class AuditArchiveSegmentAdmin(admin.ModelAdmin): # archive segments are written only by `manage.py audit_retention`
+    list_display = ('path', 'month', 'row_count', 'size_bytes', 'created_at')
+    list_filter = ('month',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(AuditArchiveSegment, AuditArchiveSegmentAdmin)
+admin.site.register(MonthlySummary)
+admin.site.register(MonthlyExpenseCategory)
\ No newline at end of file
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from . import routers  # noqa: F401  registers the PIN_CACHE system check
+        from . import signals  # noqa: F401  connects the model signal receivers
@@ -0,0 +1,130 @@
+# PayAsYouGo/backend/accounts/async_views.py
+#
+# Native async variants of the read-heavy endpoints, routed under /api/async/.
+#
+# Under ASGI every DRF view runs in the sync thread pool.  These views are plain
+# Django ``async def`` views instead: authentication (authentication.aauthenticate),
+# ETag counters, pagination and data loading use the async cache and ORM APIs, so a
+# request only leaves the event loop while the ORM itself talks to the database.
+# Filtering, querysets and serializers are reused from the sync DRF views, so the
+# responses are identical; building querysets and serializing prefetched rows does
+# not touch the database.
+
+from django.db.models import Sum
+from django.http import HttpResponse, HttpResponseNotModified
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from . import singletons, versions
+from .authentication import aauthenticate
+from .conditional import make_etag, not_modified, set_validators
+from .models import MonthlySummary
+from .renderers import FastJSONRenderer
+from .serializers import MonthlySummarySerializer, TaxEstimationSerializer
+from .views import (
+    ClientListCreateView,
+    ExpenseListCreateView,
+    InvoiceListCreateView,
+    SummaryView,
+    TimeEntryListCreateView,
+)
+
+
+def json_response(data, status=200):
+    # same bytes as the JSON responses of the DRF views
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+class AsyncAPIView(View):
+    """Authenticate, then hand a DRF ``Request`` to ``aget``; API errors become DRF-style JSON."""
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            user = await aauthenticate(request)
+            if user is None:
+                raise exceptions.NotAuthenticated()
+            request = Request(request)
+            request.user = user
+            return await self.aget(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return json_response(detail, status=exc.status_code)
+
+    async def aget(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+
+class AsyncListView(AsyncAPIView):
+    """Keyset-paginated list of ``view_class`` (a sync ListCreateAPIView) with list ETags."""
+    view_class = None
+
+    async def aget(self, request, *args, **kwargs):
+        view = self.view_class(request=request, args=args, kwargs=kwargs, format_kwarg=None)
+        queryset = view.get_queryset()
+
+        resources = [view.queryset.model.__name__, *view.etag_resources]
+        counters = await versions.acurrent(request.user.pk, resources)
+        etag = make_etag(request, *(f'{name}:{counters[name][0]}' for name in sorted(counters)))
+        last_modified = max(stamp for _, stamp in counters.values())
+        if not_modified(request, etag, last_modified):
+            return set_validators(HttpResponseNotModified(), etag, last_modified)
+
+        paginator = view.paginator
+        represent = view.get_fast_representation(queryset) # values() rows, see fieldsets.py
+        if represent is not None:
+            rows = await paginator.apaginate_queryset(queryset.values(*represent.columns), request, view=view)
+            results = [represent(row) for row in rows]
+        else:
+            rows = await paginator.apaginate_queryset(queryset, request, view=view)
+            results = view.get_serializer(rows, many=True).data
+        data = paginator.get_paginated_response(results).data
+        return set_validators(json_response(data), etag, last_modified)
+
+
+class AsyncClientListView(AsyncListView):
+    view_class = ClientListCreateView
+
+
+class AsyncInvoiceListView(AsyncListView):
+    view_class = InvoiceListCreateView
+
+
+class AsyncTimeEntryListView(AsyncListView):
+    view_class = TimeEntryListCreateView
+
+
+class AsyncExpenseListView(AsyncListView):
+    view_class = ExpenseListCreateView
+
+
+class AsyncTaxEstimationView(AsyncAPIView):
+    async def aget(self, request, *args, **kwargs):
+        tax_estimation = await singletons.aget_tax_estimation(request.user.pk)
+        if tax_estimation is None:
+            return json_response({'detail': 'Tax estimation settings not found. Please create one.', 'code': 'NOT_SET'}, status=404)
+        etag = make_etag(request, tax_estimation.updated_at.isoformat())
+        if not_modified(request, etag, tax_estimation.updated_at):
+            return set_validators(HttpResponseNotModified(), etag, tax_estimation.updated_at)
+        return set_validators(json_response(TaxEstimationSerializer(tax_estimation).data), etag, tax_estimation.updated_at)
+
+
+class AsyncSummaryView(AsyncAPIView):
+    """Async /api/summary/: same buckets and totals as views.SummaryView."""
+
+    async def aget(self, request, *args, **kwargs):
+        try:
+            start = SummaryView._parse_month(request.query_params.get('from'))
+            end = SummaryView._parse_month(request.query_params.get('to'))
+        except ValueError:
+            return json_response({'detail': "'from' and 'to' must be formatted as YYYY-MM."}, status=400)
+
+        buckets = MonthlySummary.objects.filter(user_id=request.user.pk)
+        lifetime = await buckets.aaggregate(invoiced=Sum('invoiced_amount'), received=Sum('payments_received'))
+        if start:
+            buckets = buckets.filter(month__gte=start)
+        if end:
+            buckets = buckets.filter(month__lte=end)
+        months = MonthlySummarySerializer([row async for row in buckets.order_by('month')], many=True).data
+
+        return json_response(SummaryView.summarize(lifetime, months))
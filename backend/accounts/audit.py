@@ -0,0 +1,186 @@
+# PayAsYouGo/backend/accounts/audit.py
+#
+# Asynchronous, batched AuditLog writer.
+#
+# Request threads only build an unsaved AuditLog and put it on a bounded
+# in-process queue (microseconds, no DB round trip).  A daemon thread drains the
+# queue and writes with bulk_create whenever BATCH_SIZE records are waiting or
+# FLUSH_INTERVAL_MS has passed.  When the queue is full new records are dropped
+# and counted rather than slowing requests down; the queue is flushed at exit.
+#
+# Records are captured by AuditLogMiddleware (see middleware.py) and the model
+# signal receivers in signals.py while a mutating /api/ request is in progress.
+
+import atexit
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ASYNC': True, # False writes each record synchronously (tests, management shells)
+    'QUEUE_SIZE': 10000, # records buffered before new ones are dropped
+    'BATCH_SIZE': 500, # flush as soon as this many records are waiting ...
+    'FLUSH_INTERVAL_MS': 200, # ... or this long after the first one arrived
+    'PATH_PREFIX': '/api/', # requests whose mutations are audited
+    'TRUST_X_FORWARDED_FOR': False, # take ip_address from X-Forwarded-For (behind a trusted proxy)
+}
+
+
+def audit_settings():
+    return {**DEFAULTS, **getattr(settings, 'AUDIT_LOG', {})}
+
+
+# The Django request whose mutations are being captured (set by AuditLogMiddleware).
+current_request = contextvars.ContextVar('audit_current_request', default=None)
+
+
+class AuditWriter:
+    """Bounded queue + background flusher. ``stats()`` exposes the counters."""
+
+    def __init__(self, queue_size, batch_size, flush_interval_ms, asynchronous=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.asynchronous = asynchronous
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock() # guards starting the flusher thread
+        self._counters_lock = threading.Lock() # request threads, the flusher and flush() all update the counters
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+
+    def submit(self, record):
+        """Queue one unsaved AuditLog; never blocks the caller."""
+        asynchronous = self.asynchronous if self.asynchronous is not None else audit_settings()['ASYNC']
+        if not asynchronous:
+            self._write([record])
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._count('dropped')
+            return
+        self._count('enqueued')
+
+    def flush(self):
+        """Write everything queued so far from the calling thread."""
+        batch = self._drain(block=False)
+        while batch:
+            self._write(batch)
+            batch = self._drain(block=False)
+
+    def shutdown(self, timeout=5):
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self._counters_lock:
+            return {
+                'queued': self._queue.qsize(),
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'flushes': self.flushes,
+            }
+
+    def _count(self, name, amount=1):
+        # `+=` on an attribute is a read-modify-write, not atomic across threads
+        with self._counters_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _ensure_thread(self):
+        # (Re)start the flusher lazily, and again in a child after a fork (e.g. gunicorn --preload).
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                close_old_connections()
+                self._write(batch)
+        close_old_connections()
+
+    def _drain(self, block):
+        """Collect up to batch_size records, waiting at most flush_interval after the first."""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval) if block else self._queue.get_nowait())
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if block and remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            AuditLog.objects.bulk_create(batch, batch_size=self.batch_size)
+        except Exception:
+            self._count('failed', len(batch))
+            logger.exception('Could not write %d audit log records', len(batch))
+            return
+        with self._counters_lock:
+            self.written += len(batch)
+            self.flushes += 1
+
+
+_config = audit_settings()
+writer = AuditWriter(
+    queue_size=_config['QUEUE_SIZE'],
+    batch_size=_config['BATCH_SIZE'],
+    flush_interval_ms=_config['FLUSH_INTERVAL_MS'],
+) # ASYNC is read per record so tests can switch it with override_settings
+atexit.register(writer.shutdown)
+
+
+def client_ip(request):
+    if audit_settings()['TRUST_X_FORWARDED_FOR']:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+        if forwarded:
+            return forwarded.split(',')[0].strip()[:45]
+    return (request.META.get('REMOTE_ADDR') or '')[:45] or None
+
+
+def record(request, action, entity_type=None, entity_id=None):
+    """Queue an audit record for ``request``'s user and address."""
+    user = getattr(request, 'user', None)
+    writer.submit(AuditLog(
+        user_id=user.pk if user is not None and user.is_authenticated else None,
+        action=action[:255],
+        entity_type=entity_type,
+        entity_id=entity_id,
+        ip_address=client_ip(request),
+    ))
+    request._audit_recorded = True
@@ -0,0 +1,283 @@
+# PayAsYouGo/backend/accounts/audit_archive.py
+#
+# Two-tier, month-partitioned audit store.
+#
+#   hot tier      the AuditLogs table, holding the last AUDIT_ARCHIVE['HOT_MONTHS'] months;
+#   archive tier  append-only segment files under AUDIT_ARCHIVE['ROOT'], one directory per
+#                 month, each holding up to SEGMENT_ROWS rows as gzip-compressed NDJSON.
+#
+# Inside a segment the rows are grouped by user and every user's rows form their own
+# gzip member, so the per-segment index (AuditArchiveIndex: user, time range, byte
+# offset and length) lets a per-user query decompress only that user's bytes.
+# Segment files are written once and never modified; a segment is registered and its
+# rows removed from the hot table in the same transaction, so a row is always visible
+# in exactly one tier.  ArchiveQuery reads the archive lazily, newest first, and
+# merge_tiers() combines it with a page of hot rows for the keyset-paginated views.
+
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+import os
+from datetime import datetime
+from itertools import groupby, islice
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditArchiveIndex, AuditArchiveSegment, AuditLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ROOT': os.path.join(settings.BASE_DIR, 'audit_archive'),
+    'HOT_MONTHS': 3, # current month plus the previous HOT_MONTHS - 1 stay in the table
+    'RETENTION_MONTHS': 84, # older months are deleted from both tiers
+    'SEGMENT_ROWS': 20000, # rows per segment file, also the hot-table delete chunk
+}
+
+ROW_FIELDS = ('id', 'user_id', 'action', 'entity_type', 'entity_id', 'timestamp', 'ip_address')
+
+ANY_USER = object()
+
+
+def archive_settings():
+    return {**DEFAULTS, **getattr(settings, 'AUDIT_ARCHIVE', {})}
+
+
+def month_start(year, month):
+    """Aware datetime at the start of ``year``-``month`` in the current time zone."""
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return timezone.make_aware(datetime(year, month, 1))
+
+
+def months_ago(months, now=None):
+    """Start of the month ``months`` before the current one."""
+    now = timezone.localtime(now)
+    return month_start(now.year, now.month - months)
+
+
+def rank(row, reverse=False):
+    """Sort key for keyset order: newest first, or oldest first when walking backwards."""
+    ts = row.timestamp.timestamp()
+    return (ts, row.id) if reverse else (-ts, -row.id)
+
+
+# --- writing ---------------------------------------------------------------
+
+def _encode(row):
+    return json.dumps({
+        'id': row['id'], 'user_id': row['user_id'], 'action': row['action'],
+        'entity_type': row['entity_type'], 'entity_id': row['entity_id'],
+        'timestamp': row['timestamp'].isoformat(), 'ip_address': row['ip_address'],
+    }, separators=(',', ':')) + '\n'
+
+
+def write_segment(rows, month):
+    """
+    Write ``rows`` (AuditLog values() dicts of one month) to a new segment file and
+    return the unsaved AuditArchiveSegment plus its AuditArchiveIndex entries.
+    """
+    root = Path(archive_settings()['ROOT'])
+    rows = sorted(rows, key=lambda row: (row['user_id'] is not None, row['user_id'] or 0, row['timestamp'], row['id']))
+    first = min(rows, key=lambda row: (row['timestamp'], row['id']))
+    relative = f"{month:%Y-%m}/{first['timestamp']:%Y%m%dT%H%M%S}-{first['id']}.ndjson.gz"
+    target = root / relative
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    digest = hashlib.sha256()
+    entries = []
+    offset = 0
+    temporary = target.with_name(target.name + '.tmp')
+    with open(temporary, 'wb') as handle:
+        for user_id, user_rows in groupby(rows, key=lambda row: row['user_id']):
+            user_rows = list(user_rows)
+            member = gzip.compress(''.join(_encode(row) for row in user_rows).encode('utf-8'), mtime=0)
+            handle.write(member)
+            digest.update(member)
+            entries.append(AuditArchiveIndex(
+                user_id=user_id, row_count=len(user_rows),
+                min_timestamp=user_rows[0]['timestamp'],
+                max_timestamp=max(row['timestamp'] for row in user_rows),
+                offset=offset, length=len(member),
+            ))
+            offset += len(member)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, target)
+
+    segment = AuditArchiveSegment(
+        month=month, path=relative, row_count=len(rows),
+        min_timestamp=first['timestamp'], max_timestamp=max(row['timestamp'] for row in rows),
+        size_bytes=offset, sha256=digest.hexdigest(),
+    )
+    return segment, entries
+
+
+def archive_chunk(start, end, limit):
+    """
+    Move up to ``limit`` of the oldest hot rows in ``[start, end)`` into one new
+    segment.  Returns the number of rows moved (0 when the range is empty).
+    """
+    rows = list(
+        AuditLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        .order_by('timestamp', 'id').values(*ROW_FIELDS)[:limit]
+    )
+    if not rows:
+        return 0
+    local = timezone.localtime(start)
+    segment, entries = write_segment(rows, local.date().replace(day=1))
+    # The file is durable before the rows go; a crash before commit only leaves an unreferenced file.
+    with transaction.atomic():
+        segment.save()
+        for entry in entries:
+            entry.segment = segment
+        AuditArchiveIndex.objects.bulk_create(entries)
+        AuditLog.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def delete_segment(segment):
+    root = Path(archive_settings()['ROOT'])
+    segment.delete()
+    try:
+        os.remove(root / segment.path)
+    except FileNotFoundError:
+        pass
+
+
+# --- reading ---------------------------------------------------------------
+
+def _decode(line):
+    data = json.loads(line)
+    data['timestamp'] = parse_datetime(data['timestamp'])
+    return AuditLog(**data)
+
+
+def _read(segment_path, offset=None, length=None):
+    path = Path(archive_settings()['ROOT']) / segment_path
+    try:
+        with open(path, 'rb') as handle:
+            if offset is not None:
+                handle.seek(offset)
+                data = handle.read(length)
+            else:
+                data = handle.read()
+    except FileNotFoundError: # removed by retention while we were reading
+        logger.warning('Audit archive segment %s is missing', segment_path)
+        return []
+    return [_decode(line) for line in gzip.decompress(data).decode('utf-8').splitlines() if line]
+
+
+class ArchiveQuery:
+    """
+    Archived AuditLog rows matching a time-bounded query, as unsaved AuditLog
+    instances in keyset order (newest first, or oldest first with ``reverse``).
+
+    ``cursor`` is a KeysetPagination cursor ``{'t': timestamp, 'i': id}``; only
+    rows strictly past it are returned.  ``filters`` match AuditLog attributes
+    exactly (action, entity_type, entity_id).
+    """
+
+    def __init__(self, user_id=ANY_USER, since=None, until=None, cursor=None, reverse=False, **filters):
+        self.user_id = user_id
+        self.since = since
+        self.until = until
+        self.cursor = cursor
+        self.reverse = reverse
+        self.filters = filters
+        self._units = None
+
+    def units(self):
+        """Readable pieces overlapping the query: ``(path, offset, length, min_ts, max_ts)``."""
+        if self._units is not None:
+            return self._units
+        if self.user_id is ANY_USER:
+            queryset = AuditArchiveSegment.objects.all()
+        else:
+            queryset = AuditArchiveIndex.objects.filter(user_id=self.user_id)
+        lower, upper = self.since, self.until
+        if self.cursor is not None:
+            if self.reverse:
+                lower = max(lower, self.cursor['t']) if lower else self.cursor['t']
+            else:
+                upper = min(upper, self.cursor['t']) if upper else self.cursor['t']
+        if lower is not None:
+            queryset = queryset.filter(max_timestamp__gte=lower)
+        if upper is not None:
+            queryset = queryset.filter(min_timestamp__lte=upper)
+
+        if self.user_id is ANY_USER:
+            units = [(path, None, None, low, high) for path, low, high
+                     in queryset.values_list('path', 'min_timestamp', 'max_timestamp')]
+        else:
+            units = list(queryset.values_list('segment__path', 'offset', 'length', 'min_timestamp', 'max_timestamp'))
+        # Order by the first row each unit could yield, so they can be opened lazily.
+        units.sort(key=lambda unit: unit[3] if self.reverse else unit[4], reverse=not self.reverse)
+        self._units = units
+        return units
+
+    def bound(self, unit):
+        """rank() of the best row ``unit`` could contain."""
+        ts = (unit[3] if self.reverse else unit[4]).timestamp()
+        return (ts, float('-inf')) if self.reverse else (-ts, float('-inf'))
+
+    def matches(self, row):
+        if self.since is not None and row.timestamp < self.since:
+            return False
+        if self.until is not None and row.timestamp > self.until:
+            return False
+        if self.user_id is not ANY_USER and row.user_id != self.user_id:
+            return False
+        if self.cursor is not None:
+            boundary = (self.cursor['t'].timestamp(), self.cursor['i'])
+            position = (row.timestamp.timestamp(), row.id)
+            if (position <= boundary) if self.reverse else (position >= boundary):
+                return False
+        return all(getattr(row, name) == value for name, value in self.filters.items())
+
+    def _open(self, unit):
+        rows = [row for row in _read(unit[0], unit[1], unit[2]) if self.matches(row)]
+        rows.sort(key=lambda row: rank(row, self.reverse))
+        return iter(rows)
+
+    def __iter__(self):
+        # Lazy k-way merge: a unit is only read once its best possible row could be next.
+        pending = list(self.units())
+        heap = []
+        counter = 0
+        while heap or pending:
+            while pending and (not heap or self.bound(pending[0]) <= heap[0][0]):
+                rows = self._open(pending.pop(0))
+                row = next(rows, None)
+                if row is not None:
+                    heapq.heappush(heap, (rank(row, self.reverse), counter, row, rows))
+                    counter += 1
+            if not heap:
+                continue
+            _, _, row, rows = heapq.heappop(heap)
+            yield row
+            following = next(rows, None)
+            if following is not None:
+                heapq.heappush(heap, (rank(following, self.reverse), counter, following, rows))
+                counter += 1
+
+
+def merge_tiers(hot_rows, archive, limit):
+    """
+    First ``limit`` rows of ``hot_rows`` (already in keyset order) merged with
+    ``archive``.  The archive is not read at all when the hot page is full and
+    every archived candidate sorts after it.
+    """
+    units = archive.units()
+    if not units:
+        return hot_rows[:limit]
+    if len(hot_rows) >= limit and archive.bound(units[0]) > rank(hot_rows[limit - 1], archive.reverse):
+        return hot_rows[:limit]
+    merged = heapq.merge(hot_rows, archive, key=lambda row: rank(row, archive.reverse))
+    return list(islice(merged, limit))
+
@@ -0,0 +1,273 @@
+# PayAsYouGo/backend/accounts/authentication.py
+#
+# Drop-in replacement for rest_framework.authentication.TokenAuthentication that
+# caches token -> user resolution, so most API calls skip the Token JOIN Users query.
+#
+# Two tiers:
+#   1. a process-local LRU with a TTL (always on);
+#   2. optionally a shared Django cache (settings.TOKEN_AUTH_CACHE['SHARED_CACHE'],
+#      e.g. a Redis/Memcached alias) so a worker that misses locally can still avoid the DB.
+# Deleting or regenerating a token and saving a user (deactivation, password change ...)
+# invalidate the token through the receivers in signals.py, now and again on commit.
+# With a shared tier every token has a generation kept there, which invalidation
+# replaces, so every worker stops accepting local or shared copies at once (a hit
+# costs one cache round trip instead of a query).  Without one, other processes
+# cannot be told: their local entries live only LOCAL_ONLY_TTL seconds, which
+# bounds how long a revoked token or a deactivated user still authenticates there.
+# The shared tier holds only SHARED_USER_FIELDS and the token's creation time, never
+# the password hash or profile; users rebuilt from it load any other field on access.
+
+import copy
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import DEFERRED
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+DEFAULTS = {
+    'TTL': 60, # seconds an entry stays valid in the process-local tier
+    'LOCAL_ONLY_TTL': 5, # ... when there is no shared tier to check it against
+    'MAX_SIZE': 10000, # tokens kept in the process-local tier
+    'SHARED_CACHE': None, # name of a CACHES alias for the shared tier, None to disable
+    'SHARED_TTL': 300,
+}
+
+# what authentication and the is_staff / is_superuser permission checks read
+SHARED_USER_FIELDS = ('id', 'is_active', 'is_staff', 'is_superuser')
+
+
+def cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+
+
+class TokenCache:
+    """Thread-safe LRU of token key -> (user, token) with per-entry expiry."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # key -> (expires_at, generation, user, token)
+        self._keys_by_user = {} # user_id -> token key, for invalidate_user() and login
+        self._lock = threading.Lock()
+
+    def get(self, key, generation=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic() or entry[1] != generation:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2], entry[3]
+
+    def set(self, key, user, token, generation=None, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), generation, user, token)
+            self._entries.move_to_end(key)
+            self._keys_by_user[user.pk] = key
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def key_for_user(self, user_id):
+        with self._lock:
+            return self._keys_by_user.get(user_id)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            key = self._keys_by_user.get(user_id)
+            if key is not None:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and self._keys_by_user.get(entry[2].pk) == key:
+            del self._keys_by_user[entry[2].pk]
+
+
+_config = cache_settings()
+token_cache = TokenCache(max_size=_config['MAX_SIZE'], ttl=_config['TTL'])
+
+
+def _shared_cache():
+    alias = cache_settings()['SHARED_CACHE']
+    return caches[alias] if alias else None
+
+
+def _shared_key(key):
+    # never put raw tokens into cache key names
+    return 'authtoken:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _generation_key(key):
+    return 'authtoken-generation:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _shared_entry(generation, user, token):
+    return (generation, tuple(getattr(user, name) for name in SHARED_USER_FIELDS), token.created)
+
+
+def _from_shared(key, stored):
+    """The (user, token) of a shared entry, with every other user field deferred."""
+    _, values, created = stored
+    found = dict(zip(SHARED_USER_FIELDS, values))
+    User = get_user_model()
+    user = User.from_db(None, [f.attname for f in User._meta.concrete_fields],
+                        [found.get(f.attname, DEFERRED) for f in User._meta.concrete_fields])
+    token = Token.from_db(None, ['key', 'user_id', 'created'], [key, user.pk, created])
+    token.user = user
+    return user, token
+
+
+def _local_ttl(shared):
+    config = cache_settings()
+    return config['TTL'] if shared is not None else min(config['TTL'], config['LOCAL_ONLY_TTL'])
+
+
+def _lookup(shared, key):
+    """(generation, cached (user, token) or None) for ``key`` from the local and shared tiers."""
+    if shared is None:
+        return None, token_cache.get(key)
+    generation_key, row_key = _generation_key(key), _shared_key(key)
+    found = shared.get_many([generation_key, row_key])
+    generation = found.get(generation_key)
+    if generation is None:
+        # expired or evicted: start a new one, and use whichever token won if processes race
+        shared.add(generation_key, uuid.uuid4().hex, cache_settings()['SHARED_TTL'])
+        generation = shared.get(generation_key)
+    cached = token_cache.get(key, generation)
+    stored = found.get(row_key)
+    if cached is None and stored is not None and stored[0] == generation:
+        cached = _from_shared(key, stored)
+        token_cache.set(key, *cached, generation)
+    return generation, cached
+
+
+async def _alookup(shared, key):
+    if shared is None:
+        return None, token_cache.get(key)
+    generation_key, row_key = _generation_key(key), _shared_key(key)
+    found = await shared.aget_many([generation_key, row_key])
+    generation = found.get(generation_key)
+    if generation is None:
+        await shared.aadd(generation_key, uuid.uuid4().hex, cache_settings()['SHARED_TTL'])
+        generation = await shared.aget(generation_key)
+    cached = token_cache.get(key, generation)
+    stored = found.get(row_key)
+    if cached is None and stored is not None and stored[0] == generation:
+        cached = _from_shared(key, stored)
+        token_cache.set(key, *cached, generation)
+    return generation, cached
+
+
+def _drop_token(key):
+    token_cache.invalidate(key)
+    shared = _shared_cache()
+    if shared is not None:
+        # a new generation invalidates every process's local copy, not just this one's
+        shared.set(_generation_key(key), uuid.uuid4().hex, cache_settings()['SHARED_TTL'])
+        shared.delete(_shared_key(key))
+
+
+def invalidate_token(key):
+    _drop_token(key)
+    # a request between the write and the commit may have cached the old row again
+    transaction.on_commit(lambda: _drop_token(key))
+
+
+def invalidate_user(user_id):
+    key = token_cache.key_for_user(user_id)
+    token_cache.invalidate_user(user_id)
+    if key is None and _shared_cache() is not None:
+        key = Token.objects.filter(user_id=user_id).values_list('key', flat=True).first()
+    if key is not None:
+        invalidate_token(key)
+
+
+def get_token_for_user(user):
+    """The user's token key, creating the token only if the user has none (login path)."""
+    key = token_cache.key_for_user(user.pk)
+    if key is not None:
+        return key
+    key = Token.objects.filter(user=user).values_list('key', flat=True).first()
+    if key is None:
+        key = Token.objects.create(user=user).key
+    return key
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    ``Authorization: Token <key>`` with the lookup served from cache when possible.
+
+    Each request gets its own copy of the cached user, so per-request attributes
+    set on ``request.user`` never leak between requests.
+    """
+
+    def authenticate_credentials(self, key):
+        shared = _shared_cache()
+        generation, cached = _lookup(shared, key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key) # raises for unknown / inactive
+            token_cache.set(key, user, token, generation, _local_ttl(shared))
+            if shared is not None:
+                shared.set(_shared_key(key), _shared_entry(generation, user, token), cache_settings()['SHARED_TTL'])
+            cached = (user, token)
+
+        user, token = cached
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return copy.copy(user), token
+
+
+async def aauthenticate(request):
+    """
+    Resolve the user of a Django request inside an async view, without a thread hop
+    on cache hits: ``Authorization: Token <key>`` first (same cache as above, then
+    the async ORM), otherwise the session.  Returns None when not authenticated;
+    raises AuthenticationFailed for a bad or inactive token, like the DRF class.
+    """
+    auth = request.headers.get('Authorization', '').split()
+    if auth and auth[0].lower() == CachedTokenAuthentication.keyword.lower():
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        key = auth[1]
+        shared = _shared_cache()
+        generation, cached = await _alookup(shared, key)
+        if cached is None:
+            try:
+                token = await Token.objects.select_related('user').aget(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            cached = (token.user, token)
+            if token.user.is_active:
+                token_cache.set(key, *cached, generation, _local_ttl(shared))
+                if shared is not None:
+                    await shared.aset(_shared_key(key), _shared_entry(generation, *cached), cache_settings()['SHARED_TTL'])
+        user = cached[0]
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return copy.copy(user)
+
+    user = await request.auser()
+    return user if user.is_authenticated else None
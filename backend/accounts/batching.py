@@ -0,0 +1,37 @@
+# PayAsYouGo/backend/accounts/batching.py
+#
+# Helpers for walking large tables in bounded memory.
+#
+# MySQL drivers buffer the whole result set client side, so QuerySet.iterator()
+# alone does not keep memory flat there.  These helpers instead issue one
+# bounded SELECT per chunk, seeking on the primary key (WHERE pk > last ORDER BY
+# pk LIMIT n), which stays cheap however deep into the table the walk is.
+
+
+def _row_pk(row):
+    if isinstance(row, dict):
+        return row['id']
+    if isinstance(row, (tuple, list)):
+        return row[0] # values_list() rows must put 'id' first
+    return row.pk
+
+
+def iter_pk_chunks(queryset, chunk_size):
+    """Yield lists of at most ``chunk_size`` rows of ``queryset`` in primary-key order."""
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(page[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = _row_pk(rows[-1])
+
+
+def iter_by_pk(queryset, chunk_size):
+    """Yield the rows of ``queryset`` one by one, fetched in primary-key chunks."""
+    for rows in iter_pk_chunks(queryset, chunk_size):
+        yield from rows
@@ -0,0 +1,88 @@
+# PayAsYouGo/backend/accounts/billing.py
+#
+# Turning unbilled time into an invoice, set-based: the number of queries does
+# not depend on how many time entries are billed.
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import rollups, search, versions
+from .expressions import entry_minutes
+from .models import Invoice, InvoiceItem, TimeEntry
+
+CENTS = Decimal('0.01')
+
+
+def unbilled_time(user, client, start=None, end=None):
+    """Unbilled entries of ``client`` that have a duration, optionally bounded by start_time."""
+    entries = TimeEntry.objects.filter(user=user, client=client, is_billed=False).exclude(
+        duration_minutes__isnull=True, end_time__isnull=True
+    )
+    if start:
+        entries = entries.filter(start_time__gte=start)
+    if end:
+        entries = entries.filter(start_time__lte=end)
+    return entries
+
+
+def bill_time(user, client, invoice_number, issue_date, due_date, start=None, end=None,
+              hourly_rate=None, status='draft', notes=None):
+    """
+    Create an invoice for the client's unbilled time in [start, end].
+
+    One line per (project_name, hourly_rate); entries without a rate use
+    ``hourly_rate``.  The entries are claimed with a single UPDATE that sets
+    ``invoice`` and ``is_billed`` before anything is summed, so the lines match
+    exactly the entries linked to the invoice even if new time is logged
+    concurrently.  Everything runs in one transaction.
+    """
+    with transaction.atomic():
+        invoice = Invoice.objects.create(
+            user=user, client=client, invoice_number=invoice_number, issue_date=issue_date,
+            due_date=due_date, total_amount=Decimal('0.00'), status='draft', notes=notes,
+        )
+        claimed = unbilled_time(user, client, start, end).update(
+            is_billed=True, invoice=invoice, updated_at=timezone.now()
+        )
+        if not claimed:
+            raise ValidationError({'detail': 'No unbilled time with a duration in this range.'})
+
+        billed = TimeEntry.objects.filter(invoice=invoice)
+        lines = (
+            billed.values('project_name', 'hourly_rate')
+            .annotate(minutes=Sum(entry_minutes()))
+            .order_by('project_name', 'hourly_rate')
+        )
+        items = []
+        for line in lines:
+            unit_price = line['hourly_rate'] if line['hourly_rate'] is not None else hourly_rate
+            if unit_price is None:
+                raise ValidationError({'hourly_rate': 'Some entries have no hourly_rate; pass a default hourly_rate.'})
+            hours = Decimal(line['minutes']) / 60
+            items.append(InvoiceItem(
+                invoice=invoice,
+                description=f"{line['project_name'] or 'Time'}: {hours.quantize(CENTS)} h @ {unit_price}",
+                quantity=hours.quantize(CENTS, ROUND_HALF_UP),
+                unit_price=unit_price,
+                amount=(hours * unit_price).quantize(CENTS, ROUND_HALF_UP),
+            ))
+        InvoiceItem.objects.bulk_create(items)
+
+        invoice.total_amount = sum((item.amount for item in items), Decimal('0.00'))
+        invoice.status = status
+        invoice.save(update_fields=['total_amount', 'status', 'updated_at'])
+
+        # queryset.update() skipped the rollup signals; move the minutes to billed per month.
+        per_month = billed.annotate(month=TruncMonth('start_time')).values('month').annotate(minutes=Sum(entry_minutes()))
+        rollups.record({
+            (user.pk, rollups.month_of(row['month'])): {'billed_minutes': row['minutes']} for row in per_month
+        })
+        versions.bump(user.pk, 'TimeEntry', 'InvoiceItem') # the claim UPDATE and bulk_create skipped signals
+        search.index_objects([invoice]) # the line descriptions
+    invoice.billed_entries = claimed
+    return invoice
@@ -0,0 +1,107 @@
+# PayAsYouGo/backend/accounts/conditional.py
+#
+# Conditional GET for the accounts API: ETag + Last-Modified on list and detail
+# responses, and 304 Not Modified when the client's copy is current.
+#
+# Validators are computed before the view runs its queryset or serializer:
+#   detail  the row's updated_at (a primary-key lookup of one column);
+#   list    the user's ResourceVersion counters for the listed resource, so any
+#           create, update or delete, including deletions, changes the ETag.
+# Representations that embed other resources (e.g. invoice balances depend on
+# payments) list them in ``etag_resources`` so their counters are mixed in too.
+# The ETag also covers the user, the full query string and the negotiated media
+# type, since all of them change the body.
+
+import hashlib
+
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import versions
+
+
+def make_etag(request, *parts):
+    accepted = getattr(request, 'accepted_media_type', '')
+    raw = '|'.join(str(part) for part in (request.user.pk, request.get_full_path(), accepted, *parts))
+    return quote_etag(hashlib.sha1(raw.encode('utf-8')).hexdigest())
+
+
+def not_modified(request, etag, last_modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        # weak comparison, as for GET in RFC 9110
+        tags = parse_etags(if_none_match)
+        return '*' in tags or etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in tags}
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return bool(if_modified_since and last_modified and int(last_modified.timestamp()) <= if_modified_since)
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # browsers may keep the copy but must revalidate it on every use
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def conditional_response(request, etag, last_modified):
+    """The 304 response when the client's copy matches, else None."""
+    if not_modified(request, etag, last_modified):
+        return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+    return None
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified for generic list and detail views of user-owned rows.
+
+    Detail views are recognised by the lookup kwarg in the URL.  Views whose
+    staff users list every user's rows set ``staff_sees_all``: their own
+    counters do not cover those rows, so staff get plain 200 responses.
+    """
+    etag_resources = () # other resources embedded in the representation
+    staff_sees_all = False
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+        etag, last_modified = validators
+        response = conditional_response(request, etag, last_modified)
+        if response is not None:
+            return response
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_validators(response, etag, last_modified)
+        return response
+
+    def get_row_updated_at(self, lookup_value):
+        return (
+            self.queryset.model._default_manager
+            .filter(user_id=self.request.user.pk, **{self.lookup_field: lookup_value})
+            .values_list('updated_at', flat=True).first()
+        )
+
+    def get_validators(self):
+        user = self.request.user
+        if self.staff_sees_all and (user.is_staff or user.is_superuser):
+            return None
+        model = self.queryset.model
+        resources = [model.__name__, *self.etag_resources]
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        if lookup in self.kwargs:
+            updated_at = self.get_row_updated_at(self.kwargs[lookup])
+            if updated_at is None:
+                return None # let the view answer 404
+            resources = resources[1:]
+        else:
+            updated_at = None
+        counters = versions.current(self.request.user.pk, resources) if resources else {}
+        stamps = [stamp for _, stamp in counters.values()]
+        if updated_at is not None:
+            stamps.append(updated_at)
+        etag = make_etag(self.request, updated_at.isoformat() if updated_at else '',
+                         *(f'{name}:{counters[name][0]}' for name in sorted(counters)))
+        return etag, max(stamps) if stamps else None
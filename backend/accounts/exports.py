@@ -0,0 +1,82 @@
+# PayAsYouGo/backend/accounts/exports.py
+#
+# Streaming CSV / NDJSON exports. Rows are read with values_list() in primary-key
+# chunks (see batching.py) and encoded one line at a time, so memory use does not
+# depend on the size of the export.
+
+import csv
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from .batching import iter_by_pk
+from .models import Expense, Invoice, Payment, TimeEntry
+
+# resource name in the URL -> (model, field the from/to range applies to)
+EXPORTS = {
+    'invoices': (Invoice, 'issue_date'),
+    'time-entries': (TimeEntry, 'start_time'),
+    'expenses': (Expense, 'expense_date'),
+    'payments': (Payment, 'payment_date'),
+}
+
+
+def export_columns(model):
+    """(header, attname) pairs, named like the model serializer fields (FKs as their id)."""
+    return [(field.name, field.attname) for field in model._meta.concrete_fields if field.name != 'import_hash']
+
+
+def export_rows(queryset, columns):
+    """Yield raw value tuples; 'id' is always first so the pk chunking can seek on it."""
+    attnames = [attname for _, attname in columns]
+    assert attnames[0] == 'id'
+    return iter_by_pk(queryset.values_list(*attnames), settings.EXPORT_CHUNK_SIZE)
+
+
+def _to_json_value(value):
+    # Same representation DRF's serializers produce for these types.
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        value = timezone.localtime(value) if timezone.is_aware(value) else value
+        text = value.isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _to_csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return _to_json_value(value)
+
+
+class _Echo:
+    """csv.writer target that hands each encoded line back instead of buffering it."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(queryset, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([header for header, _ in columns])
+    for row in export_rows(queryset, columns):
+        yield writer.writerow([_to_csv_value(value) for value in row])
+
+
+def stream_ndjson(queryset, columns):
+    headers = [header for header, _ in columns]
+    for row in export_rows(queryset, columns):
+        yield json.dumps(dict(zip(headers, map(_to_json_value, row))), separators=(',', ':')) + '\n'
+
+
+STREAMERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+}
@@ -0,0 +1,74 @@
+# PayAsYouGo/backend/accounts/expressions.py
+#
+# Database expressions shared by the SQL aggregations (billing, timesheets, reports).
+
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Func, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+class MinutesBetween(Func):
+    """Whole minutes from the first datetime expression to the second (floored, NULL if either is NULL)."""
+    output_field = IntegerField()
+    arity = 2
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='TIMESTAMPDIFF(MINUTE, %(expressions)s)', **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        start, end = self.source_expressions
+        start_sql, start_params = compiler.compile(start)
+        end_sql, end_params = compiler.compile(end)
+        return (
+            f"((CAST(strftime('%%s', {end_sql}) AS INTEGER) - CAST(strftime('%%s', {start_sql}) AS INTEGER)) / 60)",
+            (*end_params, *start_params),
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        start, end = self.source_expressions
+        start_sql, start_params = compiler.compile(start)
+        end_sql, end_params = compiler.compile(end)
+        return (
+            f'FLOOR(EXTRACT(EPOCH FROM ({end_sql} - {start_sql})) / 60)::integer',
+            (*end_params, *start_params),
+        )
+
+
+def entry_minutes():
+    """
+    SQL counterpart of rollups.entry_minutes(): duration_minutes when set,
+    otherwise the whole minutes between start_time and end_time, never negative.
+    """
+    return Coalesce(
+        F('duration_minutes'),
+        Greatest(MinutesBetween(F('start_time'), F('end_time')), Value(0)),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def amount_paid(before=None):
+    """
+    Per-invoice sum of completed payments, as a correlated subquery (0 when none).
+    ``before`` (an aware datetime) only counts payments made earlier than that.
+    """
+    from .models import Payment
+    payments = Payment.objects.filter(invoice=OuterRef('pk'), status='completed')
+    if before is not None:
+        payments = payments.filter(payment_date__lt=before)
+    paid = (
+        payments
+        .order_by()
+        .values('invoice')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    return Coalesce(Subquery(paid), Value(Decimal('0.00')), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def with_balance(invoices, paid_before=None):
+    """Annotate an Invoice queryset with ``amount_paid`` and ``balance`` (see amount_paid() for ``paid_before``)."""
+    return invoices.annotate(amount_paid=amount_paid(before=paid_before)).annotate(
+        balance=ExpressionWrapper(F('total_amount') - F('amount_paid'), output_field=DecimalField(max_digits=12, decimal_places=2))
+    )
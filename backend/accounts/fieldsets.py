@@ -0,0 +1,182 @@
+# PayAsYouGo/backend/accounts/fieldsets.py
+#
+# Sparse fieldsets (?fields=id,invoice_number,total_amount) and a fast read path
+# for the list endpoints.
+#
+# A list GET normally builds a model instance per row and runs every serializer
+# field over it.  When all the requested fields map to plain columns (or queryset
+# annotations) the list is instead read with queryset.values() for just those
+# columns and each dict row is turned into the response with a per-request plan:
+# one (name, column, converter) triple per field, built once from the view's own
+# serializer.  Converters are the serializer fields' to_representation(), skipped
+# for types whose representation is the database value itself, so the output is
+# identical to the serializer's.  Nested serializers (?expand=), method fields and
+# dotted sources fall back to the regular serializer, narrowed to ``fields``.
+
+import decimal
+from datetime import date
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import ISO_8601, permissions, serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# serializer fields whose representation of a non-null database value is the value itself
+PASSTHROUGH_FIELDS = (
+    serializers.IntegerField,
+    serializers.CharField, # EmailField, URLField, SlugField ... subclass it
+    serializers.ChoiceField,
+    serializers.BooleanField,
+    serializers.PrimaryKeyRelatedField, # read from the <name>_id column
+)
+
+
+class FastRepresentation:
+    """Builds serializer-identical dicts from ``values()`` rows."""
+
+    def __init__(self, specs, extra_columns=()):
+        self.specs = specs # (name, column, converter or None)
+        self.columns = list(dict.fromkeys([column for _, column, _ in specs] + list(extra_columns)))
+
+    def __call__(self, row):
+        data = {}
+        for name, column, convert in self.specs:
+            value = row[column]
+            data[name] = value if value is None or convert is None else convert(value)
+        return data
+
+    @classmethod
+    def for_serializer(cls, serializer, queryset, extra_columns=()):
+        """The plan for ``serializer``'s readable fields, or None if one of them needs the full serializer."""
+        model = queryset.model
+        annotations = queryset.query.annotations
+        specs = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField, serializers.ManyRelatedField)):
+                return None
+            source = field.source
+            if source == '*' or '.' in source:
+                return None
+            if source in annotations:
+                column = source
+            else:
+                try:
+                    model_field = model._meta.get_field(source)
+                except FieldDoesNotExist:
+                    return None
+                if not model_field.concrete or model_field.many_to_many:
+                    return None
+                if model_field.is_relation and not isinstance(field, serializers.PrimaryKeyRelatedField):
+                    return None
+                column = model_field.attname
+            passthrough = isinstance(field, PASSTHROUGH_FIELDS)
+            if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is not None:
+                passthrough = False
+            specs.append((name, column, None if passthrough else cls._converter(field)))
+        return cls(specs, extra_columns)
+
+    @staticmethod
+    def _converter(field):
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            return field.pk_field.to_representation
+        if isinstance(field, serializers.DecimalField):
+            return _decimal_converter(field)
+        if isinstance(field, serializers.DateTimeField):
+            return _datetime_converter(field)
+        if isinstance(field, serializers.DateField):
+            output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+            if output_format is not None and output_format.lower() == ISO_8601:
+                return date.isoformat
+        return field.to_representation
+
+
+# The converters below inline what DRF's to_representation() does for the default
+# settings, with everything that does not depend on the value computed once per
+# request.  Anything else uses the field's own to_representation().
+
+def _decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+
+    return convert
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if isinstance(value, str) or value.utcoffset() is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+    return convert
+
+
+class SparseFieldsMixin:
+    """
+    ``?fields=`` and the values()-based fast path for generic list views.
+
+    Output keys keep the serializer's order; unknown names are a 400.
+    """
+    fields_query_param = 'fields'
+
+    def get_sparse_fields(self):
+        """The requested field names, or None for all of them."""
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self._parse_sparse_fields()
+        return self._sparse_fields
+
+    def _parse_sparse_fields(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None
+        names = [name.strip() for name in self.request.query_params.get(self.fields_query_param, '').split(',') if name.strip()]
+        if not names:
+            return None
+        readable = [name for name, field in super().get_serializer().fields.items() if not field.write_only]
+        unknown = [name for name in names if name not in readable]
+        if unknown:
+            raise ValidationError({self.fields_query_param: f"Unknown field: {', '.join(unknown)}. Choose from {', '.join(readable)}."})
+        return set(names)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_sparse_fields()
+        if fields:
+            narrowed = getattr(serializer, 'child', serializer)
+            for name in [name for name in narrowed.fields if name not in fields]:
+                narrowed.fields.pop(name)
+        return serializer
+
+    def get_fast_representation(self, queryset):
+        """The FastRepresentation for this list request, or None to use the serializer."""
+        keyset = getattr(self, 'keyset_fields', None) or getattr(self.paginator, 'keyset_fields', ())
+        return FastRepresentation.for_serializer(self.get_serializer(), queryset, extra_columns=keyset)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        represent = self.get_fast_representation(queryset)
+        if represent is None:
+            return super().list(request, *args, **kwargs)
+        rows = queryset.values(*represent.columns)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response([represent(row) for row in page])
+        return Response([represent(row) for row in rows])
@@ -0,0 +1,128 @@
+# PayAsYouGo/backend/accounts/imports.py
+#
+# Streaming CSV import for expenses and time entries.
+#
+# The file is read row by row with csv.DictReader and handled in batches: each
+# batch is validated in one pass by the bulk serializers (same rules as the
+# regular create endpoints) and written with one bulk_create in its own
+# transaction, so a crash part-way keeps the batches already imported.  Every
+# row is stored with a sha256 of its content (import_hash); rows whose hash the
+# user already has are skipped, which makes re-running the same file a no-op.
+# Only one batch of hashes is held in memory: repeats within a batch are caught
+# there, repeats of earlier batches by the database (they are committed by then),
+# and rows a concurrent import commits first by the (user, import_hash) constraint.
+
+import csv
+import hashlib
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import rollups
+from .models import Client
+from .serializers import ExpenseBulkSerializer, TimeEntryBulkSerializer
+
+IMPORTS = {
+    'expenses': ExpenseBulkSerializer,
+    'time-entries': TimeEntryBulkSerializer,
+}
+
+MAX_REPORTED_ERRORS = 1000
+
+
+def row_hash(row):
+    """Content hash of a cleaned CSV row; column order and surrounding whitespace do not matter."""
+    return hashlib.sha256(json.dumps(sorted(row.items()), separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def _clean(row):
+    # Blank cells mean "not provided" so optional fields fall back to their defaults.
+    return {key.strip(): value.strip() for key, value in row.items()
+            if key and isinstance(value, str) and value.strip()}
+
+
+def import_csv(resource, stream, user, batch_size=None, progress=None):
+    """
+    Import the CSV text ``stream`` as ``resource`` rows owned by ``user``.
+
+    Returns ``{'rows', 'created', 'duplicates', 'errors'}`` where errors are
+    ``{'line': n, 'errors': {...}}`` (the header is line 1).  ``progress`` is
+    called with the running report after every batch.
+    """
+    serializer_class = IMPORTS[resource]
+    model = serializer_class.Meta.model
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    # Client column holds the client's name; resolve names with one query for the whole file.
+    client_ids = None
+    if any(field.name == 'client' for field in model._meta.fields):
+        client_ids = {name.strip().lower(): pk for name, pk in Client.objects.filter(user=user).values_list('name', 'pk')}
+
+    report = {'rows': 0, 'created': 0, 'duplicates': 0, 'errors': []}
+    rows = enumerate(csv.DictReader(stream), start=2)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        _import_batch(batch, serializer_class, model, user, client_ids, report)
+        if progress:
+            progress(report)
+    return report
+
+
+def _report_error(report, line, errors):
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append({'line': line, 'errors': errors})
+
+
+def _existing_hashes(model, user, digests):
+    return set(model.objects.filter(user=user, import_hash__in=digests).values_list('import_hash', flat=True))
+
+
+def _import_batch(batch, serializer_class, model, user, client_ids, report):
+    report['rows'] += len(batch)
+    candidates = []
+    seen = set()
+    for line, raw in batch:
+        row = _clean(raw)
+        digest = row_hash(row)
+        if digest in seen:
+            report['duplicates'] += 1
+            continue
+        seen.add(digest)
+        if client_ids is not None and 'client' in row:
+            client_id = client_ids.get(row['client'].lower())
+            if client_id is None:
+                _report_error(report, line, {'client': [f"Unknown client '{row['client']}'."]})
+                continue
+            row['client'] = client_id
+        candidates.append((line, digest, row))
+
+    existing = _existing_hashes(model, user, [digest for _, digest, _ in candidates])
+    fresh = [candidate for candidate in candidates if candidate[1] not in existing]
+    report['duplicates'] += len(candidates) - len(fresh)
+    if not fresh:
+        return
+
+    serializer = serializer_class(data=[row for _, _, row in fresh], many=True, context={'user': user})
+    serializer.is_valid(raise_exception=True)
+    for index, errors in sorted(serializer.row_errors.items()):
+        _report_error(report, fresh[index][0], errors)
+    if not serializer.validated_data:
+        return
+    rows = [{**attrs, 'user': user, 'import_hash': fresh[index][1]}
+            for attrs, index in zip(serializer.validated_data, serializer.row_indexes)]
+    while rows:
+        try:
+            with transaction.atomic(), rollups.batch():
+                serializer.create(rows)
+            break
+        except IntegrityError:
+            # A concurrent import of the same rows committed after the check above: they are duplicates too.
+            taken = _existing_hashes(model, user, [row['import_hash'] for row in rows])
+            if not taken:
+                raise
+            report['duplicates'] += sum(row['import_hash'] in taken for row in rows)
+            rows = [row for row in rows if row['import_hash'] not in taken]
+    report['created'] += len(rows)
@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts import audit_archive
+from accounts.models import AuditArchiveSegment, AuditLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Enforce audit log retention: move months older than the hot window into compressed "
+        "archive segments and delete rows and segments older than the retention period. "
+        "Works in small chunks, each in its own short transaction."
+    )
+
+    def add_arguments(self, parser):
+        config = audit_archive.archive_settings()
+        parser.add_argument('--hot-months', type=int, default=config['HOT_MONTHS'],
+                            help='Months (including the current one) kept in the AuditLogs table.')
+        parser.add_argument('--retention-months', type=int, default=config['RETENTION_MONTHS'],
+                            help='Months (including the current one) kept at all.')
+        parser.add_argument('--chunk-size', type=int, default=config['SEGMENT_ROWS'],
+                            help='Rows moved or deleted per transaction (and per segment file).')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between chunks to leave room for live traffic.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be done.')
+
+    def handle(self, *args, **options):
+        hot_months, retention_months = options['hot_months'], options['retention_months']
+        if hot_months < 1 or retention_months < hot_months:
+            raise CommandError('Need 1 <= --hot-months <= --retention-months.')
+        hot_cutoff = audit_archive.months_ago(hot_months - 1)
+        expiry = audit_archive.months_ago(retention_months - 1)
+        chunk_size, pause = options['chunk_size'], options['pause']
+
+        expired_segments = AuditArchiveSegment.objects.filter(max_timestamp__lt=expiry)
+        expired_rows = AuditLog.objects.filter(timestamp__lt=expiry)
+        if options['dry_run']:
+            self.stdout.write(
+                f"{expired_segments.count()} segments and {expired_rows.count()} table rows are past retention "
+                f"(before {expiry:%Y-%m}); {AuditLog.objects.filter(timestamp__gte=expiry, timestamp__lt=hot_cutoff).count()} "
+                f"rows would be archived (before {hot_cutoff:%Y-%m})."
+            )
+            return
+
+        dropped = 0
+        for segment in expired_segments.iterator():
+            audit_archive.delete_segment(segment)
+            dropped += 1
+
+        deleted = 0
+        while True:
+            ids = list(expired_rows.order_by('timestamp', 'id').values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            deleted += AuditLog.objects.filter(pk__in=ids).delete()[0]
+            time.sleep(pause)
+
+        archived = segments = 0
+        while True:
+            oldest = (AuditLog.objects.filter(timestamp__lt=hot_cutoff)
+                      .order_by('timestamp', 'id').values_list('timestamp', flat=True).first())
+            if oldest is None:
+                break
+            local = timezone.localtime(oldest)
+            start = audit_archive.month_start(local.year, local.month)
+            end = min(audit_archive.month_start(local.year, local.month + 1), hot_cutoff)
+            archived += audit_archive.archive_chunk(start, end, chunk_size)
+            segments += 1
+            time.sleep(pause)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} rows into {segments} segments; deleted {deleted} expired rows and {dropped} expired segments."
+        ))
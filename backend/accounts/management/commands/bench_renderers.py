@@ -0,0 +1,95 @@
+import gzip
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import Client, Invoice, TimeEntry
+from accounts.renderers import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+from accounts.serializers import InvoiceSerializer, TimeEntrySerializer
+
+
+def time_entry_page(rows):
+    # unsaved rows: serializing them needs no database
+    start = datetime(2025, 1, 6, 9, tzinfo=timezone.utc)
+    entries = [
+        TimeEntry(
+            id=index + 1, user_id=1, client_id=1 + index % 7, project_name=f'Project {index % 12}',
+            description='Implementation work on the migration', start_time=start + timedelta(hours=index),
+            end_time=start + timedelta(hours=index, minutes=50), duration_minutes=50,
+            hourly_rate=Decimal('85.00') + index % 40, is_billed=index % 3 == 0,
+            created_at=start + timedelta(hours=index, seconds=7, microseconds=index),
+            updated_at=start + timedelta(hours=index, seconds=9, microseconds=index),
+        )
+        for index in range(rows)
+    ]
+    return {'next': None, 'previous': None, 'results': TimeEntrySerializer(entries, many=True).data}
+
+
+def invoice_page(rows):
+    issued = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    client = Client(id=1, user_id=1, name='Acme Corp')
+    invoices = []
+    for index in range(rows):
+        invoice = Invoice(
+            id=index + 1, user_id=1, client=client, invoice_number=f'INV-2025-{index:05d}',
+            issue_date=issued.date(), due_date=(issued + timedelta(days=30)).date(),
+            total_amount=Decimal('1250.00') + index, status='sent', notes='Monthly retainer',
+            created_at=issued + timedelta(minutes=index), updated_at=issued + timedelta(minutes=index),
+        )
+        invoice.amount_paid = Decimal('500.00')
+        invoice.balance = invoice.total_amount - invoice.amount_paid
+        invoices.append(invoice)
+    return {'next': None, 'previous': None, 'results': InvoiceSerializer(invoices, many=True).data}
+
+
+def raw_values(rows):
+    # Decimal and datetime objects handed to the renderer as is (summary-style payloads)
+    now = datetime(2025, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    return [{'month': now.date(), 'amount': Decimal('1234.56') + index, 'at': now + timedelta(seconds=index)} for index in range(rows)]
+
+
+PAYLOADS = {
+    'time entries': time_entry_page,
+    'invoices': invoice_page,
+    'raw Decimal/datetime': raw_values,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's JSONRenderer with the orjson and MessagePack renderers on representative "
+        "list payloads: encode time, response size, and size after gzip. Also checks that the fast "
+        "JSON output is byte-for-byte identical to DRF's."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, action='append', dest='row_counts',
+                            help='Rows per payload (repeatable). Defaults to 100, 1000 and 5000.')
+        parser.add_argument('--repeat', type=int, default=5, help='Encodings per measurement; the best one counts.')
+
+    def handle(self, *args, **options):
+        renderers = [('drf json', JSONRenderer()), ('fast json', FastJSONRenderer())]
+        if msgpack is not None:
+            renderers.append(('msgpack', MessagePackRenderer()))
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; "fast json" falls back to the stdlib encoder.'))
+
+        for name, build in PAYLOADS.items():
+            for rows in options['row_counts'] or (100, 1000, 5000):
+                data = build(rows)
+                reference = JSONRenderer().render(data)
+                self.stdout.write(f'{name}, {rows} rows')
+                for label, renderer in renderers:
+                    best = float('inf')
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        body = renderer.render(data, renderer.media_type)
+                        best = min(best, time.perf_counter() - started)
+                    compressed = len(gzip.compress(body, compresslevel=6))
+                    identical = '' if label == 'msgpack' else ('  identical' if body == reference else '  DIFFERENT')
+                    self.stdout.write(
+                        f'  {label:10} {best * 1000:8.2f} ms  {len(body):>10,} B  {compressed:>9,} B gzip{identical}'
+                    )
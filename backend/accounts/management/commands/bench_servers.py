@@ -0,0 +1,133 @@
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+ENDPOINTS = ('clients/', 'invoices/', 'time-entries/', 'expenses/', 'tax-estimation/', 'summary/')
+
+# (label, server, URL prefix): the same endpoints as sync DRF views under gunicorn (WSGI)
+# and uvicorn (ASGI, where they run in the thread pool), and as the async views under uvicorn.
+SETUPS = (
+    ('wsgi  sync views', 'gunicorn', '/api/'),
+    ('asgi  sync views', 'uvicorn', '/api/'),
+    ('asgi async views', 'uvicorn', '/api/async/'),
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the read endpoints under gunicorn (WSGI) and uvicorn (ASGI), sync and async views, "
+        "and report throughput and p50/p95/p99 latency. Needs a database the servers can share "
+        "(not an in-memory one), gunicorn, uvicorn and httpx."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help='User whose data is requested; a token is created if needed.')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per setup.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once.')
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes.')
+        parser.add_argument('--threads', type=int, default=8, help='Threads per gunicorn worker.')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help=f"Endpoint below /api/ to request (repeatable). Defaults to: {', '.join(ENDPOINTS)}")
+
+    def handle(self, *args, **options):
+        try:
+            import httpx
+        except ImportError:
+            raise CommandError('httpx is required (pip install -r requirements.txt).')
+        if settings.DATABASES['default']['NAME'] in (':memory:', ''):
+            raise CommandError('The servers cannot share an in-memory database.')
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        token, _ = Token.objects.get_or_create(user=user)
+        endpoints = options['endpoints'] or ENDPOINTS
+
+        for label, server, prefix in SETUPS:
+            port = free_port()
+            process = self.start_server(server, port, options)
+            try:
+                base_url = f'http://127.0.0.1:{port}'
+                self.wait_until_ready(httpx, base_url)
+                paths = [prefix + endpoint for endpoint in endpoints]
+                elapsed, latencies, errors = asyncio.run(
+                    self.load(httpx, base_url, token.key, paths, options['requests'], options['concurrency'])
+                )
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+            self.report(label, elapsed, latencies, errors)
+
+    def start_server(self, server, port, options):
+        if server == 'gunicorn':
+            command = ['gunicorn', 'payasyougo.wsgi:application', '--bind', f'127.0.0.1:{port}',
+                       '--workers', str(options['workers']), '--threads', str(options['threads'])]
+        else:
+            command = [sys.executable, '-m', 'uvicorn', 'payasyougo.asgi:application', '--port', str(port),
+                       '--workers', str(options['workers']), '--no-access-log']
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'payasyougo.settings')}
+        try:
+            return subprocess.Popen(command, cwd=settings.BASE_DIR, env=env,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
+            raise CommandError(f'{server} is not installed.')
+
+    def wait_until_ready(self, httpx, base_url, timeout=30.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                httpx.get(base_url + '/api/', timeout=1.0)
+                return
+            except httpx.TransportError:
+                time.sleep(0.2)
+        raise CommandError(f'Server at {base_url} did not start within {timeout:.0f}s.')
+
+    async def load(self, httpx, base_url, token, paths, total, concurrency):
+        latencies, errors = [], 0
+        counter = iter(range(total))
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0,
+                                     headers={'Authorization': f'Token {token}'}) as client:
+
+            async def worker():
+                nonlocal errors
+                for number in counter:
+                    started = time.perf_counter()
+                    try:
+                        response = await client.get(paths[number % len(paths)])
+                        ok = response.status_code == 200
+                    except httpx.HTTPError:
+                        ok = False
+                    latencies.append(time.perf_counter() - started)
+                    errors += not ok
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return time.perf_counter() - started, sorted(latencies), errors
+
+    def report(self, label, elapsed, latencies, errors):
+        ms = lambda seconds: f'{seconds * 1000:7.1f}ms'
+        self.stdout.write(
+            f'{label}: {len(latencies) / elapsed:8.1f} req/s  '
+            f'mean {ms(statistics.fmean(latencies))}  p50 {ms(percentile(latencies, 0.50))}  '
+            f'p95 {ms(percentile(latencies, 0.95))}  p99 {ms(percentile(latencies, 0.99))}  errors {errors}'
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.imports import IMPORTS, import_csv
+from accounts.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Import expenses or time entries for one user from a CSV file. Rows already imported are skipped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('resource', choices=sorted(IMPORTS))
+        parser.add_argument('path', help='CSV file with a header row named after the API fields.')
+        parser.add_argument('--user', required=True, help='Username of the owner of the imported rows.')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(username=options['user'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        def progress(report):
+            self.stdout.write(
+                f"{report['rows']} rows read, {report['created']} created, "
+                f"{report['duplicates']} duplicates, {len(report['errors'])} errors"
+            )
+
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            report = import_csv(options['resource'], stream, user, batch_size=options['batch_size'], progress=progress)
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} of {report['rows']} rows ({report['duplicates']} duplicates skipped)."
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from accounts import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search index (SearchTerms) from clients, invoices and their items, time entries and expenses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only rebuild this user id (can be given more than once).')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows indexed per batch.')
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild(user_ids=options['user_ids'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} documents."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from accounts import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the MonthlySummary and MonthlyExpenseCategory rollup tables (dashboard summary and "
+        "profit-and-loss report) from invoices, payments, time entries and expenses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only rebuild this user id (can be given more than once).')
+
+    def handle(self, *args, **options):
+        written = rollups.rebuild(user_ids=options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} monthly summary rows and their expense categories."))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from accounts.reconciliation import reconcile_all
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark invoices whose completed payments cover the total as paid and reopen paid invoices that are "
+        "no longer covered, in id-range chunks. Lists over- and under-paid invoices."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only reconcile this user id (can be given more than once).')
+        parser.add_argument('--date', help='Treat this day (YYYY-MM-DD) as today when reopening overdue invoices.')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Invoices reconciled per transaction.')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            today = parse_date(options['date'])
+            if today is None:
+                raise CommandError('--date must be formatted as YYYY-MM-DD.')
+        report = reconcile_all(user_ids=options['user_ids'], today=today, chunk_size=options['chunk_size'])
+        for row in report['discrepancies']:
+            kind = 'under-paid' if row['difference'].startswith('-') else 'over-paid'
+            self.stdout.write(
+                f"{kind:10} invoice {row['invoice_number']} (id {row['invoice']}, user {row['user']}): "
+                f"total {row['total_amount']}, paid {row['amount_paid']}, difference {row['difference']}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {report['invoices']} invoices: {report['paid']} marked paid, {report['reopened']} reopened, "
+            f"{report['overpaid']} over-paid, {report['underpaid']} under-paid."
+        ))
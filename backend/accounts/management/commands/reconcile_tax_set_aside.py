@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from accounts import tax
+
+
+class Command(BaseCommand):
+    help = "Recompute every TaxEstimation's taxable income and set-aside from completed payments and expenses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only reconcile this user id (can be given more than once).')
+
+    def handle(self, *args, **options):
+        changed = tax.reconcile(user_ids=options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f"Reconciled tax set-aside; {changed} rows had drifted and were corrected."))
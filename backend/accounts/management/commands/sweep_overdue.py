@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from accounts.overdue import sweep_overdue
+
+
+class Command(BaseCommand):
+    help = "Mark sent invoices whose due date has passed as overdue, in small chunks, logging each change to AuditLog."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Treat this day (YYYY-MM-DD) as today. Defaults to the current date.')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Invoices updated per transaction.')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between chunks.')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            today = parse_date(options['date'])
+            if today is None:
+                raise CommandError('--date must be formatted as YYYY-MM-DD.')
+        moved = sweep_overdue(today=today, chunk_size=options['chunk_size'], pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS(f"Marked {moved} invoices as overdue."))
@@ -0,0 +1,149 @@
+# PayAsYouGo/backend/accounts/middleware.py
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+from . import audit, routers, singletons
+
+MUTATING_METHODS = frozenset({'POST', 'PUT', 'PATCH', 'DELETE'})
+
+
+class AuditLogMiddleware:
+    """
+    Audit every successful mutating request under AUDIT_LOG['PATH_PREFIX'].
+
+    While the request runs it is published in ``audit.current_request`` so the
+    model signal receivers record one entry per created/updated/deleted row with
+    the request's user and address.  Requests that changed nothing through model
+    signals (bulk endpoints, login ...) get a single request-level entry instead.
+    All records go through the asynchronous writer in audit.py.
+
+    Works in both sync and async stacks, so ASGI requests to the async views are
+    not pushed through a thread just to pass this middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.audited(request):
+            return self.get_response(request)
+
+        token = audit.current_request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            audit.current_request.reset(token)
+        self.finish(request, response)
+        return response
+
+    async def __acall__(self, request):
+        if not self.audited(request):
+            return await self.get_response(request)
+
+        token = audit.current_request.set(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            audit.current_request.reset(token)
+        self.finish(request, response)
+        return response
+
+    @staticmethod
+    def audited(request):
+        config = audit.audit_settings()
+        return (config['ENABLED'] and request.method in MUTATING_METHODS
+                and request.path.startswith(config['PATH_PREFIX']))
+
+    def finish(self, request, response):
+        if response.status_code < 400 and not getattr(request, '_audit_recorded', False):
+            self.record_request(request)
+
+    def record_request(self, request):
+        match = request.resolver_match
+        if match is None:
+            audit.record(request, f'{request.method} {request.path}')
+            return
+        view_class = getattr(match.func, 'view_class', None) or getattr(match.func, 'cls', None)
+        queryset = getattr(view_class, 'queryset', None)
+        pk = match.kwargs.get('pk')
+        audit.record(
+            request,
+            f'{request.method} {match.url_name or request.path}',
+            entity_type=queryset.model.__name__ if queryset is not None else None,
+            entity_id=int(pk) if pk is not None and str(pk).isdigit() else None,
+        )
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Publish the request in ``routers.current_state`` so PrimaryReplicaRouter can send
+    the reads of GET/HEAD requests to a replica, and pin users who wrote to the primary.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = routers.RoutingState(request, routers.routing_settings()['REPLICAS'])
+        token = routers.current_state.set(state)
+        try:
+            return self.get_response(request)
+        finally:
+            routers.current_state.reset(token)
+            state.finish()
+
+    async def __acall__(self, request):
+        state = routers.RoutingState(request, routers.routing_settings()['REPLICAS'])
+        token = routers.current_state.set(state)
+        try:
+            return await self.get_response(request)
+        finally:
+            routers.current_state.reset(token)
+            state.finish()
+
+
+class SingletonMemoMiddleware:
+    """
+    Give each request its own memo of the Setting / TaxEstimation rows it reads
+    (``singletons.memoize()``), so reading one again later in the request is free.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with singletons.memoize():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with singletons.memoize():
+            return await self.get_response(request)
+
+
+class GZipLargeResponsesMiddleware(GZipMiddleware):
+    """GZipMiddleware that only compresses bodies of at least settings.GZIP_MIN_LENGTH bytes."""
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < getattr(settings, 'GZIP_MIN_LENGTH', 1024):
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('invoiced_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments_received', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tracked_minutes', models.BigIntegerField(default=0)),
+                ('billed_minutes', models.BigIntegerField(default=0)),
+                ('expenses_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Monthly Summary',
+                'verbose_name_plural': 'Monthly Summaries',
+                'db_table': 'MonthlySummaries',
+                'constraints': [models.UniqueConstraint(fields=('user', 'month'), name='monthlysummary_user_month_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_csv_import_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditArchiveIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField(blank=True, null=True)),
+                ('row_count', models.PositiveIntegerField()),
+                ('min_timestamp', models.DateTimeField()),
+                ('max_timestamp', models.DateTimeField()),
+                ('offset', models.PositiveBigIntegerField()),
+                ('length', models.PositiveBigIntegerField()),
+            ],
+            options={
+                'db_table': 'AuditArchiveIndex',
+            },
+        ),
+        migrations.CreateModel(
+            name='AuditArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('row_count', models.PositiveIntegerField()),
+                ('min_timestamp', models.DateTimeField()),
+                ('max_timestamp', models.DateTimeField()),
+                ('size_bytes', models.PositiveBigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Audit Archive Segment',
+                'verbose_name_plural': 'Audit Archive Segments',
+                'db_table': 'AuditArchiveSegments',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['timestamp', 'id'], name='auditlog_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditarchivesegment',
+            index=models.Index(fields=['max_timestamp', 'min_timestamp'], name='auditseg_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditarchivesegment',
+            index=models.Index(fields=['month'], name='auditseg_month_idx'),
+        ),
+        migrations.AddField(
+            model_name='auditarchiveindex',
+            name='segment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='accounts.auditarchivesegment'),
+        ),
+        migrations.AddIndex(
+            model_name='auditarchiveindex',
+            index=models.Index(fields=['user_id', 'max_timestamp', 'min_timestamp'], name='auditidx_user_ts_idx'),
+        ),
+    ]
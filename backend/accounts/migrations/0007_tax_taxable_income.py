@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_audit_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taxestimation',
+            name='taxable_income',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=12),
+        ),
+    ]
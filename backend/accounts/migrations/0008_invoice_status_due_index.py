@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_tax_taxable_income'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', 'due_date', 'id'], name='invoice_status_due_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-18 07:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_resource_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('entity_type', models.CharField(max_length=20)),
+                ('entity_id', models.BigIntegerField()),
+                ('weight', models.PositiveIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'SearchTerms',
+                'indexes': [models.Index(fields=['entity_type', 'entity_id'], name='searchterm_entity_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'term', 'entity_type', 'entity_id'), name='searchterm_user_term_uniq')],
+            },
+        ),
+    ]
@@ -77,6 +77,10 @@ class Client(models.Model):
         db_table = 'Clients' # 
         verbose_name = "Client"
         verbose_name_plural = "Clients"
+        indexes = [
+            # keyset pagination: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['user', 'created_at', 'id'], name='client_user_created_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -120,6 +124,12 @@ class Invoice(models.Model):
         db_table = 'Invoices'
         verbose_name = "Invoice"
         verbose_name_plural = "Invoices"
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='invoice_user_created_idx'),
+            models.Index(fields=['user', 'status', 'due_date'], name='invoice_user_status_due_idx'),
+            # overdue sweeper (accounts/overdue.py): status='sent' AND due_date < today across all users
+            models.Index(fields=['status', 'due_date', 'id'], name='invoice_status_due_idx'),
+        ]
 
     def __str__(self):
         return self.invoice_number
@@ -174,6 +184,7 @@ class TimeEntry(models.Model):
         blank=True,
         null=True
     )
+    import_hash = models.CharField(max_length=64, blank=True, null=True, editable=False) # sha256 of the CSV row it was imported from
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -181,6 +192,15 @@ class TimeEntry(models.Model):
         db_table = 'TimeEntries'
         verbose_name = "Time Entry"
         verbose_name_plural = "Time Entries"
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='timeentry_user_created_idx'),
+            models.Index(fields=['user', 'start_time'], name='timeentry_user_start_idx'),
+            models.Index(fields=['user', 'is_billed'], name='timeentry_user_billed_idx'),
+        ]
+        constraints = [
+            # re-importing the same CSV skips rows already imported
+            models.UniqueConstraint(fields=['user', 'import_hash'], name='timeentry_user_import_hash_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.project_name or 'No Project'} - {self.description[:50]}"
@@ -199,6 +219,7 @@ class Expense(models.Model):
     expense_date = models.DateField()
     receipt_image_url = models.CharField(max_length=255, blank=True, null=True) # ， ImageField  FileField
     is_reimbursable = models.BooleanField(default=False)
+    import_hash = models.CharField(max_length=64, blank=True, null=True, editable=False) # sha256 of the CSV row it was imported from
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -206,6 +227,13 @@ class Expense(models.Model):
         db_table = 'Expenses'
         verbose_name = "Expense"
         verbose_name_plural = "Expenses"
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='expense_user_created_idx'),
+            models.Index(fields=['user', 'expense_date'], name='expense_user_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'import_hash'], name='expense_user_import_hash_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.description} - {self.amount}"
@@ -247,6 +275,9 @@ class Payment(models.Model):
         db_table = 'Payments'
         verbose_name = "Payment"
         verbose_name_plural = "Payments"
+        indexes = [
+            models.Index(fields=['user', 'payment_date'], name='payment_user_date_idx'),
+        ]
 
     def __str__(self):
         return f"Payment for Invoice {self.invoice.invoice_number} - {self.amount}"
@@ -262,6 +293,8 @@ class TaxEstimation(models.Model):
     )
     tax_percentage = models.DecimalField(max_digits=5, decimal_places=2)
     estimated_amount_set_aside = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # completed payments - expenses, kept incrementally by accounts/tax.py; set-aside = this * tax_percentage
+    taxable_income = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
     last_calculated_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -318,6 +351,158 @@ class AuditLog(models.Model):
         db_table = 'AuditLogs'
         verbose_name = "Audit Log"
         verbose_name_plural = "Audit Logs"
+        indexes = [
+            # also serves (user, timestamp) range filters, no separate index needed
+            models.Index(fields=['user', 'timestamp', 'id'], name='auditlog_user_ts_idx'),
+            # month-range scans of the archiver and admin queries across all users
+            models.Index(fields=['timestamp', 'id'], name='auditlog_ts_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.action} on {self.entity_type}:{self.entity_id} by {self.user}"
\ No newline at end of file
+        return f"{self.action} on {self.entity_type}:{self.entity_id} by {self.user}"
+
+class AuditArchiveSegment(models.Model):
+    # One append-only, gzip-compressed NDJSON file of AuditLog rows moved out of the hot table.
+    # Written by `manage.py audit_retention`, read through accounts/audit_archive.py.
+    month = models.DateField() # first day of the month the rows belong to
+    path = models.CharField(max_length=255, unique=True) # relative to AUDIT_ARCHIVE['ROOT']
+    row_count = models.PositiveIntegerField()
+    min_timestamp = models.DateTimeField()
+    max_timestamp = models.DateTimeField()
+    size_bytes = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'AuditArchiveSegments'
+        verbose_name = "Audit Archive Segment"
+        verbose_name_plural = "Audit Archive Segments"
+        indexes = [
+            models.Index(fields=['max_timestamp', 'min_timestamp'], name='auditseg_ts_idx'),
+            models.Index(fields=['month'], name='auditseg_month_idx'),
+        ]
+
+    def __str__(self):
+        return self.path
+
+class AuditArchiveIndex(models.Model):
+    # Per-segment index: where one user's rows sit inside the segment file and which time range they cover.
+    segment = models.ForeignKey(
+        AuditArchiveSegment,
+        on_delete=models.CASCADE,
+        related_name='entries'
+    )
+    user_id = models.BigIntegerField(blank=True, null=True) # plain id: archived rows outlive deleted users
+    row_count = models.PositiveIntegerField()
+    min_timestamp = models.DateTimeField()
+    max_timestamp = models.DateTimeField()
+    offset = models.PositiveBigIntegerField() # byte offset of this user's gzip member in the file
+    length = models.PositiveBigIntegerField()
+
+    class Meta:
+        db_table = 'AuditArchiveIndex'
+        indexes = [
+            models.Index(fields=['user_id', 'max_timestamp', 'min_timestamp'], name='auditidx_user_ts_idx'),
+        ]
+
+class MonthlySummary(models.Model):
+    # Per-user, per-month rollup behind /api/summary/.
+    # Maintained incrementally by accounts/signals.py; rebuild with `manage.py rebuild_summaries`.
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='monthly_summaries'
+    )
+    month = models.DateField() # first day of the month
+    invoiced_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0) # invoices by issue_date, excluding draft/cancelled
+    payments_received = models.DecimalField(max_digits=14, decimal_places=2, default=0) # completed payments by payment_date
+    tracked_minutes = models.BigIntegerField(default=0) # time entries by start_time
+    billed_minutes = models.BigIntegerField(default=0) # ... of which is_billed
+    expenses_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0) # expenses by expense_date
+    fees_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0) # fee_charged of completed payments + payment_gateway_fee of invoiced invoices
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'MonthlySummaries'
+        verbose_name = "Monthly Summary"
+        verbose_name_plural = "Monthly Summaries"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='monthlysummary_user_month_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Summary for user {self.user_id} - {self.month:%Y-%m}"
+
+class ResourceVersion(models.Model):
+    # Per-user change counter for one resource (model name), bumped on every write.
+    # List ETags are derived from these (accounts/conditional.py); see accounts/versions.py.
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='resource_versions'
+    )
+    resource = models.CharField(max_length=50)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'ResourceVersions'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'resource'], name='resourceversion_user_resource_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.resource} v{self.version} for user {self.user_id}"
+
+
+class SearchTerm(models.Model):
+    # One posting of the per-user inverted index behind /api/search/: ``term`` occurs in
+    # the document (entity_type, entity_id) with the field-weighted ``weight``.
+    # Maintained incrementally from model signals, see accounts/search.py.
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='search_terms'
+    )
+    term = models.CharField(max_length=64)
+    entity_type = models.CharField(max_length=20)
+    entity_id = models.BigIntegerField()
+    weight = models.PositiveIntegerField()
+
+    class Meta:
+        db_table = 'SearchTerms'
+        constraints = [
+            # also serves exact and prefix lookups: user = ? AND term LIKE 'abc%'
+            models.UniqueConstraint(fields=['user', 'term', 'entity_type', 'entity_id'], name='searchterm_user_term_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['entity_type', 'entity_id'], name='searchterm_entity_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.entity_type} {self.entity_id}"
+
+
+class MonthlyExpenseCategory(models.Model):
+    # Expenses per user, month and category behind /api/reports/profit-and-loss/.
+    # Maintained with MonthlySummary by accounts/rollups.py.
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='monthly_expense_categories'
+    )
+    month = models.DateField() # first day of the month
+    category = models.CharField(max_length=100, blank=True, default='') # '' for uncategorised expenses
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'MonthlyExpenseCategories'
+        verbose_name = "Monthly Expense Category"
+        verbose_name_plural = "Monthly Expense Categories"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'category'], name='monthlyexpensecategory_user_month_category_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.category or 'Uncategorised'} for user {self.user_id} - {self.month:%Y-%m}"
@@ -0,0 +1,53 @@
+# PayAsYouGo/backend/accounts/overdue.py
+#
+# Moves invoices from 'sent' to 'overdue' once their due date has passed.
+#
+# Work is done in chunks of primary keys read from the (status, due_date, id)
+# index in index order, so each SELECT stops after CHUNK rows however large the
+# table is.  Every chunk is one short transaction: a set-based UPDATE on exactly
+# those ids (re-checking the status, so invoices paid meanwhile are left alone)
+# plus one bulk INSERT of the matching AuditLog rows.  Updated invoices leave the
+# 'sent' range of the index, so the next SELECT naturally starts after them.
+# Status moves between two "invoiced" states, so MonthlySummary is unaffected.
+
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import versions
+from .models import AuditLog, Invoice
+
+ACTION = 'invoice.overdue'
+
+
+def sweep_overdue(today=None, chunk_size=None, pause=0.0):
+    """Mark every sent invoice due before ``today`` as overdue. Returns the number of invoices moved."""
+    today = today or timezone.localdate()
+    chunk_size = chunk_size or getattr(settings, 'OVERDUE_SWEEP_CHUNK_SIZE', 1000)
+    candidates = Invoice.objects.filter(status='sent', due_date__lt=today).order_by('due_date', 'id')
+    moved = 0
+    while True:
+        chunk = list(candidates.values_list('id', 'user_id')[:chunk_size])
+        if not chunk:
+            return moved
+        now = timezone.now()
+        with transaction.atomic():
+            ids = [pk for pk, _ in chunk]
+            # lock only these rows and keep invoices whose status changed since the SELECT
+            updated = set(
+                Invoice.objects.select_for_update().filter(pk__in=ids, status='sent', due_date__lt=today)
+                .values_list('id', flat=True)
+            )
+            Invoice.objects.filter(pk__in=updated).update(status='overdue', updated_at=now)
+            AuditLog.objects.bulk_create(
+                AuditLog(user_id=user_id, action=ACTION, entity_type='Invoice', entity_id=pk)
+                for pk, user_id in chunk if pk in updated
+            )
+            versions.bump_users({user_id for pk, user_id in chunk if pk in updated}, 'Invoice')
+        moved += len(updated)
+        if len(chunk) < chunk_size:
+            return moved
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,186 @@
+# PayAsYouGo/backend/accounts/pagination.py
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on ``(user_id, <time field>, id)``.
+
+    Unlike DRF's ``CursorPagination`` the cursor carries both the timestamp and
+    the primary key of the boundary row, so ties on the timestamp are resolved
+    by the id instead of an OFFSET.  Every page is a single range scan on the
+    ``(user, created_at, id)`` index, so page 500 costs the same as page 1.
+
+    Views may set ``keyset_fields = ('timestamp', 'id')`` when the model has no
+    ``created_at`` column (e.g. ``AuditLog``).  Results are newest first.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = getattr(settings, 'PAGINATION_PAGE_SIZE', 50)
+    max_page_size = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 500)
+    keyset_fields = ('created_at', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_rows(self.fetcher(queryset, view), request, view)
+
+    def fetcher(self, queryset, view=None):
+        """The ``fetch`` callable paginate_rows() uses for a plain queryset."""
+        time_field, pk_field = getattr(view, 'keyset_fields', self.keyset_fields)
+
+        def fetch(cursor, reverse, limit):
+            return list(self._page_queryset(queryset, cursor, reverse, time_field, pk_field)[:limit])
+
+        return fetch
+
+    def paginate_rows(self, fetch, request, view=None):
+        """
+        Paginate rows that do not come from a single queryset (e.g. the AuditLog
+        archive tier).  ``fetch(cursor, reverse, limit)`` returns up to ``limit``
+        rows strictly past the cursor, newest first (oldest first when reverse).
+        """
+        cursor, reverse = self._start(request, view)
+        return self._finish(fetch(cursor, reverse, self.page_size + 1), cursor, reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, fetching the page with the async ORM."""
+        cursor, reverse = self._start(request, view)
+        queryset = self._page_queryset(queryset, cursor, reverse, self.time_field, self.pk_field)
+        rows = [row async for row in queryset[:self.page_size + 1]]
+        return self._finish(rows, cursor, reverse)
+
+    def _page_queryset(self, queryset, cursor, reverse, time_field, pk_field):
+        if reverse:
+            # Walking backwards: take the rows just newer than the boundary in ascending order, then flip them
+            queryset = queryset.order_by(time_field, pk_field)
+        else:
+            queryset = queryset.order_by('-' + time_field, '-' + pk_field)
+        if cursor is not None:
+            queryset = queryset.filter(self._seek(cursor['t'], cursor['i'], reverse))
+        return queryset
+
+    def _start(self, request, view):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.time_field, self.pk_field = getattr(view, 'keyset_fields', self.keyset_fields)
+        cursor = self.decode_cursor(request)
+        return cursor, bool(cursor and cursor['r'])
+
+    def _finish(self, rows, cursor, reverse):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = cursor is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = rows
+        return rows
+
+    def _seek(self, value, pk, reverse):
+        op = 'gt' if reverse else 'lt'
+        return (
+            Q(**{'%s__%s' % (self.time_field, op): value})
+            | Q(**{self.time_field: value, '%s__%s' % (self.pk_field, op): pk})
+        )
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+        return min(self.page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            value = parse_datetime(cursor['t'])
+            pk = int(cursor['i'])
+            reverse = bool(cursor.get('r', False))
+        except (TypeError, ValueError, KeyError, AttributeError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return {'t': value, 'i': pk, 'r': reverse}
+
+    def encode_cursor(self, row, reverse):
+        if isinstance(row, dict): # values() rows (accounts/fieldsets.py)
+            payload = {'t': row[self.time_field].isoformat(), 'i': row[self.pk_field]}
+        else:
+            payload = {'t': getattr(row, self.time_field).isoformat(), 'i': getattr(row, self.pk_field)}
+        if reverse:
+            payload['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
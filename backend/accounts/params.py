@@ -0,0 +1,58 @@
+# PayAsYouGo/backend/accounts/params.py
+#
+# Query-string parsing shared by the accounts views. Invalid values raise
+# ValidationError so DRF answers with a 400 naming the offending parameter.
+
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def date_param(params, name):
+    """``?name=YYYY-MM-DD`` as a date, or None when absent."""
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: 'Expected a date formatted as YYYY-MM-DD.'})
+    return parsed
+
+
+def datetime_param(params, name, end_of_day=False):
+    """
+    ``?name=`` as an aware datetime. A bare date means the start of that day
+    (or the end of it when ``end_of_day`` is set, for inclusive upper bounds).
+    """
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        # parse_datetime() also accepts a bare date (as midnight), which would lose end_of_day
+        parsed = parse_datetime(value) if parse_date(value) is None else None
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        day = date_param(params, name)
+        parsed = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def bool_param(params, name):
+    """``?name=true|false|1|0`` as a bool, or None when absent."""
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    lowered = value.lower()
+    if lowered in ('1', 'true', 'yes'):
+        return True
+    if lowered in ('0', 'false', 'no'):
+        return False
+    raise ValidationError({name: 'Expected true or false.'})
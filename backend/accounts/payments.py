@@ -0,0 +1,124 @@
+# PayAsYouGo/backend/accounts/payments.py
+#
+# Batch payment ingestion for /api/payments/ingest/ (processor batch files and
+# callbacks).
+#
+# Records are upserted by transaction_id, so resubmitting a file or replaying a
+# callback changes nothing.  The stored payments a batch matches are locked
+# (SELECT ... FOR UPDATE) until it commits, so concurrent replays of a changed
+# record apply its rollup delta once.  A batch costs a fixed number of queries
+# whatever its size: one to resolve every invoice_number (preloaded by the bulk
+# serializer), one to find and lock the transaction_ids already stored, then
+# bulk_create for the new payments and an INSERT ... ON CONFLICT (transaction_id)
+# DO UPDATE for the ones whose data changed (bulk_update's per-row CASE
+# expressions cost seconds for a few thousand rows).  Both bypass the model
+# signals, so the rollups, list ETags and invoice statuses (reconciliation.py)
+# are maintained here.
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Model
+from django.utils import timezone
+
+from . import reconciliation, rollups, versions
+from .models import Payment
+from .serializers import PaymentIngestSerializer
+
+
+def _stored(payment, name):
+    return getattr(payment, Payment._meta.get_field(name).attname)
+
+
+def _incoming(value):
+    return value.pk if isinstance(value, Model) else value
+
+
+def _bulk_update(payments, fields):
+    # the rows are known to exist and to belong to the user, so an upsert only ever takes the UPDATE branch
+    features = connections[router.db_for_write(Payment)].features
+    if not features.supports_update_conflicts:
+        Payment.objects.bulk_update(payments, fields, batch_size=settings.BULK_WRITE_BATCH_SIZE)
+        return
+    copies = [
+        Payment(**{field.attname: getattr(payment, field.attname) for field in Payment._meta.concrete_fields if not field.primary_key})
+        for payment in payments
+    ]
+    Payment.objects.bulk_create(
+        copies, batch_size=settings.BULK_WRITE_BATCH_SIZE, update_conflicts=True, update_fields=fields,
+        unique_fields=['transaction_id'] if features.supports_update_conflicts_with_target else None,
+    )
+
+
+def ingest(user, records):
+    """
+    Upsert ``records`` (a list of dicts) as payments of ``user``.
+
+    Returns ``{'created', 'updated', 'unchanged', 'rejected', 'errors', 'reconciliation'}``
+    where errors are ``{'index': n, 'errors': {...}}`` in request order and
+    reconciliation is the reconcile_invoices() report for the invoices touched.
+    Raises ValidationError only when ``records`` is not a list or is too long.
+    """
+    serializer = PaymentIngestSerializer(
+        data=records, many=True, max_length=settings.PAYMENT_INGEST_MAX_ROWS, context={'user': user}
+    )
+    serializer.is_valid(raise_exception=True)
+    errors = dict(serializer.row_errors)
+    rows = {} # transaction_id -> (request index, validated attrs)
+    for attrs, index in zip(serializer.validated_data, serializer.row_indexes):
+        if attrs['transaction_id'] in rows:
+            errors[index] = {'transaction_id': ['Duplicate transaction_id in this batch.']}
+        else:
+            rows[attrs['transaction_id']] = (index, attrs)
+
+    for attempt in range(2):
+        try:
+            with transaction.atomic(), rollups.batch():
+                counts, invoice_ids = _upsert(user, rows, errors)
+            break
+        except IntegrityError: # a concurrent request inserted one of the new transaction_ids
+            if attempt:
+                raise
+    return {
+        **counts,
+        'reconciliation': reconciliation.reconcile_invoices(invoice_ids),
+        'rejected': len(errors),
+        'errors': [{'index': index, 'errors': detail} for index, detail in sorted(errors.items())],
+    }
+
+
+def _upsert(user, rows, errors):
+    # lock the matched rows (in pk order, against deadlocks) so a concurrent replay of the same records
+    # waits and then sees them unchanged, instead of moving the rollups by the same delta a second time
+    matched = Payment.objects.select_for_update().filter(transaction_id__in=list(rows)).order_by('pk')
+    existing = {payment.transaction_id: payment for payment in matched}
+    created, changed, unchanged, fields = [], [], 0, {'updated_at'}
+    for transaction_id, (index, attrs) in rows.items():
+        payment = existing.get(transaction_id)
+        if payment is None:
+            created.append(Payment(user=user, **attrs))
+        elif payment.user_id != user.pk:
+            errors[index] = {'transaction_id': ['This transaction_id belongs to another account.']}
+        else:
+            updates = {name: value for name, value in attrs.items() if _stored(payment, name) != _incoming(value)}
+            if updates:
+                changed.append((payment, updates))
+            else:
+                unchanged += 1
+
+    updated = [payment for payment, _ in changed]
+    invoice_ids = {payment.invoice_id for payment in updated} # before any moves to another invoice
+    rollups.record_rows(updated, sign=-1)
+    now = timezone.now()
+    for payment, updates in changed:
+        for name, value in updates.items():
+            setattr(payment, name, value)
+            fields.add(name)
+        payment.updated_at = now
+    Payment.objects.bulk_create(created, batch_size=settings.BULK_WRITE_BATCH_SIZE)
+    if updated:
+        _bulk_update(updated, sorted(fields))
+    rollups.record_rows(created + updated)
+    if created or updated:
+        versions.bump(user.pk, 'Payment')
+    invoice_ids.update(payment.invoice_id for payment in created + updated)
+    return {'created': len(created), 'updated': len(updated), 'unchanged': unchanged}, invoice_ids
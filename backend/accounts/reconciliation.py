@@ -0,0 +1,137 @@
+# PayAsYouGo/backend/accounts/reconciliation.py
+#
+# Keeps Invoice.status in line with the completed payments against it.
+#
+# An invoice whose completed payments cover total_amount is 'paid'; a 'paid'
+# invoice whose payments no longer do (a refund, a corrected amount) goes back
+# to 'sent', or 'overdue' once its due date has passed.  Draft and cancelled
+# invoices are never touched.  Each batch of invoice ids costs one grouped query
+# for the paid totals and one set-based UPDATE per target status; the UPDATEs
+# re-check the current status so concurrent edits are not overwritten.  Over-
+# and under-paid invoices are reported, not changed.
+#
+# Payment saves and deletes schedule their invoice for after the commit (see
+# signals.py); bulk writers call reconcile_invoices() themselves, and
+# reconcile_all() (manage.py reconcile_invoices, and daily from the scheduler)
+# walks every invoice in primary-key chunks so memory stays flat however many a
+# user has.  All three statuses count as invoiced, so MonthlySummary is
+# unaffected.
+
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from . import versions
+from .batching import iter_pk_chunks
+from .models import AuditLog, Invoice
+from .rollups import INVOICED_STATUSES
+
+OPEN_STATUSES = ('sent', 'overdue')
+MAX_REPORTED = 1000
+
+_pending = threading.local()
+
+
+def empty_report():
+    return {'invoices': 0, 'paid': 0, 'reopened': 0, 'overpaid': 0, 'underpaid': 0, 'discrepancies': []}
+
+
+def merge_report(report, other):
+    for name in ('invoices', 'paid', 'reopened', 'overpaid', 'underpaid'):
+        report[name] += other[name]
+    report['discrepancies'].extend(other['discrepancies'][:MAX_REPORTED - len(report['discrepancies'])])
+    return report
+
+
+def reconcile_invoices(invoice_ids, today=None):
+    """
+    Settle or reopen the given invoices from their completed payments, in one transaction.
+
+    Returns ``{'invoices', 'paid', 'reopened', 'overpaid', 'underpaid', 'discrepancies'}``;
+    discrepancies list the over- and under-paid invoices (at most MAX_REPORTED).
+    """
+    today = today or timezone.localdate()
+    report = empty_report()
+    invoice_ids = list(invoice_ids)
+    if not invoice_ids:
+        return report
+    rows = (
+        Invoice.objects.filter(pk__in=invoice_ids, status__in=INVOICED_STATUSES)
+        .values_list('id', 'user_id', 'invoice_number', 'status', 'due_date', 'total_amount')
+        .annotate(paid=Sum('payments__amount', filter=Q(payments__status='completed')))
+        .order_by()
+    )
+    targets = {'paid': [], 'sent': [], 'overdue': []}
+    owners = {}
+    with transaction.atomic():
+        for pk, user_id, number, current, due_date, total, paid in rows:
+            report['invoices'] += 1
+            paid = paid or Decimal('0')
+            owners[pk] = user_id
+            if paid >= total:
+                if current != 'paid':
+                    targets['paid'].append(pk)
+            elif current == 'paid':
+                targets['overdue' if due_date < today else 'sent'].append(pk)
+            if paid > total:
+                report['overpaid'] += 1
+            elif 0 < paid < total:
+                report['underpaid'] += 1
+            else:
+                continue
+            if len(report['discrepancies']) < MAX_REPORTED:
+                report['discrepancies'].append({
+                    'invoice': pk, 'invoice_number': number, 'user': user_id,
+                    'total_amount': f'{total:.2f}', 'amount_paid': f'{paid:.2f}', 'difference': f'{paid - total:.2f}',
+                })
+
+        now = timezone.now()
+        changed = {}
+        for status, pks in targets.items():
+            if not pks:
+                continue
+            expected = OPEN_STATUSES if status == 'paid' else ('paid',)
+            # keep invoices whose status changed since the SELECT
+            moved = list(Invoice.objects.filter(pk__in=pks, status__in=expected).values_list('id', flat=True))
+            Invoice.objects.filter(pk__in=moved).update(status=status, updated_at=now)
+            changed.update((pk, status) for pk in moved)
+        report['paid'] = sum(1 for status in changed.values() if status == 'paid')
+        report['reopened'] = len(changed) - report['paid']
+        AuditLog.objects.bulk_create([
+            AuditLog(user_id=owners[pk], action='invoice.paid' if status == 'paid' else 'invoice.reopened',
+                     entity_type='Invoice', entity_id=pk)
+            for pk, status in changed.items()
+        ], batch_size=settings.BULK_WRITE_BATCH_SIZE)
+        versions.bump_users({owners[pk] for pk in changed}, 'Invoice')
+    return report
+
+
+def reconcile_all(user_ids=None, today=None, chunk_size=None):
+    """reconcile_invoices() over every invoiced invoice (of ``user_ids``), one id-range chunk at a time."""
+    chunk_size = chunk_size or getattr(settings, 'RECONCILE_CHUNK_SIZE', 1000)
+    invoices = Invoice.objects.filter(status__in=INVOICED_STATUSES)
+    if user_ids is not None:
+        invoices = invoices.filter(user_id__in=user_ids)
+    report = empty_report()
+    for rows in iter_pk_chunks(invoices.values_list('id'), chunk_size):
+        merge_report(report, reconcile_invoices([pk for pk, in rows], today=today))
+    return report
+
+
+def schedule(invoice_ids):
+    """Reconcile ``invoice_ids`` once the current transaction commits (right away outside one)."""
+    if not hasattr(_pending, 'ids'):
+        _pending.ids = set()
+    _pending.ids.update(pk for pk in invoice_ids if pk is not None)
+    # one callback per call: the first to run takes every pending id, the others find none
+    transaction.on_commit(_run_pending)
+
+
+def _run_pending():
+    invoice_ids, _pending.ids = _pending.ids, set()
+    if invoice_ids:
+        reconcile_invoices(invoice_ids)
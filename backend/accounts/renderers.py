@@ -0,0 +1,116 @@
+# PayAsYouGo/backend/accounts/renderers.py
+
+import datetime
+import decimal
+import json
+import math
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError: # optional: FastJSONRenderer then renders with the stdlib like DRF
+    orjson = None
+
+try:
+    import msgpack
+except ImportError: # optional: settings.py only registers the MessagePack classes when installed
+    msgpack = None
+
+_drf_encoder = JSONEncoder()
+
+
+def drf_default(obj):
+    """DRF's JSONEncoder.default(): how every API response encodes non-JSON types."""
+    return _drf_encoder.default(obj)
+
+
+def _orjson_default(obj):
+    # the common types inline, the same as DRF's encoder; everything else through it
+    if isinstance(obj, datetime.datetime):
+        value = obj.isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        # DRF writes raw Decimals as floats, with Python's float repr (orjson's can differ)
+        value = float(obj)
+        if not math.isfinite(value):
+            raise ValueError('Out of range float values are not JSON compliant')
+        return orjson.Fragment(repr(value))
+    return drf_default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer on orjson, producing the same bytes as DRF's compact output for
+    everything the API serializers emit.
+
+    Datetimes, dates and times are passed back to DRF's encoder so they keep its
+    format ('Z' for UTC, full microseconds); raw Decimals become floats written
+    with Python's repr, exactly as json.dumps does.  Indented output (browsable
+    API, ``; indent=``) and anything orjson refuses (e.g. integers wider than
+    64 bits) go through the stdlib encoder.
+
+    Native floats are the exception: orjson encodes them itself and never calls
+    ``default``, so exponents are spelled its way (``1e16`` rather than ``1e+16``,
+    ``1e-7`` rather than ``1e-07``; the same value when parsed) and NaN or
+    infinity becomes ``null`` where DRF raises ValueError.  The serializers
+    return money and hours as strings, so no response here contains a float.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (orjson is None or not self.compact or self.ensure_ascii or self.encoder_class is not JSONEncoder
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_orjson_default,
+                               option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # DRF escapes U+2028 / U+2029 so the output stays a strict JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """``Accept: application/msgpack``; values are encoded as in the JSON responses."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=drf_default, use_bin_type=True, datetime=False)
+
+
+class _StreamingFormatRenderer(BaseRenderer):
+    """
+    Renderer that only takes part in content negotiation.
+
+    Export views stream their own StreamingHttpResponse in the negotiated format;
+    anything that still goes through a DRF Response (401, 400 ...) is an error
+    payload and is rendered as JSON.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data).encode(self.charset)
+
+
+class CSVRenderer(_StreamingFormatRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(_StreamingFormatRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
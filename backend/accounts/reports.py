@@ -0,0 +1,147 @@
+# PayAsYouGo/backend/accounts/reports.py
+#
+# Reports under /api/reports/.
+#
+# Profit and loss per month reads only the rollup buckets kept by
+# accounts/rollups.py: MonthlySummary for payments received and fees,
+# MonthlyExpenseCategory for expenses by category.  A report costs two indexed
+# range queries over at most one row per month (and category), however many
+# payments and expenses the months contain.
+#
+#   income = completed payments - fee_charged - invoice payment_gateway_fee
+#   net    = income - expenses
+#
+# Receivables aging is one grouped query over the user's invoices: each balance
+# (total_amount - completed payments, see expressions.with_balance()) is summed
+# into its days-past-due bucket with conditional aggregation, per client.
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .expressions import with_balance
+from .models import Invoice, MonthlyExpenseCategory, MonthlySummary
+from .rollups import INVOICED_STATUSES
+
+UNCATEGORISED = 'Uncategorised'
+
+
+def _money(value):
+    return f'{value:.2f}'
+
+
+def _line(received, fees, categories):
+    income = received - fees
+    expenses = sum(categories.values(), Decimal('0'))
+    return {
+        'payments_received': _money(received),
+        'fees': _money(fees),
+        'income': _money(income),
+        'expenses': _money(expenses),
+        'expenses_by_category': {name: _money(amount) for name, amount in sorted(categories.items()) if amount},
+        'net': _money(income - expenses),
+    }
+
+
+def profit_and_loss(user_id, start=None, end=None):
+    """Monthly lines and totals for the months ``start``..``end`` (first days of months, inclusive)."""
+    summaries = MonthlySummary.objects.filter(user_id=user_id)
+    categories = MonthlyExpenseCategory.objects.filter(user_id=user_id)
+    if start:
+        summaries, categories = summaries.filter(month__gte=start), categories.filter(month__gte=start)
+    if end:
+        summaries, categories = summaries.filter(month__lte=end), categories.filter(month__lte=end)
+
+    received, fees = defaultdict(Decimal), defaultdict(Decimal)
+    for month, payments_received, fees_amount in summaries.values_list('month', 'payments_received', 'fees_amount'):
+        received[month] += payments_received
+        fees[month] += fees_amount
+    expenses = defaultdict(lambda: defaultdict(Decimal))
+    for month, category, amount in categories.values_list('month', 'category', 'amount'):
+        expenses[month][category or UNCATEGORISED] += amount
+
+    months, total_categories = [], defaultdict(Decimal)
+    for month in sorted(set(received) | set(expenses)):
+        line = _line(received[month], fees[month], expenses[month])
+        if not (received[month] or fees[month] or line['expenses_by_category']):
+            continue # bucket left with only time or invoiced amounts
+        months.append({'month': f'{month:%Y-%m}', **line})
+        for name, amount in expenses[month].items():
+            total_categories[name] += amount
+
+    return {
+        'totals': _line(sum(received.values(), Decimal('0')), sum(fees.values(), Decimal('0')), total_categories),
+        'months': months,
+    }
+
+
+# (name, fewest days past due, most days past due); None is open-ended
+AGING_BUCKETS = (
+    ('current', None, -1), # not due yet
+    ('days_0_30', 0, 30),
+    ('days_31_60', 31, 60),
+    ('days_61_90', 61, 90),
+    ('days_over_90', 91, None),
+)
+
+
+def _aging_condition(as_of, low, high):
+    # days past due = as_of - due_date
+    condition = Q()
+    if low is not None:
+        condition &= Q(due_date__lte=as_of - timedelta(days=low))
+    if high is not None:
+        condition &= Q(due_date__gte=as_of - timedelta(days=high))
+    return condition
+
+
+def receivables_aging(user_id, as_of):
+    """
+    Outstanding balances per client on ``as_of`` (a date), bucketed by days past due_date.
+
+    Invoices issued after ``as_of`` and payments made after it are left out, so
+    past dates show the aging as it was then.
+    """
+    money = DecimalField(max_digits=14, decimal_places=2)
+    zero = Value(Decimal('0.00'))
+    cutoff = timezone.make_aware(datetime.combine(as_of + timedelta(days=1), time.min))
+    invoices = with_balance(
+        Invoice.objects.filter(user_id=user_id, status__in=INVOICED_STATUSES, issue_date__lte=as_of),
+        paid_before=cutoff,
+    ).filter(balance__gt=0)
+    buckets = {
+        name: Coalesce(Sum('balance', filter=_aging_condition(as_of, low, high), output_field=money), zero, output_field=money)
+        for name, low, high in AGING_BUCKETS
+    }
+    # every invoice passes exactly one bucket's filter, so its balance subquery runs
+    # there and in the WHERE clause only; the per-client total is added up below
+    rows = invoices.values('client', 'client__name').annotate(invoices=Count('pk'), **buckets).order_by()
+
+    clients, totals = [], defaultdict(Decimal)
+    for row in rows:
+        line = {name: row[name] for name, _, _ in AGING_BUCKETS}
+        line['total'] = sum(line.values(), Decimal('0'))
+        for name, amount in line.items():
+            totals[name] += amount
+        totals['invoices'] += row['invoices']
+        clients.append({
+            'client': row['client'],
+            'client_name': row['client__name'],
+            'invoices': row['invoices'],
+            **{name: _money(amount) for name, amount in line.items()},
+        })
+
+    clients.sort(key=lambda line: (-Decimal(line['total']), line['client']))
+    return {
+        'as_of': as_of.isoformat(),
+        'totals': {
+            'invoices': int(totals['invoices']),
+            **{name: _money(totals[name]) for name, _, _ in AGING_BUCKETS},
+            'total': _money(totals['total']),
+        },
+        'clients': clients,
+    }
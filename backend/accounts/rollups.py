@@ -0,0 +1,218 @@
+# PayAsYouGo/backend/accounts/rollups.py
+#
+# Per-user, per-month rollups (MonthlySummary, MonthlyExpenseCategory) for the
+# dashboard and the profit-and-loss report.
+#
+# Every Invoice / Payment / TimeEntry / Expense row "contributes" a few numbers to
+# one (user, month) bucket.  On save we apply (new contribution - old contribution),
+# on delete we subtract the old contribution, so /api/summary/ never has to scan
+# the source tables.  Code paths that bypass model signals (bulk_create, update())
+# must record() the contributions they changed themselves, ideally inside batch()
+# so a thousand-row write costs one UPDATE per touched bucket instead of per row.
+#
+# A contribution's fields are MonthlySummary columns, plus expense_category(name)
+# keys for the amount of an expense in its category's MonthlyExpenseCategory row.
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import tax
+from .models import Expense, Invoice, MonthlyExpenseCategory, MonthlySummary, Payment, TimeEntry
+
+SUMMARY_FIELDS = ('invoiced_amount', 'payments_received', 'tracked_minutes', 'billed_minutes', 'expenses_amount', 'fees_amount')
+
+# Fields whose change can move a row's contribution; saves touching none of them are skipped.
+ROLLUP_SOURCE_FIELDS = {
+    Invoice: {'user', 'status', 'issue_date', 'total_amount', 'payment_gateway_fee'},
+    Payment: {'user', 'status', 'payment_date', 'amount', 'fee_charged'},
+    TimeEntry: {'user', 'start_time', 'end_time', 'duration_minutes', 'is_billed'},
+    Expense: {'user', 'expense_date', 'amount', 'category'},
+}
+
+INVOICED_STATUSES = ('sent', 'paid', 'overdue')
+
+_pending = threading.local()
+
+
+def month_of(value):
+    """First day of the month containing ``value`` (a date or an aware datetime)."""
+    if isinstance(value, datetime):
+        value = timezone.localtime(value) if timezone.is_aware(value) else value
+    return date(value.year, value.month, 1)
+
+
+def entry_minutes(entry):
+    """Duration of a TimeEntry, derived from start/end when duration_minutes is missing."""
+    if entry.duration_minutes is not None:
+        return entry.duration_minutes
+    if entry.start_time and entry.end_time and entry.end_time > entry.start_time:
+        return int((entry.end_time - entry.start_time).total_seconds() // 60)
+    return 0
+
+
+def _decimal(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def expense_category(category):
+    """Contribution field for the expenses of ``category`` ('' when uncategorised)."""
+    return ('category', category or '')
+
+
+def contributions(instance):
+    """Return ``{(user_id, month): {field: value}}`` for one source row."""
+    if isinstance(instance, Invoice):
+        if instance.status not in INVOICED_STATUSES or instance.total_amount is None:
+            return {}
+        return {(instance.user_id, month_of(instance.issue_date)): {
+            'invoiced_amount': _decimal(instance.total_amount),
+            'fees_amount': _decimal(instance.payment_gateway_fee or 0),
+        }}
+    if isinstance(instance, Payment):
+        if instance.status != 'completed' or instance.amount is None:
+            return {}
+        return {(instance.user_id, month_of(instance.payment_date)): {
+            'payments_received': _decimal(instance.amount),
+            'fees_amount': _decimal(instance.fee_charged or 0),
+        }}
+    if isinstance(instance, TimeEntry):
+        minutes = entry_minutes(instance)
+        if not minutes:
+            return {}
+        return {(instance.user_id, month_of(instance.start_time)): {
+            'tracked_minutes': minutes,
+            'billed_minutes': minutes if instance.is_billed else 0,
+        }}
+    if isinstance(instance, Expense):
+        if instance.amount is None:
+            return {}
+        amount = _decimal(instance.amount)
+        return {(instance.user_id, month_of(instance.expense_date)): {
+            'expenses_amount': amount,
+            expense_category(instance.category): amount,
+        }}
+    return {}
+
+
+def merge(target, source, sign=1):
+    """Add ``sign * source`` into ``target`` (both in the contributions() shape)."""
+    for key, fields in source.items():
+        bucket = target.setdefault(key, defaultdict(int))
+        for name, value in fields.items():
+            bucket[name] += sign * value
+    return target
+
+
+def apply_deltas(deltas, create=True):
+    """
+    Apply ``{(user_id, month): {field: delta}}`` to MonthlySummary and
+    MonthlyExpenseCategory with F() updates.
+
+    Missing buckets are created when ``create`` is true; deletions pass
+    ``create=False`` so cascaded deletes of a user never resurrect its rows.
+    The same deltas move the users' tax set-aside (see tax.py).
+    """
+    tax.apply_rollup_deltas(deltas)
+    now = timezone.now()
+    for (user_id, month), fields in deltas.items():
+        summary = {}
+        for name, value in fields.items():
+            if not value:
+                continue
+            if isinstance(name, tuple):
+                _apply(MonthlyExpenseCategory, {'user_id': user_id, 'month': month, 'category': name[1]}, {'amount': value}, create, now)
+            else:
+                summary[name] = value
+        _apply(MonthlySummary, {'user_id': user_id, 'month': month}, summary, create, now)
+
+
+def _apply(model, key, fields, create, now):
+    if not fields:
+        return
+    changes = {name: F(name) + value for name, value in fields.items()}
+    bucket = model.objects.filter(**key)
+    if bucket.update(updated_at=now, **changes) or not create:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **fields)
+    except IntegrityError: # created concurrently
+        bucket.update(updated_at=now, **changes)
+
+
+def record(deltas, create=True):
+    """Apply ``deltas`` now, or queue them when called inside batch()."""
+    pending = getattr(_pending, 'stack', None)
+    if not pending:
+        apply_deltas(deltas, create=create)
+        return
+    merge(pending[-1][create], deltas)
+
+
+def record_rows(rows, sign=1):
+    """record() the contribution of rows written without model signals (bulk_create, queryset.update())."""
+    deltas = {}
+    for row in rows:
+        merge(deltas, contributions(row), sign=sign)
+    record(deltas, create=sign > 0)
+
+
+@contextmanager
+def batch():
+    """Collect every record() in the block and apply the merged deltas once on exit."""
+    if not hasattr(_pending, 'stack'):
+        _pending.stack = []
+    _pending.stack.append({True: {}, False: {}})
+    try:
+        yield
+    except BaseException:
+        _pending.stack.pop()
+        raise
+    queued = _pending.stack.pop()
+    record(queued[False], create=False)
+    record(queued[True], create=True)
+
+
+def rebuild(user_ids=None):
+    """
+    Recompute MonthlySummary and MonthlyExpenseCategory from the source tables.
+    Returns the number of monthly summary buckets written.
+    """
+    totals = {}
+    sources = (
+        Invoice.objects.only('user_id', 'status', 'issue_date', 'total_amount', 'payment_gateway_fee'),
+        Payment.objects.only('user_id', 'status', 'payment_date', 'amount', 'fee_charged'),
+        TimeEntry.objects.only('user_id', 'start_time', 'end_time', 'duration_minutes', 'is_billed'),
+        Expense.objects.only('user_id', 'expense_date', 'amount', 'category'),
+    )
+    for queryset in sources:
+        if user_ids is not None:
+            queryset = queryset.filter(user_id__in=user_ids)
+        for row in queryset.iterator(chunk_size=2000):
+            merge(totals, contributions(row))
+
+    rows = [
+        MonthlySummary(user_id=user_id, month=month, **{name: fields.get(name, 0) for name in SUMMARY_FIELDS})
+        for (user_id, month), fields in totals.items()
+    ]
+    categories = [
+        MonthlyExpenseCategory(user_id=user_id, month=month, category=name[1], amount=value)
+        for (user_id, month), fields in totals.items()
+        for name, value in fields.items() if isinstance(name, tuple) and value
+    ]
+    with transaction.atomic():
+        for model in (MonthlySummary, MonthlyExpenseCategory):
+            existing = model.objects.all()
+            if user_ids is not None:
+                existing = existing.filter(user_id__in=user_ids)
+            existing.delete()
+        MonthlySummary.objects.bulk_create(rows, batch_size=1000)
+        MonthlyExpenseCategory.objects.bulk_create(categories, batch_size=1000)
+    return len(rows)
@@ -0,0 +1,185 @@
+# PayAsYouGo/backend/accounts/routers.py
+#
+# Primary/replica routing for the accounts API (settings.DATABASE_ROUTING).
+#
+# Writes always go to the primary ('default').  Reads go to a read replica only
+# while a GET/HEAD request is being served by an accounts view and only for
+# accounts models; everything else (management commands, the scheduler, the audit
+# writer thread, auth tokens and sessions, mutating requests) reads the primary.
+#
+# Read-your-writes: a mutating request that wrote something pins its user to the
+# primary for STICKY_SECONDS (a key in PIN_CACHE, which must be shared by all
+# workers: a pin another worker cannot see does not stop it reading the lagging
+# replica).  check_pin_cache() fails `manage.py check` and server startup when
+# replicas are configured without such a cache.  Until the user is known, i.e.
+# until DRF has authenticated the request, reads stay on the primary as well.
+#
+# Per-alias counters: router decisions (reads, writes) and executed statements
+# (queries, counted by an execute wrapper installed on every new connection).
+
+import random
+import threading
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import LazyObject
+
+PRIMARY = DEFAULT_DB_ALIAS
+SAFE_METHODS = frozenset({'GET', 'HEAD'})
+
+DEFAULTS = {
+    'REPLICAS': [], # DATABASES aliases of the read replicas
+    'STICKY_SECONDS': 10, # reads of a user who just wrote stay on the primary this long
+    'PIN_CACHE': None, # CACHES alias holding the pins, shared by all workers; required with REPLICAS
+}
+
+# per-process or no-op backends, which cannot carry a pin from one worker to the next
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+current_state = ContextVar('db_routing_state', default=None)
+
+
+def routing_settings():
+    return {**DEFAULTS, **getattr(settings, 'DATABASE_ROUTING', {})}
+
+
+def _pin_key(user_id):
+    return f'db-routing:pin:{user_id}'
+
+
+def pin(user_id):
+    config = routing_settings()
+    if config['STICKY_SECONDS'] > 0 and config['PIN_CACHE'] is not None:
+        caches[config['PIN_CACHE']].set(_pin_key(user_id), True, config['STICKY_SECONDS'])
+
+
+def is_pinned(user_id):
+    alias = routing_settings()['PIN_CACHE']
+    if alias is None:
+        return True # no pins to consult (check_pin_cache reports it): never risk a stale read
+    return caches[alias].get(_pin_key(user_id)) is not None
+
+
+@checks.register(checks.Tags.caches, checks.Tags.database)
+def check_pin_cache(app_configs=None, **kwargs):
+    config = routing_settings()
+    if not config['REPLICAS']:
+        return []
+    alias = config['PIN_CACHE']
+    hint = 'Set DATABASE_ROUTING["PIN_CACHE"] (DB_ROUTING_PIN_CACHE) to a CACHES alias shared by all workers, e.g. Redis or Memcached.'
+    if alias is None:
+        return [checks.Error('DATABASE_ROUTING has REPLICAS but no PIN_CACHE.', hint=hint, id='accounts.E001')]
+    if alias not in settings.CACHES:
+        return [checks.Error(f'DATABASE_ROUTING["PIN_CACHE"] is {alias!r}, which is not in CACHES.', hint=hint, id='accounts.E002')]
+    backend = settings.CACHES[alias].get('BACKEND')
+    if backend in PROCESS_LOCAL_CACHE_BACKENDS:
+        return [checks.Error(
+            f'DATABASE_ROUTING["PIN_CACHE"] {alias!r} uses {backend}, which is not shared between worker processes.',
+            hint=hint, id='accounts.E003',
+        )]
+    return []
+
+
+def _authenticated_user(request):
+    # Only a user that DRF (or an async view) has resolved; evaluating Django's lazy
+    # session user here would itself run queries through the router.
+    user = request.__dict__.get('user')
+    if user is None or isinstance(user, LazyObject) or not user.is_authenticated:
+        return None
+    return user
+
+
+class RoutingState:
+    """Routing of one request, published in ``current_state`` by the middleware."""
+
+    def __init__(self, request, replicas):
+        self.request = request
+        self.wrote = False
+        # one replica per request, so all of its reads see the same snapshot
+        self.replica = random.choice(replicas) if replicas and request.method in SAFE_METHODS else None
+        self._use_replica = None
+
+    def use_replica(self):
+        if self.replica is None:
+            return False
+        if self._use_replica is None:
+            match = self.request.resolver_match
+            user = _authenticated_user(self.request)
+            if match is None or user is None:
+                return False # decided again once the view has authenticated the user
+            self._use_replica = match.func.__module__.startswith('accounts.') and not is_pinned(user.pk)
+        return self._use_replica
+
+    def finish(self):
+        if self.wrote and self.request.method not in SAFE_METHODS:
+            user = _authenticated_user(self.request)
+            if user is not None:
+                pin(user.pk)
+
+
+class AliasCounters:
+    """Thread-safe per-alias counters of router decisions and executed queries."""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, alias, name):
+        with self._lock:
+            counts = self._counts.setdefault(alias, {'reads': 0, 'writes': 0, 'queries': 0})
+            counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {alias: dict(counts) for alias, counts in self._counts.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+counters = AliasCounters()
+
+
+def count_queries(execute, sql, params, many, context):
+    counters.add(context['connection'].alias, 'queries')
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(connection):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def stats():
+    return counters.snapshot()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current_state.get()
+        alias = PRIMARY
+        if state is not None and model._meta.app_label == 'accounts' and state.use_replica():
+            alias = state.replica
+        counters.add(alias, 'reads')
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = current_state.get()
+        if state is not None:
+            state.wrote = True
+        counters.add(PRIMARY, 'writes')
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        aliases = {PRIMARY, *routing_settings()['REPLICAS']}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
@@ -0,0 +1,96 @@
+# PayAsYouGo/backend/accounts/scheduler.py
+#
+# Minimal in-process periodic scheduler for maintenance jobs (e.g. the overdue
+# sweeper).  Jobs come from settings.SCHEDULER['JOBS'] as
+# ``name: {'callable': 'dotted.path', 'interval': seconds}`` and run one at a time
+# on a daemon thread.  wsgi.py / asgi.py call start() when SCHEDULER['ENABLED'], so
+# only server processes run jobs, never manage.py commands or the test runner.
+# Every job must be safe to run concurrently from several processes, since each
+# worker process runs its own scheduler; the sweeper is (it re-checks status).
+
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_run = time.monotonic() + interval
+        self.runs = 0
+        self.failures = 0
+        self.last_result = None
+        self.last_duration = None
+
+
+class Scheduler:
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='accounts-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_job(self, job):
+        started = time.monotonic()
+        close_old_connections()
+        try:
+            job.last_result = job.func()
+        except Exception:
+            job.failures += 1
+            logger.exception('Scheduled job %s failed', job.name)
+        finally:
+            close_old_connections()
+            job.runs += 1
+            job.last_duration = time.monotonic() - started
+            job.next_run = time.monotonic() + job.interval
+
+    def _run(self):
+        while not self._stopping.is_set():
+            job = min(self.jobs, key=lambda job: job.next_run)
+            delay = job.next_run - time.monotonic()
+            if delay > 0:
+                self._stopping.wait(delay)
+                continue
+            self.run_job(job)
+
+
+def scheduler_from_settings():
+    config = getattr(settings, 'SCHEDULER', {})
+    jobs = [Job(name, import_string(job['callable']), job['interval']) for name, job in config.get('JOBS', {}).items()]
+    return Scheduler(jobs)
+
+
+scheduler = None
+_started_pid = None
+
+
+def start():
+    """Start this process's scheduler once (again after a fork)."""
+    global scheduler, _started_pid
+    if _started_pid == os.getpid():
+        return scheduler
+    scheduler = scheduler_from_settings()
+    if scheduler.jobs:
+        scheduler.start()
+    _started_pid = os.getpid()
+    return scheduler
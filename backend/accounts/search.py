@@ -0,0 +1,197 @@
+# PayAsYouGo/backend/accounts/search.py
+#
+# Per-user full-text search over clients, invoices, time entries and expenses
+# (/api/search/), backed by the inverted index table SearchTerm.
+#
+# Every indexed row is a document; its text fields are tokenized (lower case,
+# accents stripped, runs of letters/digits) and each term is stored once per
+# document with a weight = sum of field weight x occurrences.  InvoiceItem
+# descriptions belong to their invoice's document.  Model signals (signals.py)
+# re-index a document on every save and delete, writing only the postings that
+# changed; paths that bypass signals (bulk_create, bulk_update) call
+# index_objects() / index_documents() themselves.
+#
+# A query reads only the postings of its terms through the (user, term) index:
+# every query term must match a document term exactly or as a prefix, and
+# documents are ranked by the summed weights, exact matches counting double.
+# The cost depends on how many documents contain the terms, not on the number of
+# rows the user has.
+
+import re
+import unicodedata
+from functools import reduce
+from operator import add, or_
+
+from django.db.models import Case, F, IntegerField, Max, Q, Sum, Value, When
+
+from .batching import iter_pk_chunks
+from .models import Client, Expense, Invoice, InvoiceItem, SearchTerm, TimeEntry
+
+# text fields and their weights per indexed model
+FIELDS = {
+    Client: {'name': 4, 'email': 2, 'address': 1},
+    Invoice: {'invoice_number': 4, 'notes': 2},
+    TimeEntry: {'project_name': 3, 'description': 2},
+    Expense: {'description': 3, 'category': 2},
+}
+ITEM_WEIGHT = 1 # InvoiceItem.description, indexed under the invoice
+ENTITY_TYPES = {model.__name__: model for model in FIELDS}
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+MIN_PREFIX_LENGTH = 2 # shorter query terms only match whole terms
+MAX_QUERY_TERMS = 8
+EXACT_BOOST = 2
+
+
+def tokenize(text):
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', str(text)).casefold()
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text)]
+
+
+def document_terms(obj, item_descriptions=()):
+    """``{term: weight}`` of one row (and, for an invoice, its line descriptions)."""
+    terms = {}
+    fields = [(getattr(obj, name), weight) for name, weight in FIELDS[type(obj)].items()]
+    fields += [(description, ITEM_WEIGHT) for description in item_descriptions]
+    for text, weight in fields:
+        for term in tokenize(text):
+            terms[term] = terms.get(term, 0) + weight
+    return terms
+
+
+def index_objects(objs):
+    """Bring the postings of these saved rows (all of one indexed model) up to date."""
+    objs = list(objs)
+    if not objs:
+        return
+    model = type(objs[0])
+    items = {}
+    if model is Invoice:
+        for invoice_id, description in InvoiceItem.objects.filter(
+                invoice_id__in=[obj.pk for obj in objs]).values_list('invoice_id', 'description'):
+            items.setdefault(invoice_id, []).append(description)
+    _store(model, [obj.pk for obj in objs], {obj.pk: (obj.user_id, document_terms(obj, items.get(obj.pk, ()))) for obj in objs})
+
+
+def index_documents(model, pks):
+    """Re-index rows by primary key; rows that no longer exist lose their postings."""
+    pks = list(pks)
+    objs = list(model._default_manager.filter(pk__in=pks))
+    index_objects(objs)
+    found = {obj.pk for obj in objs}
+    remove_documents(model, [pk for pk in pks if pk not in found])
+
+
+def remove_documents(model, pks):
+    pks = list(pks)
+    if pks:
+        SearchTerm.objects.filter(entity_type=model.__name__, entity_id__in=pks).delete()
+
+
+def _store(model, pks, documents):
+    # documents: pk -> (user_id, {term: weight}); only changed postings are written
+    entity_type = model.__name__
+    stale, kept = [], set()
+    for posting_id, entity_id, user_id, term, weight in SearchTerm.objects.filter(
+            entity_type=entity_type, entity_id__in=pks).values_list('id', 'entity_id', 'user_id', 'term', 'weight'):
+        document = documents.get(entity_id)
+        if document is None or document[0] != user_id or document[1].get(term) != weight:
+            stale.append(posting_id)
+        else:
+            kept.add((entity_id, term))
+    if stale:
+        SearchTerm.objects.filter(pk__in=stale).delete()
+    SearchTerm.objects.bulk_create(
+        [
+            SearchTerm(user_id=user_id, term=term, entity_type=entity_type, entity_id=pk, weight=weight)
+            for pk, (user_id, terms) in documents.items() for term, weight in terms.items()
+            if (pk, term) not in kept
+        ],
+        batch_size=1000,
+    )
+
+
+def rebuild(user_ids=None, chunk_size=1000):
+    """Re-index every row (of ``user_ids``); returns the number of documents indexed."""
+    indexed = 0
+    for model in FIELDS:
+        rows = model._default_manager.all()
+        if user_ids:
+            rows = rows.filter(user_id__in=user_ids)
+            SearchTerm.objects.filter(entity_type=model.__name__, user_id__in=user_ids).delete()
+        else:
+            SearchTerm.objects.filter(entity_type=model.__name__).delete()
+        for chunk in iter_pk_chunks(rows, chunk_size):
+            index_objects(chunk)
+            indexed += len(chunk)
+    return indexed
+
+
+def _matches(term):
+    return Q(term__startswith=term) if len(term) >= MIN_PREFIX_LENGTH else Q(term=term)
+
+
+def search(user_id, query, entity_types=None, limit=20):
+    """
+    Ranked ``[{'type', 'id', 'title', 'subtitle', 'score'}]`` of the user's documents
+    matching every term of ``query``, exactly or as a prefix.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+    postings = SearchTerm.objects.filter(reduce(or_, (_matches(term) for term in terms)), user_id=user_id)
+    if entity_types:
+        postings = postings.filter(entity_type__in=entity_types)
+
+    # per posting: weight x (EXACT_BOOST for an exact match, 1 for a prefix match) for every query term
+    boost = reduce(add, (
+        Case(When(term=term, then=Value(EXACT_BOOST)), When(_matches(term), then=Value(1)), default=Value(0), output_field=IntegerField())
+        for term in terms
+    ))
+    # per document: how many query terms matched at least one of its terms
+    matched = reduce(add, (
+        Max(Case(When(_matches(term), then=Value(1)), default=Value(0), output_field=IntegerField())) for term in terms
+    ))
+    hits = list(
+        postings.values('entity_type', 'entity_id')
+        .annotate(score=Sum(F('weight') * boost), matched=matched)
+        .filter(matched=len(terms))
+        .order_by('-score', '-entity_id')[:limit]
+    )
+    return _describe(user_id, hits)
+
+
+def _describe(user_id, hits):
+    # one query per entity type for the rows to show; the user filter guards against stale postings
+    ids = {}
+    for hit in hits:
+        ids.setdefault(hit['entity_type'], []).append(hit['entity_id'])
+    rows = {}
+    for entity_type, pks in ids.items():
+        queryset = ENTITY_TYPES[entity_type]._default_manager.filter(user_id=user_id, pk__in=pks)
+        if entity_type == 'Invoice':
+            queryset = queryset.select_related('client')
+        rows.update(((entity_type, obj.pk), obj) for obj in queryset)
+
+    results = []
+    for hit in hits:
+        obj = rows.get((hit['entity_type'], hit['entity_id']))
+        if obj is None:
+            continue
+        title, subtitle = _summary(obj)
+        results.append({'type': hit['entity_type'], 'id': obj.pk, 'title': title, 'subtitle': subtitle, 'score': hit['score']})
+    return results
+
+
+def _summary(obj):
+    if isinstance(obj, Client):
+        return obj.name, obj.email
+    if isinstance(obj, Invoice):
+        return obj.invoice_number, obj.client.name
+    if isinstance(obj, TimeEntry):
+        return obj.project_name or obj.description, obj.start_time.date().isoformat()
+    return obj.description, obj.category
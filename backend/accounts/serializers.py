@@ -1,6 +1,16 @@
 # PayAsYouGo/backend/accounts/serializers.py
 
+import uuid
+
+from django.conf import settings
+from django.db import connections, router
+from django.utils import timezone
+from django.utils.encoding import smart_str
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueValidator
+
+from . import rollups, search, versions
 from .models import (
     CustomUser,
     Client,
@@ -11,9 +21,78 @@ from .models import (
     Payment,
     TaxEstimation,
     Setting,
-    AuditLog
+    AuditLog,
+    MonthlySummary
 )
 
+# ---------------------------------------------------------------------------
+# Related fields limited to the requesting user's rows
+# ---------------------------------------------------------------------------
+
+def as_pk(value):
+    """Primary key from request data, or None if it is not an integer id."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class UserScopedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PK field limited to the requesting user's rows (``context['user']`` when
+    there is no request, e.g. management commands). BulkListSerializer preloads
+    every id referenced by the batch with one query, so validating 1,000 rows
+    does not issue 1,000 lookups.
+    """
+    def get_queryset(self):
+        user = self.context['user'] if 'user' in self.context else self.context['request'].user
+        return super().get_queryset().filter(user=user)
+
+    def preload(self, values):
+        pks = {pk for pk in map(as_pk, values) if pk is not None}
+        self._preloaded = self.get_queryset().in_bulk(pks) if pks else {}
+
+    def to_internal_value(self, data):
+        preloaded = getattr(self, '_preloaded', None)
+        if preloaded is None:
+            return super().to_internal_value(data)
+        pk = as_pk(data)
+        if pk is None:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return preloaded[pk]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+class UserScopedSlugRelatedField(serializers.SlugRelatedField):
+    """
+    SlugRelatedField counterpart of UserScopedPrimaryKeyRelatedField, e.g.
+    invoices referenced by invoice_number; preloaded the same way.
+    """
+    def get_queryset(self):
+        user = self.context['user'] if 'user' in self.context else self.context['request'].user
+        return super().get_queryset().filter(user=user)
+
+    def preload(self, values):
+        slugs = {str(value) for value in values if isinstance(value, (str, int)) and not isinstance(value, bool)}
+        rows = self.get_queryset().filter(**{f'{self.slug_field}__in': slugs}).only('pk', self.slug_field) if slugs else ()
+        self._preloaded = {str(getattr(obj, self.slug_field)): obj for obj in rows}
+
+    def to_internal_value(self, data):
+        preloaded = getattr(self, '_preloaded', None)
+        if preloaded is None:
+            return super().to_internal_value(data)
+        if not isinstance(data, (str, int)) or isinstance(data, bool):
+            self.fail('invalid')
+        try:
+            return preloaded[str(data)]
+        except KeyError:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=smart_str(data))
+
+
 class UserLoginResponseSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser #  CustomUser 
@@ -81,11 +160,28 @@ class ClientSerializer(serializers.ModelSerializer):
 
 # /
 class InvoiceSerializer(serializers.ModelSerializer):
+    # Present when the queryset is annotated with expressions.with_balance()
+    amount_paid = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    balance = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
     class Meta:
         model = Invoice
         fields = '__all__'
         read_only_fields = ['created_at', 'updated_at']
 
+    def get_fields(self):
+        # ?expand=items,payments,client nests the related rows (the view passes context['expand']
+        # and prefetches them so the list stays at a constant number of queries)
+        fields = super().get_fields()
+        expand = self.context.get('expand', ())
+        if 'items' in expand:
+            fields['items'] = InvoiceItemSerializer(many=True, read_only=True)
+        if 'payments' in expand:
+            fields['payments'] = PaymentSerializer(many=True, read_only=True)
+        if 'client' in expand:
+            fields['client'] = ClientSerializer(read_only=True)
+        return fields
+
 # ...  ModelSerializer
 # : InvoiceItemSerializer, TimeEntrySerializer, ExpenseSerializer, PaymentSerializer, TaxEstimationSerializer, SettingSerializer, AuditLogSerializer
 
@@ -98,16 +194,18 @@ class InvoiceItemSerializer(serializers.ModelSerializer):
 class TimeEntrySerializer(serializers.ModelSerializer):
     class Meta:
         model = TimeEntry
-        fields = '__all__'
+        exclude = ['import_hash'] # internal de-duplication key for CSV imports
         read_only_fields = ['created_at', 'updated_at']
 
 class ExpenseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Expense
-        fields = '__all__'
+        exclude = ['import_hash'] # internal de-duplication key for CSV imports
         read_only_fields = ['created_at', 'updated_at']
 
 class PaymentSerializer(serializers.ModelSerializer):
+    invoice = UserScopedPrimaryKeyRelatedField(queryset=Invoice.objects.all()) # only the user's own invoices
+
     class Meta:
         model = Payment #  Payment
         fields = '__all__' # 
@@ -117,7 +215,8 @@ class TaxEstimationSerializer(serializers.ModelSerializer):
     class Meta:
         model = TaxEstimation
         fields = '__all__' #  TaxEstimation  Setting ，
-        read_only_fields = ['created_at', 'updated_at', 'user']
+        # computed server-side from payments and expenses (accounts/tax.py)
+        read_only_fields = ['created_at', 'updated_at', 'user', 'estimated_amount_set_aside', 'taxable_income', 'last_calculated_at']
 
 class SettingSerializer(serializers.ModelSerializer):
     class Meta:
@@ -130,4 +229,166 @@ class AuditLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = AuditLog
         fields = '__all__'
-        read_only_fields = ['timestamp']
\ No newline at end of file
+        read_only_fields = ['timestamp']
+
+# Dashboard rollup rows returned by /api/summary/
+class MonthlySummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MonthlySummary
+        fields = ['month', 'invoiced_amount', 'payments_received', 'tracked_minutes', 'billed_minutes', 'expenses_amount']
+        read_only_fields = fields
+
+
+# ---------------------------------------------------------------------------
+# Bulk write serializers (/api/time-entries/bulk/, /api/expenses/bulk/)
+# ---------------------------------------------------------------------------
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    ``many=True`` serializer for the bulk endpoints.
+
+    Each row is validated on its own: invalid rows end up in ``row_errors``
+    (request index -> errors) instead of failing the whole batch, and
+    ``validated_data`` holds only the valid rows.  For updates pass the
+    user's rows as ``instance={pk: obj}``; every row must then carry an ``id``,
+    at most once per request.
+    Writes go through bulk_create/bulk_update, so the dashboard rollups are
+    recorded here rather than by the model signals.  Created rows always come
+    back with their ids, also on backends whose bulk INSERT does not return them.
+    """
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            pk = as_pk(data.get('id')) if isinstance(data, dict) else None
+            self.child.instance = self.instance.get(pk)
+            if self.child.instance is None:
+                raise serializers.ValidationError({'id': ['A valid id of one of your rows is required.']})
+            if pk in self.row_ids:
+                # the rollups subtract and add each row once; a repeat would count it twice
+                raise serializers.ValidationError({'id': ['This id appears more than once in the request.']})
+            self.row_ids.add(pk)
+            self.child.initial_data = data
+        return super().run_child_validation(data)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            message = self.error_messages['not_a_list'].format(input_type=type(data).__name__)
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [message]}, code='not_a_list')
+        if self.max_length is not None and len(data) > self.max_length:
+            message = self.error_messages['max_length'].format(max_length=self.max_length)
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [message]}, code='max_length')
+
+        rows = [item for item in data if isinstance(item, dict)]
+        for field in self.child.fields.values():
+            if isinstance(field, (UserScopedPrimaryKeyRelatedField, UserScopedSlugRelatedField)):
+                field.preload(item[field.field_name] for item in rows if item.get(field.field_name) is not None)
+
+        validated, self.row_errors, self.row_indexes, self.row_instances = [], {}, [], []
+        self.row_ids = set()
+        for index, item in enumerate(data):
+            try:
+                validated.append(self.run_child_validation(item))
+            except serializers.ValidationError as exc:
+                self.row_errors[index] = exc.detail
+            else:
+                self.row_indexes.append(index)
+                self.row_instances.append(self.child.instance)
+        self.child.instance = None
+        return validated
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        objs = [model(**attrs) for attrs in validated_data]
+        db = router.db_for_write(model)
+        temporary = []
+        if not connections[db].features.can_return_rows_from_bulk_insert:
+            # MySQL: the INSERT returns no ids, so every row needs a key to find it by afterwards
+            temporary = [obj for obj in objs if obj.import_hash is None]
+            for obj in temporary:
+                obj.import_hash = uuid.uuid4().hex # 32 characters, never a 64-character row hash
+        objs = model.objects.using(db).bulk_create(objs, batch_size=settings.BULK_WRITE_BATCH_SIZE)
+        if any(obj.pk is None for obj in objs):
+            self._fetch_pks(model, db, objs, temporary)
+        rollups.record_rows(objs)
+        versions.bump_users({obj.user_id for obj in objs}, model.__name__)
+        search.index_objects(objs)
+        return objs
+
+    @staticmethod
+    def _fetch_pks(model, db, objs, temporary):
+        # (user, import_hash) is unique; imported rows already carry their row hash,
+        # the others a throwaway key that is cleared again once the ids are known.
+        rows = {(obj.user_id, obj.import_hash): obj for obj in objs}
+        found = model.objects.using(db).filter(
+            user_id__in={obj.user_id for obj in objs}, import_hash__in=[obj.import_hash for obj in objs],
+        ).values_list('pk', 'user_id', 'import_hash')
+        for pk, user_id, key in found:
+            obj = rows.get((user_id, key))
+            if obj is not None:
+                obj.pk = pk
+        if temporary:
+            model.objects.using(db).filter(pk__in=[obj.pk for obj in temporary]).update(import_hash=None)
+            for obj in temporary:
+                obj.import_hash = None
+
+    def update(self, instance, validated_data):
+        model = self.child.Meta.model
+        now = timezone.now()
+        objs, fields = self.row_instances, {'updated_at'}
+        rollups.record_rows(objs, sign=-1)
+        for obj, attrs in zip(objs, validated_data):
+            for name, value in attrs.items():
+                setattr(obj, name, value)
+                fields.add(name)
+            obj.updated_at = now
+        model.objects.bulk_update(objs, sorted(fields), batch_size=settings.BULK_WRITE_BATCH_SIZE)
+        rollups.record_rows(objs)
+        versions.bump_users({obj.user_id for obj in objs}, model.__name__)
+        search.index_objects(objs)
+        return objs
+
+
+class TimeEntryBulkSerializer(TimeEntrySerializer):
+    client = UserScopedPrimaryKeyRelatedField(queryset=Client.objects.all(), required=False, allow_null=True)
+    invoice = UserScopedPrimaryKeyRelatedField(queryset=Invoice.objects.all(), required=False, allow_null=True)
+
+    class Meta(TimeEntrySerializer.Meta):
+        read_only_fields = ['user', 'created_at', 'updated_at']
+        list_serializer_class = BulkListSerializer
+
+
+class ExpenseBulkSerializer(ExpenseSerializer):
+    class Meta(ExpenseSerializer.Meta):
+        read_only_fields = ['user', 'created_at', 'updated_at']
+        list_serializer_class = BulkListSerializer
+
+
+# Rows of POST /api/payments/ingest/ (validated only; payments.ingest() does the upsert)
+class PaymentIngestSerializer(PaymentSerializer):
+    invoice_number = UserScopedSlugRelatedField(source='invoice', slug_field='invoice_number', queryset=Invoice.objects.all())
+    transaction_id = serializers.CharField(max_length=255) # the upsert key, so no UniqueValidator
+    invoice = None # addressed by invoice_number instead
+
+    class Meta(PaymentSerializer.Meta):
+        fields = ['id', 'transaction_id', 'invoice_number', 'amount', 'payment_date', 'payment_method', 'status', 'fee_charged']
+        read_only_fields = ['id']
+        list_serializer_class = BulkListSerializer
+
+
+# Input for POST /api/invoices/bill-time/
+class BillTimeSerializer(serializers.Serializer):
+    client = UserScopedPrimaryKeyRelatedField(queryset=Client.objects.all())
+    invoice_number = serializers.CharField(max_length=100, validators=[UniqueValidator(queryset=Invoice.objects.all())])
+    issue_date = serializers.DateField()
+    due_date = serializers.DateField()
+    start = serializers.DateTimeField(required=False, allow_null=True) # bill entries with start_time >= start
+    end = serializers.DateTimeField(required=False, allow_null=True) # ... and start_time <= end
+    hourly_rate = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True) # for entries without a rate
+    status = serializers.ChoiceField(choices=['draft', 'sent'], default='draft')
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+    def validate(self, data):
+        if data.get('start') and data.get('end') and data['start'] > data['end']:
+            raise serializers.ValidationError({'end': 'end must not be before start.'})
+        if data['due_date'] < data['issue_date']:
+            raise serializers.ValidationError({'due_date': 'due_date must not be before issue_date.'})
+        return data
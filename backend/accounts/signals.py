@@ -0,0 +1,184 @@
+# PayAsYouGo/backend/accounts/signals.py
+#
+# Model signal receivers. Connected from AccountsConfig.ready().
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from rest_framework.authtoken.models import Token
+
+from . import audit, authentication, reconciliation, rollups, routers, search, singletons, versions
+from .models import Client, CustomUser, Expense, Invoice, InvoiceItem, Payment, Setting, TaxEstimation, TimeEntry
+
+ROLLUP_MODELS = (Invoice, Payment, TimeEntry, Expense)
+
+
+def _touches_rollup(sender, update_fields):
+    if update_fields is None:
+        return True
+    names = {name[:-3] if name.endswith('_id') else name for name in update_fields}
+    return bool(rollups.ROLLUP_SOURCE_FIELDS[sender] & names)
+
+
+def capture_rollup_previous(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Remember what the stored row contributed so post_save can apply only the difference.
+    instance._rollup_previous = {}
+    if raw or instance.pk is None or not _touches_rollup(sender, update_fields):
+        return
+    previous = sender._default_manager.filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._rollup_previous = rollups.contributions(previous)
+
+
+def apply_rollup_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not _touches_rollup(sender, update_fields):
+        return
+    deltas = rollups.merge({}, rollups.contributions(instance))
+    rollups.merge(deltas, getattr(instance, '_rollup_previous', {}), sign=-1)
+    rollups.record(deltas)
+
+
+def apply_rollup_on_delete(sender, instance, **kwargs):
+    deltas = rollups.merge({}, rollups.contributions(instance), sign=-1)
+    rollups.record(deltas, create=False)
+
+
+for model in ROLLUP_MODELS:
+    pre_save.connect(capture_rollup_previous, sender=model, dispatch_uid=f'rollup_pre_save_{model.__name__}')
+    post_save.connect(apply_rollup_on_save, sender=model, dispatch_uid=f'rollup_post_save_{model.__name__}')
+    post_delete.connect(apply_rollup_on_delete, sender=model, dispatch_uid=f'rollup_post_delete_{model.__name__}')
+
+
+def invalidate_cached_token(sender, instance, **kwargs):
+    # token deleted or regenerated (DRF regenerates by deleting and creating a new key)
+    authentication.invalidate_token(instance.key)
+
+
+def invalidate_cached_user(sender, instance, created=False, **kwargs):
+    # deactivation, password or permission changes must not be served from a stale cached user
+    if not created:
+        authentication.invalidate_user(instance.pk)
+
+
+post_save.connect(invalidate_cached_token, sender=Token, dispatch_uid='authtoken_cache_post_save')
+post_delete.connect(invalidate_cached_token, sender=Token, dispatch_uid='authtoken_cache_post_delete')
+post_save.connect(invalidate_cached_user, sender=CustomUser, dispatch_uid='authtoken_cache_user_post_save')
+
+
+AUDITED_MODELS = (Client, Invoice, InvoiceItem, Payment, TimeEntry, Expense, TaxEstimation, Setting, CustomUser)
+
+
+def _audit(instance, action):
+    # Only changes made while AuditLogMiddleware is handling a request are captured;
+    # record after commit so rolled-back writes are not logged.
+    request = audit.current_request.get()
+    if request is None:
+        return
+    entity_type, entity_id = type(instance).__name__, instance.pk
+    transaction.on_commit(lambda: audit.record(request, action, entity_type=entity_type, entity_id=entity_id))
+
+
+def audit_save(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return # login bookkeeping, the login request itself is audited
+    if not raw:
+        _audit(instance, 'create' if created else 'update')
+
+
+def audit_delete(sender, instance, **kwargs):
+    _audit(instance, 'delete')
+
+
+for model in AUDITED_MODELS:
+    post_save.connect(audit_save, sender=model, dispatch_uid=f'audit_post_save_{model.__name__}')
+    post_delete.connect(audit_delete, sender=model, dispatch_uid=f'audit_post_delete_{model.__name__}')
+
+
+VERSIONED_MODELS = (Client, Invoice, InvoiceItem, Payment, TimeEntry, Expense, TaxEstimation, Setting)
+
+
+def bump_resource_version(sender, instance, raw=False, **kwargs):
+    # Any write, deletions included, changes the owner's list ETags (see conditional.py).
+    if raw:
+        return
+    if sender is InvoiceItem:
+        user_id = Invoice.objects.filter(pk=instance.invoice_id).values_list('user_id', flat=True).first()
+    else:
+        user_id = instance.user_id
+    versions.bump(user_id, sender.__name__)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_resource_version, sender=model, dispatch_uid=f'version_post_save_{model.__name__}')
+    post_delete.connect(bump_resource_version, sender=model, dispatch_uid=f'version_post_delete_{model.__name__}')
+
+
+def write_through_singleton(sender, instance, raw=False, **kwargs):
+    # drop the cached row now, cache the committed one once the transaction commits
+    singletons.invalidate(sender, [instance.pk])
+    if not raw:
+        transaction.on_commit(lambda: singletons.put(sender, instance.pk, instance))
+
+
+def invalidate_singleton(sender, instance, **kwargs):
+    singletons.invalidate(sender, [instance.pk])
+
+
+for model in (Setting, TaxEstimation):
+    post_save.connect(write_through_singleton, sender=model, dispatch_uid=f'singleton_post_save_{model.__name__}')
+    post_delete.connect(invalidate_singleton, sender=model, dispatch_uid=f'singleton_post_delete_{model.__name__}')
+
+
+
+def index_for_search(sender, instance, raw=False, update_fields=None, **kwargs):
+    # re-index the row's search document unless the save left its text fields alone
+    if raw:
+        return
+    if sender is InvoiceItem:
+        if update_fields is None or 'description' in update_fields:
+            search.index_documents(Invoice, [instance.invoice_id])
+        return
+    if update_fields is None or set(search.FIELDS[sender]) & set(update_fields):
+        search.index_objects([instance])
+
+
+def unindex_for_search(sender, instance, **kwargs):
+    if sender is InvoiceItem:
+        search.index_documents(Invoice, [instance.invoice_id])
+    else:
+        search.remove_documents(sender, [instance.pk])
+
+
+for model in (*search.FIELDS, InvoiceItem):
+    post_save.connect(index_for_search, sender=model, dispatch_uid=f'search_post_save_{model.__name__}')
+    post_delete.connect(unindex_for_search, sender=model, dispatch_uid=f'search_post_delete_{model.__name__}')
+
+
+RECONCILE_SOURCE_FIELDS = {'invoice', 'amount', 'status'}
+
+
+def capture_reconcile_previous(sender, instance, raw=False, update_fields=None, **kwargs):
+    # a payment moved to another invoice leaves the one it used to pay to be reconciled too
+    instance._reconcile_previous_invoice = None
+    if raw or instance.pk is None or (update_fields is not None and not {'invoice', 'invoice_id'} & set(update_fields)):
+        return
+    instance._reconcile_previous_invoice = sender._default_manager.filter(pk=instance.pk).values_list('invoice_id', flat=True).first()
+
+
+def reconcile_payment_invoice(sender, instance, raw=False, update_fields=None, **kwargs):
+    # completed payments decide whether the invoice is paid (see reconciliation.py)
+    if raw or (update_fields is not None and not RECONCILE_SOURCE_FIELDS & {name[:-3] if name.endswith('_id') else name for name in update_fields}):
+        return
+    reconciliation.schedule([instance.invoice_id, getattr(instance, '_reconcile_previous_invoice', None)])
+
+
+pre_save.connect(capture_reconcile_previous, sender=Payment, dispatch_uid='reconcile_pre_save_Payment')
+post_save.connect(reconcile_payment_invoice, sender=Payment, dispatch_uid='reconcile_post_save_Payment')
+post_delete.connect(reconcile_payment_invoice, sender=Payment, dispatch_uid='reconcile_post_delete_Payment')
+
+
+def count_connection_queries(sender, connection, **kwargs):
+    routers.install_query_counter(connection)
+
+
+connection_created.connect(count_connection_queries, dispatch_uid='routing_query_counter')
@@ -0,0 +1,261 @@
+# PayAsYouGo/backend/accounts/singletons.py
+#
+# Read-through cache for the per-user one-to-one rows Setting and TaxEstimation,
+# which invoice rendering, reports and tax calculations read over and over.
+#
+# Same two tiers as the token cache in authentication.py:
+#   1. a process-local LRU with a TTL, so repeat reads in a request and across
+#      requests of the same worker cost no query;
+#   2. a shared Django cache (USER_SINGLETON_CACHE['SHARED_CACHE']).
+# "No row" is cached too.  invalidate() cannot reach other processes' local
+# tiers, so with a shared tier every user's rows carry a generation token kept
+# there: invalidate() replaces it, and local (and shared) copies taken under an
+# older token are ignored.  A local hit then costs one cache round trip instead
+# of a query.  Without a shared tier only Setting is cached locally, for at most
+# TTL seconds; TaxEstimation, whose stale copy would show wrong money on the tax
+# page, is not kept across requests.
+#
+# On top of both tiers SingletonMemoMiddleware gives every request a memo (a
+# contextvar), so repeat reads within one request cost nothing at all, whatever
+# the tiers hold; the request's own writes drop their entries from it.
+#
+# Saves and deletes invalidate immediately and write the committed row back after
+# commit (receivers in signals.py); writers that bypass signals
+# (queryset.update(), bulk_update()) call invalidate() themselves.
+
+import contextvars
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Setting, TaxEstimation
+
+DEFAULTS = {
+    'TTL': 300, # seconds an entry stays valid in the process-local tier
+    'MAX_SIZE': 10000, # users kept per model in the process-local tier
+    'SHARED_CACHE': None, # name of a CACHES alias for the shared tier, None to disable
+    'SHARED_TTL': 600,
+}
+
+MISSING = object() # cached "this user has no row"
+
+# rows a process may keep locally when there is no shared tier to learn of other processes' writes
+LOCAL_ONLY_MODELS = (Setting,)
+
+
+def cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'USER_SINGLETON_CACHE', {})}
+
+
+class SingletonCache:
+    """Thread-safe LRU of user id -> row (or MISSING) with per-entry expiry."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # user_id -> (expires_at, generation, row)
+        self._lock = threading.Lock()
+
+    def get(self, user_id, generation=None):
+        """The cached row, or None when absent, expired or taken under another generation."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic() or entry[1] != generation:
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[2]
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def set(self, user_id, row, generation=None):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, generation, row)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# (model, user_id) -> row or MISSING, for the request being handled (see memoize())
+request_memo = contextvars.ContextVar('singleton_request_memo', default=None)
+
+
+@contextmanager
+def memoize():
+    """Remember every row read in the block, so reading it again costs nothing."""
+    token = request_memo.set({})
+    try:
+        yield
+    finally:
+        request_memo.reset(token)
+
+
+_config = cache_settings()
+local_caches = {model: SingletonCache(max_size=_config['MAX_SIZE'], ttl=_config['TTL']) for model in (Setting, TaxEstimation)}
+
+
+def _shared_cache():
+    alias = cache_settings()['SHARED_CACHE']
+    return caches[alias] if alias else None
+
+
+def _shared_key(model, user_id):
+    return f'singleton:{model._meta.db_table}:{user_id}'
+
+
+def _generation_key(model, user_id):
+    return f'singleton-generation:{model._meta.db_table}:{user_id}'
+
+
+def _generation(shared, model, user_id):
+    key = _generation_key(model, user_id)
+    generation = shared.get(key)
+    if generation is None:
+        # expired or evicted: start a new one, and use whichever token won if processes race
+        shared.add(key, uuid.uuid4().hex, cache_settings()['SHARED_TTL'])
+        generation = shared.get(key)
+    return generation
+
+
+async def _ageneration(shared, model, user_id):
+    key = _generation_key(model, user_id)
+    generation = await shared.aget(key)
+    if generation is None:
+        await shared.aadd(key, uuid.uuid4().hex, cache_settings()['SHARED_TTL'])
+        generation = await shared.aget(key)
+    return generation
+
+
+def _memoized(row, memo, model, user_id):
+    if memo is not None:
+        memo[model, user_id] = row
+    # callers get their own copy, so mutating it never changes the cached row
+    return None if row is MISSING else copy.copy(row)
+
+
+def _get(model, user_id):
+    memo = request_memo.get()
+    if memo is not None and (model, user_id) in memo:
+        return _memoized(memo[model, user_id], None, model, user_id)
+    local = local_caches[model]
+    shared = _shared_cache()
+    if shared is None:
+        generation = None
+        row = local.get(user_id) if model in LOCAL_ONLY_MODELS else local.miss()
+    else:
+        generation = _generation(shared, model, user_id)
+        row = local.get(user_id, generation)
+        if row is None:
+            # a shared copy only counts if it was stored under the current generation
+            stored = shared.get(_shared_key(model, user_id))
+            if stored is not None and stored[0] == generation:
+                row = stored[1] or MISSING # False marks "no row" in the shared tier
+                local.set(user_id, row, generation)
+    if row is None:
+        # from the primary: a lagging replica would keep a stale row cached
+        row = model._default_manager.using(DEFAULT_DB_ALIAS).filter(pk=user_id).first() or MISSING
+        _store(local, shared, model, user_id, row, generation)
+    return _memoized(row, memo, model, user_id)
+
+
+async def _aget(model, user_id):
+    # _get() for async views, with the async cache/ORM APIs
+    memo = request_memo.get()
+    if memo is not None and (model, user_id) in memo:
+        return _memoized(memo[model, user_id], None, model, user_id)
+    local = local_caches[model]
+    shared = _shared_cache()
+    if shared is None:
+        generation = None
+        row = local.get(user_id) if model in LOCAL_ONLY_MODELS else local.miss()
+    else:
+        generation = await _ageneration(shared, model, user_id)
+        row = local.get(user_id, generation)
+        if row is None:
+            stored = await shared.aget(_shared_key(model, user_id))
+            if stored is not None and stored[0] == generation:
+                row = stored[1] or MISSING
+                local.set(user_id, row, generation)
+    if row is None:
+        row = await model._default_manager.using(DEFAULT_DB_ALIAS).filter(pk=user_id).afirst() or MISSING
+        if shared is not None or model in LOCAL_ONLY_MODELS:
+            local.set(user_id, copy.copy(row) if row is not MISSING else MISSING, generation)
+        if shared is not None:
+            await shared.aset(_shared_key(model, user_id), (generation, False if row is MISSING else row), cache_settings()['SHARED_TTL'])
+    return _memoized(row, memo, model, user_id)
+
+
+def _store(local, shared, model, user_id, row, generation):
+    if shared is not None or model in LOCAL_ONLY_MODELS:
+        local.set(user_id, copy.copy(row) if row is not MISSING else MISSING, generation)
+    if shared is not None:
+        shared.set(_shared_key(model, user_id), (generation, False if row is MISSING else row), cache_settings()['SHARED_TTL'])
+
+
+def put(model, user_id, row):
+    """Store ``row`` (a fresh instance, or MISSING) in both tiers under the current generation."""
+    shared = _shared_cache()
+    generation = _generation(shared, model, user_id) if shared is not None else None
+    _store(local_caches[model], shared, model, user_id, row, generation)
+
+
+def _drop(model, user_ids):
+    local = local_caches[model]
+    shared = _shared_cache()
+    memo = request_memo.get()
+    for user_id in user_ids:
+        local.invalidate(user_id)
+        if memo is not None:
+            memo.pop((model, user_id), None)
+    if shared is not None:
+        # a new generation invalidates every process's local copy, not just this one's
+        ttl = cache_settings()['SHARED_TTL']
+        shared.set_many({_generation_key(model, user_id): uuid.uuid4().hex for user_id in user_ids}, ttl)
+        shared.delete_many([_shared_key(model, user_id) for user_id in user_ids])
+
+
+def invalidate(model, user_ids):
+    """Forget the users' rows now and again once the current transaction commits."""
+    user_ids = list(user_ids)
+    _drop(model, user_ids)
+    # a read between the write and the commit may have cached the old row again
+    transaction.on_commit(lambda: _drop(model, user_ids))
+
+
+def get_setting(user_id):
+    """The user's Setting, or None."""
+    return _get(Setting, user_id)
+
+
+def get_tax_estimation(user_id):
+    """The user's TaxEstimation, or None."""
+    return _get(TaxEstimation, user_id)
+
+
+async def aget_tax_estimation(user_id):
+    return await _aget(TaxEstimation, user_id)
+
+
+def stats():
+    return {model.__name__: {'hits': cache.hits, 'misses': cache.misses} for model, cache in local_caches.items()}
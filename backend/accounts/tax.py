@@ -0,0 +1,104 @@
+# PayAsYouGo/backend/accounts/tax.py
+#
+# Incremental tax set-aside.
+#
+# TaxEstimation keeps a running taxable_income (completed payments - expenses) and
+# estimated_amount_set_aside = taxable_income * tax_percentage / 100.  Both are moved
+# by the same per-row deltas that maintain MonthlySummary: rollups.apply_deltas()
+# hands every applied batch to apply_rollup_deltas(), so signal-driven saves, bulk
+# writes, imports and billing all update the set-aside in one UPDATE per user.
+# reconcile() recomputes from the source tables (manage.py reconcile_tax_set_aside).
+
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+from . import singletons
+from .models import Expense, Payment, TaxEstimation
+
+CENTS = Decimal('0.01')
+
+
+def taxable_delta(fields):
+    """Change in taxable income carried by one MonthlySummary delta."""
+    return Decimal(fields.get('payments_received', 0)) - Decimal(fields.get('expenses_amount', 0))
+
+
+def set_aside_expression(taxable_income):
+    # never negative: a month with more expenses than income does not release money already set aside elsewhere
+    return Greatest(
+        Round(taxable_income * F('tax_percentage') / Value(Decimal(100)), 2),
+        Value(Decimal(0)),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def set_aside_for(taxable_income, tax_percentage):
+    return max((taxable_income * tax_percentage / 100).quantize(CENTS, ROUND_HALF_UP), Decimal(0))
+
+
+def apply_rollup_deltas(deltas):
+    """Apply ``{(user_id, month): {field: delta}}`` rollup deltas to the users' TaxEstimation rows."""
+    per_user = defaultdict(Decimal)
+    for (user_id, _month), fields in deltas.items():
+        per_user[user_id] += taxable_delta(fields)
+    now = timezone.now()
+    changed = []
+    for user_id, delta in per_user.items():
+        if not delta:
+            continue
+        changed.append(user_id)
+        income = F('taxable_income') + delta
+        # users without a TaxEstimation row update nothing; their base is computed when the row is created.
+        # MySQL evaluates SET assignments left to right, so the set-aside must come first to read the
+        # old taxable_income (update() keeps the keyword order).
+        TaxEstimation.objects.filter(pk=user_id).update(
+            estimated_amount_set_aside=set_aside_expression(income),
+            taxable_income=income,
+            last_calculated_at=now,
+            updated_at=now,
+        )
+    singletons.invalidate(TaxEstimation, changed) # queryset.update() sends no signals
+
+
+def recalculate(estimation):
+    """Refresh the set-aside from the stored taxable income (after tax_percentage changed)."""
+    estimation.estimated_amount_set_aside = set_aside_for(estimation.taxable_income, estimation.tax_percentage)
+    estimation.last_calculated_at = timezone.now()
+    estimation.save(update_fields=['estimated_amount_set_aside', 'last_calculated_at', 'updated_at'])
+
+
+def reconcile(user_ids=None):
+    """Recompute taxable income and set-aside from payments and expenses. Returns the number of rows changed."""
+    estimations = TaxEstimation.objects.all()
+    payments = Payment.objects.filter(status='completed')
+    expenses = Expense.objects.all()
+    if user_ids is not None:
+        estimations = estimations.filter(pk__in=user_ids)
+        payments = payments.filter(user_id__in=user_ids)
+        expenses = expenses.filter(user_id__in=user_ids)
+    income = defaultdict(Decimal)
+    for user_id, total in payments.values_list('user_id').annotate(total=Sum('amount')).order_by():
+        income[user_id] += total or 0
+    for user_id, total in expenses.values_list('user_id').annotate(total=Sum('amount')).order_by():
+        income[user_id] -= total or 0
+
+    now = timezone.now()
+    changed = []
+    for estimation in estimations:
+        taxable_income = income.get(estimation.pk, Decimal(0))
+        set_aside = set_aside_for(taxable_income, estimation.tax_percentage)
+        if estimation.taxable_income != taxable_income or estimation.estimated_amount_set_aside != set_aside:
+            estimation.taxable_income = taxable_income
+            estimation.estimated_amount_set_aside = set_aside
+            changed.append(estimation)
+        estimation.last_calculated_at = estimation.updated_at = now
+    TaxEstimation.objects.bulk_update(
+        changed, ['taxable_income', 'estimated_amount_set_aside', 'last_calculated_at', 'updated_at'], batch_size=1000
+    )
+    estimations.exclude(pk__in=[estimation.pk for estimation in changed]).update(last_calculated_at=now, updated_at=now)
+    singletons.invalidate(TaxEstimation, [estimation.pk for estimation in estimations]) # bulk writes send no signals
+    return len(changed)
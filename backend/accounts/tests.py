@@ -1,3 +1,1790 @@
-from django.test import TestCase
+import csv
+import hashlib
+import json
+import re
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import AuditArchiveSegment, AuditLog, Client, CustomUser, Expense, Invoice, InvoiceItem, MonthlyExpenseCategory, MonthlySummary, Payment, Setting, TaxEstimation, TimeEntry
+from . import audit, audit_archive, authentication, billing, exports, imports, overdue, payments, reconciliation, rollups, routers, scheduler, singletons, tax, timesheets, versions
+from .expressions import with_balance
+from .pagination import KeysetPagination
+from .params import datetime_param
+from .renderers import FastJSONRenderer, msgpack, orjson
+from .serializers import ClientSerializer, ExpenseSerializer, InvoiceSerializer, TimeEntrySerializer
+from .views import (
+    AuditLogListView,
+    ClientListCreateView,
+    ClientRetrieveUpdateDestroyView,
+    ExpenseListCreateView,
+    ExpenseRetrieveUpdateDestroyView,
+    InvoiceListCreateView,
+    InvoiceRetrieveUpdateDestroyView,
+    TimeEntryListCreateView,
+    TimeEntryRetrieveUpdateDestroyView,
+)
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN every per-user queryset the views issue and fail unless the planner
+    reads the table through the index from the migrations meant for that access
+    path (a full scan, or only the user_id FK index, means it is missing or no
+    longer matches).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        start = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        cls.users = [CustomUser.objects.create_user(f'user{i}', f'user{i}@example.com', 'pw') for i in range(5)]
+        for n, user in enumerate(cls.users):
+            client = Client.objects.create(user=user, name=f'Client {n}')
+            Invoice.objects.bulk_create(
+                Invoice(user=user, client=client, invoice_number=f'INV-{n}-{i}', issue_date=date(2025, 1, 1),
+                        due_date=date(2025, 1, 1) + timedelta(days=i), total_amount=Decimal('100.00'),
+                        status=('sent', 'paid', 'overdue')[i % 3])
+                for i in range(30)
+            )
+            TimeEntry.objects.bulk_create(
+                TimeEntry(user=user, client=client, start_time=start + timedelta(hours=i), duration_minutes=60,
+                          is_billed=bool(i % 2))
+                for i in range(30)
+            )
+            Expense.objects.bulk_create(
+                Expense(user=user, description='Travel', amount=Decimal('10.00'), expense_date=date(2025, 1, 1) + timedelta(days=i))
+                for i in range(30)
+            )
+            AuditLog.objects.bulk_create(AuditLog(user=user, action='update') for i in range(30))
+        cls.user = cls.users[0]
+        if connection.vendor == 'mysql':
+            with connection.cursor() as cursor:
+                for model in (Client, Invoice, TimeEntry, Expense, Payment, AuditLog, MonthlySummary):
+                    cursor.execute(f'ANALYZE TABLE `{model._meta.db_table}`')
+
+    def view_queryset(self, view_class, query=None, **kwargs):
+        request = Request(APIRequestFactory().get('/', query or {}))
+        request.user = self.user
+        view = view_class(request=request, kwargs=kwargs, format_kwarg=None)
+        return view.get_queryset()
+
+    def paginated(self, view_class, query=None, cursor_row=None):
+        # The ordering and seek predicate KeysetPagination adds on top of get_queryset().
+        queryset = self.view_queryset(view_class, query)
+        paginator = KeysetPagination()
+        paginator.time_field, paginator.pk_field = getattr(view_class, 'keyset_fields', paginator.keyset_fields)
+        queryset = queryset.order_by('-' + paginator.time_field, '-' + paginator.pk_field)
+        if cursor_row is not None:
+            queryset = queryset.filter(paginator._seek(getattr(cursor_row, paginator.time_field), cursor_row.pk, False))
+        return queryset[:paginator.page_size + 1]
+
+    def assertNoFullScan(self, queryset):
+        if connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            self.assertIsNone(re.search(r'\bSCAN (TABLE )?"?\w+', plan), f'full scan in plan:\n{plan}\n{queryset.query}')
+        elif connection.vendor == 'mysql':
+            plan = queryset.explain(format='JSON')
+            self.assertNotIn('"access_type": "ALL"', json.dumps(json.loads(plan)), f'full scan in plan:\n{plan}')
+        else:
+            self.skipTest(f'no plan check for {connection.vendor}')
+
+    def assertUsesIndex(self, queryset, *names):
+        """
+        No full scan, and the queryset's own table is read through one of the indexes ``names``
+        ('PRIMARY' for the primary key).  The FK index on user_id alone would also avoid a full
+        scan, so this is what shows that the composite indexes exist and match the access path.
+        """
+        self.assertNoFullScan(queryset)
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            used = set(re.findall(rf'\bSEARCH "?{table}"? USING (?:COVERING )?INDEX (\w+)', plan))
+            if re.search(rf'\bSEARCH "?{table}"? USING INTEGER PRIMARY KEY', plan):
+                used.add('PRIMARY')
+            if any(name.startswith('sqlite_autoindex_') for name in used): # inline UNIQUE constraints
+                used |= {constraint.name for constraint in queryset.model._meta.constraints}
+        else:
+            plan = queryset.explain(format='JSON')
+            used = set()
+
+            def walk(node):
+                if isinstance(node, dict):
+                    if node.get('table_name') == table and 'key' in node:
+                        used.add(node['key'])
+                    for value in node.values():
+                        walk(value)
+                elif isinstance(node, list):
+                    for value in node:
+                        walk(value)
+            walk(json.loads(plan))
+        self.assertTrue(used & set(names), f'{table} read through {sorted(used) or "no index"}, expected one of {names}:\n{plan}')
+
+    def test_list_views(self):
+        cases = [
+            (ClientListCreateView, 'client_user_created_idx'),
+            (InvoiceListCreateView, 'invoice_user_created_idx'),
+            (TimeEntryListCreateView, 'timeentry_user_created_idx'),
+            (ExpenseListCreateView, 'expense_user_created_idx'),
+            (AuditLogListView, 'auditlog_user_ts_idx'),
+        ]
+        for view_class, index in cases:
+            with self.subTest(view=view_class.__name__):
+                self.assertUsesIndex(self.paginated(view_class), index)
+                boundary = self.view_queryset(view_class).first()
+                self.assertUsesIndex(self.paginated(view_class, cursor_row=boundary), index)
+
+    def test_filtered_list_views(self):
+        cases = [
+            (InvoiceListCreateView, {'status': 'overdue', 'due_before': '2025-01-20'}, ['invoice_user_status_due_idx']),
+            (TimeEntryListCreateView, {'start_after': '2025-01-01', 'start_before': '2025-01-02'}, ['timeentry_user_start_idx']),
+            # either the filter's index or the keyset ordering's, at the planner's choice
+            (TimeEntryListCreateView, {'is_billed': 'false'}, ['timeentry_user_billed_idx', 'timeentry_user_created_idx']),
+            (ExpenseListCreateView, {'date_from': '2025-01-05', 'date_to': '2025-01-10'}, ['expense_user_date_idx']),
+            (AuditLogListView, {'since': '2025-01-01'}, ['auditlog_user_ts_idx']),
+        ]
+        for view_class, query, indexes in cases:
+            with self.subTest(view=view_class.__name__, query=query):
+                self.assertUsesIndex(self.paginated(view_class, query), *indexes)
+
+    def test_detail_views(self):
+        cases = [
+            (ClientRetrieveUpdateDestroyView, Client),
+            (InvoiceRetrieveUpdateDestroyView, Invoice),
+            (TimeEntryRetrieveUpdateDestroyView, TimeEntry),
+            (ExpenseRetrieveUpdateDestroyView, Expense),
+        ]
+        for view_class, model in cases:
+            with self.subTest(view=view_class.__name__):
+                pk = model.objects.filter(user=self.user).values_list('pk', flat=True).first()
+                self.assertUsesIndex(self.view_queryset(view_class, pk=pk).filter(pk=pk), 'PRIMARY')
+
+    def test_payments_by_date(self):
+        since = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        self.assertUsesIndex(Payment.objects.filter(user=self.user, payment_date__gte=since).order_by('payment_date'), 'payment_user_date_idx')
+
+    def test_overdue_sweep(self):
+        candidates = Invoice.objects.filter(status='sent', due_date__lt=date(2025, 1, 20)).order_by('due_date', 'id')
+        self.assertUsesIndex(candidates.values_list('id', 'user_id')[:1000], 'invoice_status_due_idx')
+
+    def test_summary_buckets(self):
+        self.assertUsesIndex(MonthlySummary.objects.filter(user=self.user).order_by('month'), 'monthlysummary_user_month_uniq')
+
+
+class InvoiceReadModelTests(TestCase):
+    """The expanded invoice list must cost the same number of queries whatever the page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        client = Client.objects.create(user=cls.user, name='Acme')
+        paid_at = datetime(2025, 2, 1, tzinfo=dt_timezone.utc)
+        for i in range(30):
+            invoice = Invoice.objects.create(
+                user=cls.user, client=client, invoice_number=f'INV-{i}', issue_date=date(2025, 1, 1),
+                due_date=date(2025, 1, 31), total_amount=Decimal('100.00'), status='sent',
+            )
+            InvoiceItem.objects.create(invoice=invoice, description='Work', quantity=1, unit_price=100, amount=100)
+            InvoiceItem.objects.create(invoice=invoice, description='More work', quantity=1, unit_price=0, amount=0)
+            Payment.objects.create(invoice=invoice, user=cls.user, amount=Decimal('30.00'), payment_date=paid_at,
+                                   status='completed', transaction_id=f'TX-{i}-1')
+            Payment.objects.create(invoice=invoice, user=cls.user, amount=Decimal('50.00'), payment_date=paid_at,
+                                   status='failed', transaction_id=f'TX-{i}-2')
+        # ETag counters exist after the first conditional GET; create them up front so counts are steady-state
+        versions.current(cls.user.pk, ['Invoice', 'InvoiceItem', 'Payment', 'Client'])
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_expanded_list_query_count_is_constant(self):
+        url = reverse('invoice-list-create')
+        for page_size in (5, 30):
+            with self.subTest(page_size=page_size), self.assertNumQueries(4): # ETag counters + invoices + items + payments
+                response = self.api.get(url, {'expand': 'items,payments,client', 'page_size': page_size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), page_size)
+
+    def test_expanded_representation(self):
+        invoice = Invoice.objects.get(invoice_number='INV-3')
+        url = reverse('invoice-detail-update-destroy', args=[invoice.pk])
+        with self.assertNumQueries(5): # updated_at + ETag counters + invoice + items + payments
+            data = self.api.get(url, {'expand': 'items,payments,client'}).data
+        self.assertEqual(data['client']['name'], 'Acme')
+        self.assertEqual(len(data['items']), 2)
+        self.assertEqual(len(data['payments']), 2)
+        self.assertEqual(data['amount_paid'], '30.00') # failed payments do not count
+        self.assertEqual(data['balance'], '70.00')
+
+    def test_plain_list_is_single_query(self):
+        with self.assertNumQueries(2): # ETag counters + invoices
+            data = self.api.get(reverse('invoice-list-create')).data
+        self.assertNotIn('items', data['results'][0])
+        self.assertIsInstance(data['results'][0]['client'], int)
+
+    def test_unknown_expansion_is_rejected(self):
+        response = self.api.get(reverse('invoice-list-create'), {'expand': 'time_entries'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_changelists_do_not_query_per_row(self):
+        self.client.force_login(self.admin)
+        for model in ('invoiceitem', 'payment'):
+            url = reverse(f'admin:accounts_{model}_changelist')
+            with self.subTest(model=model), self.assertNumQueries(5): # session, user, 2 counts, rows joined to invoices
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False}) # audit rows must be written inside the test transaction
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('pager', 'pager@example.com', 'pw')
+        cls.clients = [Client.objects.create(user=cls.user, name=f'Client {n}') for n in range(5)]
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.url = reverse('client-list-create')
+
+    def names(self, response):
+        return [row['name'] for row in response.data['results']]
+
+    def test_next_then_previous_round_trips(self):
+        first = self.api.get(self.url, {'page_size': 2})
+        self.assertEqual(self.names(first), ['Client 4', 'Client 3']) # newest first
+        self.assertIsNone(first.data['previous'])
+
+        second = self.api.get(first.data['next'])
+        self.assertEqual(self.names(second), ['Client 2', 'Client 1'])
+        last = self.api.get(second.data['next'])
+        self.assertEqual(self.names(last), ['Client 0'])
+        self.assertIsNone(last.data['next'])
+
+        back = self.api.get(last.data['previous'])
+        self.assertEqual(self.names(back), self.names(second))
+        self.assertEqual(self.names(self.api.get(back.data['previous'])), self.names(first))
+
+    def test_ties_on_created_at_are_resolved_by_id(self):
+        Client.objects.filter(user=self.user).update(created_at=self.clients[0].created_at)
+        seen, url = [], self.url
+        while url:
+            response = self.api.get(url, {'page_size': 2} if url == self.url else None)
+            seen += self.names(response)
+            url = response.data['next']
+        self.assertEqual(seen, [f'Client {n}' for n in range(4, -1, -1)])
+
+    def test_page_size_is_clamped_to_the_maximum(self):
+        with mock.patch.object(KeysetPagination, 'max_page_size', 3):
+            response = self.api.get(self.url, {'page_size': 100000})
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_invalid_page_size_falls_back_to_the_default(self):
+        for value in ('0', '-1', 'all'):
+            response = self.api.get(self.url, {'page_size': value})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), 5)
+            self.assertIsNone(response.data['next'])
+
+    def test_garbled_cursor_is_not_found(self):
+        self.assertEqual(self.api.get(self.url, {'cursor': 'not-a-cursor'}).status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.client_row = Client.objects.create(user=cls.user, name='Acme')
+        Client.objects.create(user=cls.user, name='Globex')
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_list_not_modified_until_a_row_is_deleted(self):
+        url = reverse('client-list-create')
+        first = self.api.get(url)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(1): # only the ResourceVersion counters, nothing is serialized
+            cached = self.api.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], first['ETag'])
+
+        self.api.delete(reverse('client-detail-update-destroy', args=[self.client_row.pk]))
+        response = self.api.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_detail_validators_follow_updated_at(self):
+        url = reverse('client-detail-update-destroy', args=[self.client_row.pk])
+        first = self.api.get(url)
+        self.assertIn('Last-Modified', first)
+        self.assertEqual(self.api.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.api.patch(url, {'name': 'Acme Ltd', 'user': self.user.pk})
+        self.assertEqual(self.api.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+
+    def test_staff_payment_list_has_no_validators(self):
+        # staff list every user's payments, which their own ResourceVersion counters do not track
+        staff = CustomUser.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        invoice = Invoice.objects.create(user=self.user, client=self.client_row, invoice_number='CG-1', issue_date=date(2025, 1, 1),
+                                         due_date=date(2025, 1, 31), total_amount=Decimal('100.00'))
+        api = APIClient()
+        api.force_authenticate(staff)
+        url = reverse('payment-list-create')
+        first = api.get(url)
+        self.assertNotIn('ETag', first)
+        self.assertEqual(self.api.get(url).status_code, 200)
+        self.assertIn('ETag', self.api.get(url)) # the owner's own list is still validated
+
+        Payment.objects.create(user=self.user, invoice=invoice, amount=Decimal('10.00'), payment_date=datetime(2025, 1, 5, tzinfo=dt_timezone.utc))
+        response = api.get(url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), len(first.data) + 1)
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False})
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('async-owner', 'async@example.com', 'pw')
+        cls.token = Token.objects.create(user=cls.user)
+        for name in ('Acme', 'Globex', 'Initech'):
+            Client.objects.create(user=cls.user, name=name)
+
+    def setUp(self):
+        self.headers = {'Authorization': f'Token {self.token.key}'}
+
+    async def test_list_matches_sync_view(self):
+        expected = (await sync_to_async(APIClient().get)(reverse('client-list-create'), headers=self.headers)).json()
+        response = await self.async_client.get(reverse('async-client-list'), headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], expected['results'])
+
+        cached = await self.async_client.get(reverse('async-client-list'), headers={**self.headers, 'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(reverse('async-summary'))
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(reverse('async-summary'), headers={'Authorization': 'Token nope'})
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(CACHES={**settings.CACHES, 'tokens': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tokens'}})
+class TokenCacheTests(TestCase):
+    # the LocMem 'tokens' alias stands in for the shared tier every worker sees
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('tokened', 'tokened@example.com', 'pw')
+        cls.key = Token.objects.create(user=cls.user).key
+
+    def setUp(self):
+        authentication.token_cache.clear()
+        caches['tokens'].clear()
+
+    def authenticate(self):
+        return authentication.CachedTokenAuthentication().authenticate_credentials(self.key)[0]
+
+    def test_repeat_lookups_cost_no_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate().pk, self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate().pk, self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            authentication.invalidate_token(self.key)
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+    def test_local_entries_are_short_lived_without_a_shared_tier(self):
+        self.authenticate()
+        expires_at = authentication.token_cache._entries[self.key][0]
+        self.assertLessEqual(expires_at - time.monotonic(), authentication.cache_settings()['LOCAL_ONLY_TTL'])
+
+    def revoke_elsewhere(self, revoke):
+        # warm this worker's local tier, change the user or token as another worker would
+        # (invalidating there), then put this worker's stale local entries back
+        self.authenticate()
+        stale = dict(authentication.token_cache._entries)
+        with self.captureOnCommitCallbacks(execute=True):
+            revoke()
+        authentication.token_cache._entries.update(stale)
+
+    @override_settings(TOKEN_AUTH_CACHE={**settings.TOKEN_AUTH_CACHE, 'SHARED_CACHE': 'tokens'})
+    def test_revocation_reaches_other_workers_through_the_shared_tier(self):
+        def deactivate():
+            self.user.is_active = False
+            self.user.save()
+        self.revoke_elsewhere(deactivate)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+        self.user.is_active = True
+        self.user.save()
+        self.revoke_elsewhere(Token.objects.get(key=self.key).delete)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(TOKEN_AUTH_CACHE={**settings.TOKEN_AUTH_CACHE, 'SHARED_CACHE': 'tokens'})
+    def test_the_shared_tier_holds_no_password_hash_or_profile(self):
+        self.authenticate()
+        stored = caches['tokens'].get(authentication._shared_key(self.key))
+        self.assertNotIn(self.user.password, repr(stored))
+        self.assertNotIn(self.user.email, repr(stored))
+
+        authentication.token_cache.clear() # as on a worker that only has the shared entry
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+            self.assertEqual((user.pk, user.is_active, user.is_staff), (self.user.pk, True, False))
+        with self.assertNumQueries(1): # anything else is loaded on access
+            self.assertEqual(user.email, self.user.email)
+
+
+@skipUnless('replica' in settings.DATABASES, "needs a 'replica' database (payasyougo.test_settings)")
+@override_settings(
+    AUDIT_LOG={'ASYNC': False},
+    DATABASE_ROUTING={'REPLICAS': ['replica'], 'STICKY_SECONDS': 60, 'PIN_CACHE': 'default'},
+)
+class DatabaseRoutingTests(TestCase):
+    # Nothing replicates between the two test databases, so a read that went to the
+    # replica does not see rows written to the primary.  The tests run in one process,
+    # so the local 'default' cache can hold the pins (check_pin_cache rejects it in production).
+    databases = {'default', 'replica'} if 'replica' in settings.DATABASES else {'default'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('routed', 'routed@example.com', 'pw')
+        Client.objects.create(user=cls.user, name='Acme')
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_reads_use_the_replica_until_the_user_writes(self):
+        before = routers.stats().get('replica', {}).get('queries', 0)
+        response = self.api.get(reverse('client-list-create'))
+        self.assertEqual(response.data['results'], [])
+        self.assertGreater(routers.stats()['replica']['queries'], before)
+
+        self.api.post(reverse('client-list-create'), {'name': 'Globex', 'user': self.user.pk})
+        response = self.api.get(reverse('client-list-create'))
+        self.assertEqual(sorted(row['name'] for row in response.data['results']), ['Acme', 'Globex'])
+
+    def test_stickiness_expires(self):
+        with override_settings(DATABASE_ROUTING={'REPLICAS': ['replica'], 'STICKY_SECONDS': 0, 'PIN_CACHE': 'default'}):
+            self.api.post(reverse('client-list-create'), {'name': 'Globex', 'user': self.user.pk})
+            self.assertEqual(self.api.get(reverse('client-list-create')).data['results'], [])
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(Client.objects.filter(user=self.user).count(), 1)
+
+
+class PinCacheCheckTests(TestCase):
+    def errors(self, **routing):
+        with override_settings(DATABASE_ROUTING={'REPLICAS': ['replica'], **routing}):
+            return [error.id for error in routers.check_pin_cache()]
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'shared': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'pins'},
+    })
+    def test_replicas_need_a_shared_pin_cache(self):
+        self.assertEqual(self.errors(PIN_CACHE=None), ['accounts.E001'])
+        self.assertEqual(self.errors(PIN_CACHE='missing'), ['accounts.E002'])
+        self.assertEqual(self.errors(PIN_CACHE='default'), ['accounts.E003'])
+        self.assertEqual(self.errors(PIN_CACHE='shared'), [])
+        with override_settings(DATABASE_ROUTING={'REPLICAS': [], 'PIN_CACHE': None}):
+            self.assertEqual(routers.check_pin_cache(), [])
+
+    def test_without_a_pin_cache_reads_stay_on_the_primary(self):
+        with override_settings(DATABASE_ROUTING={'REPLICAS': ['replica'], 'PIN_CACHE': None}):
+            routers.pin(1)
+            self.assertTrue(routers.is_pinned(1))
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('searcher', 'searcher@example.com', 'pw')
+        cls.acme = Client.objects.create(user=cls.user, name='Acme Corp', email='billing@acme.example')
+        cls.invoice = Invoice.objects.create(
+            user=cls.user, client=cls.acme, invoice_number='INV-77', issue_date=date(2025, 3, 1),
+            due_date=date(2025, 3, 31), total_amount=Decimal('500.00'), notes='Acme database migration',
+        )
+        InvoiceItem.objects.create(invoice=cls.invoice, description='Schema rewrite', quantity=1, unit_price=500, amount=500)
+        cls.expense = Expense.objects.create(user=cls.user, description='Migration tooling licence', amount=Decimal('20.00'),
+                               category='Software', expense_date=date(2025, 3, 2))
+        other = CustomUser.objects.create_user('other', 'other@example.com', 'pw')
+        Client.objects.create(user=other, name='Acme Other')
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def search(self, q, **params):
+        response = self.api.get(reverse('search'), {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(row['type'], row['id']) for row in response.data['results']]
+
+    def test_all_terms_must_match_and_prefixes_count(self):
+        self.assertEqual(self.search('acme migration'), [('Invoice', self.invoice.pk)])
+        self.assertEqual(self.search('acm migr'), [('Invoice', self.invoice.pk)])
+        self.assertEqual(self.search('schema'), [('Invoice', self.invoice.pk)]) # line descriptions
+        self.assertEqual(self.search('acme', type='Client'), [('Client', self.acme.pk)])
+
+    def test_ranking_prefers_heavier_fields(self):
+        hits = self.search('migration')
+        self.assertEqual([entity_type for entity_type, _ in hits], ['Expense', 'Invoice'])
+
+    def test_index_follows_writes(self):
+        self.invoice.notes = 'Quarterly retainer'
+        self.invoice.save()
+        self.assertEqual(self.search('migration'), [('Expense', self.expense.pk)])
+        self.assertEqual(self.search('retainer'), [('Invoice', self.invoice.pk)])
+        self.invoice.delete()
+        self.assertEqual(self.search('retainer'), [])
+
+    def test_empty_query_is_rejected(self):
+        self.assertEqual(self.api.get(reverse('search'), {'q': ' - '}).status_code, 400)
+
+    @override_settings(AUDIT_LOG={'ASYNC': False})
+    def test_bulk_writes_are_indexed_when_the_insert_returns_no_ids(self):
+        # MySQL: bulk_create() leaves the primary keys unset
+        rows = [{'description': 'Courier parcels', 'amount': '9.00', 'expense_date': '2025-03-03'},
+                {'description': 'Courier letters', 'amount': '4.00', 'expense_date': '2025-03-04'}]
+        text = 'description,amount,expense_date\nCourier pallets,30.00,2025-03-05\n'
+        upload = SimpleUploadedFile('expenses.csv', text.encode('utf-8'), content_type='text/csv')
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            response = self.api.post(reverse('expense-bulk'), rows, format='json')
+            self.assertEqual(response.status_code, 201)
+            imported = self.api.post(reverse('import', args=['expenses']), {'file': upload}, format='multipart')
+            self.assertEqual(imported.data['created'], 1)
+
+        couriers = Expense.objects.filter(user=self.user, description__startswith='Courier')
+        self.assertEqual(sorted(self.search('courier')), sorted(('Expense', pk) for pk in couriers.values_list('pk', flat=True)))
+        self.assertEqual(len(couriers), 3)
+        self.assertEqual(list(couriers.filter(import_hash__isnull=False).values_list('description', flat=True)), ['Courier pallets'])
+
+
+class SparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('sparse', 'sparse@example.com', 'pw')
+        client = Client.objects.create(user=cls.user, name='Acme', email='ap@acme.example')
+        for i in range(3):
+            invoice = Invoice.objects.create(
+                user=cls.user, client=client, invoice_number=f'SP-{i}', issue_date=date(2025, 1, 1),
+                due_date=date(2025, 1, 31), total_amount=Decimal('99.999'), notes='Hosting' if i else None,
+            )
+            Payment.objects.create(invoice=invoice, user=cls.user, amount=Decimal('10.00'),
+                                   payment_date=datetime(2025, 1, 5, tzinfo=dt_timezone.utc), status='completed')
+        TimeEntry.objects.create(user=cls.user, client=client, start_time=datetime(2025, 1, 2, 9, tzinfo=dt_timezone.utc),
+                                 duration_minutes=90, hourly_rate=Decimal('80.5'))
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_fast_path_matches_the_serializer(self):
+        cases = [
+            ('invoice-list-create', InvoiceSerializer, with_balance(Invoice.objects.filter(user=self.user))),
+            ('timeentry-list-create', TimeEntrySerializer, TimeEntry.objects.filter(user=self.user)),
+            ('client-list-create', ClientSerializer, Client.objects.filter(user=self.user)),
+        ]
+        for name, serializer_class, queryset in cases:
+            with self.subTest(name):
+                expected = serializer_class(queryset.order_by('-created_at', '-id'), many=True).data
+                response = self.api.get(reverse(name))
+                self.assertEqual(json.loads(response.content)['results'], json.loads(json.dumps(expected, cls=JSONEncoder)))
+
+    def test_fields_narrow_the_response(self):
+        response = self.api.get(reverse('invoice-list-create'), {'fields': 'id,invoice_number,balance'})
+        self.assertEqual(list(response.data['results'][0]), ['id', 'balance', 'invoice_number']) # serializer order
+        self.assertEqual(response.data['results'][0]['balance'], '90.00')
+        self.assertEqual(self.api.get(reverse('invoice-list-create'), {'fields': 'id,secret'}).status_code, 400)
+
+    def test_expansions_use_the_serializer(self):
+        response = self.api.get(reverse('invoice-list-create'), {'fields': 'id,client', 'expand': 'client'})
+        self.assertEqual(response.data['results'][0]['client']['name'], 'Acme')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'client'})
+
+
+class RendererTests(TestCase):
+    def test_fast_json_matches_drf_byte_for_byte(self):
+        data = {
+            'amount': Decimal('1234.50'), 'tiny': Decimal('0.00001'), 'huge': 2 ** 70,
+            'at': datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            'local': datetime(2025, 1, 2, 3, 4, 5, tzinfo=dt_timezone(timedelta(hours=8))),
+            'day': date(2025, 1, 2), 'text': 'caf\u00e9 \u2028 ok', 'label': _('Not found.'), 'ids': (1, 2),
+        }
+        for payload in (data, [data], {'results': []}):
+            self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+
+    def test_floats_keep_their_value(self):
+        plain = {'rate': 1.5, 'share': 0.1, 'whole': 3.0, 'negative': -2.25}
+        self.assertEqual(FastJSONRenderer().render(plain), JSONRenderer().render(plain))
+        exponents = {'big': 1e16, 'small': 1e-7}
+        self.assertEqual(json.loads(FastJSONRenderer().render(exponents)), exponents)
+
+    def test_non_finite_decimals_raise_like_drf(self):
+        for value in (Decimal('NaN'), Decimal('Infinity')): # raw Decimals go through _orjson_default
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({'value': value})
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'value': value})
+
+    @skipUnless(orjson, 'orjson is not installed')
+    def test_native_float_differences_are_the_documented_ones(self):
+        self.assertEqual(FastJSONRenderer().render({'big': 1e16, 'small': 1e-7}), b'{"big":1e16,"small":1e-7}')
+        self.assertEqual(JSONRenderer().render({'big': 1e16, 'small': 1e-7}), b'{"big":1e+16,"small":1e-07}')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render({'value': float('nan')})
+        self.assertEqual(FastJSONRenderer().render({'value': float('nan')}), b'{"value":null}')
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack_is_negotiated(self):
+        user = CustomUser.objects.create_user('packer', 'packer@example.com', 'pw')
+        Client.objects.create(user=user, name='Acme')
+        api = APIClient()
+        api.force_authenticate(user)
+        response = api.get(reverse('client-list-create'), HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['results'][0]['name'], 'Acme')
+
+    def test_large_responses_are_gzipped(self):
+        user = CustomUser.objects.create_user('zipper', 'zipper@example.com', 'pw')
+        Client.objects.bulk_create(Client(user=user, name=f'Client {i}') for i in range(40))
+        api = APIClient()
+        api.force_authenticate(user)
+        response = api.get(reverse('client-list-create'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        small = api.get(reverse('summary'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+
+class TaxSetAsideTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('taxed', 'taxed@example.com', 'pw')
+        TaxEstimation.objects.create(user=cls.user, tax_percentage=Decimal('25.00'))
+        client = Client.objects.create(user=cls.user, name='Acme')
+        cls.invoice = Invoice.objects.create(user=cls.user, client=client, invoice_number='TAX-1', issue_date=date(2025, 1, 1),
+                                             due_date=date(2025, 1, 31), total_amount=Decimal('1000.00'), status='sent')
+
+    def estimation(self):
+        return TaxEstimation.objects.values_list('taxable_income', 'estimated_amount_set_aside').get(pk=self.user.pk)
+
+    def pay(self, amount, status='completed'):
+        return Payment.objects.create(user=self.user, invoice=self.invoice, amount=Decimal(amount), status=status,
+                                      payment_date=datetime(2025, 1, 10, tzinfo=dt_timezone.utc))
+
+    def test_set_aside_follows_payments_refunds_and_expenses(self):
+        payment = self.pay('1000.00', status='pending')
+        self.assertEqual(self.estimation(), (Decimal('0.00'), Decimal('0.00')))
+        payment.status = 'completed'
+        payment.save()
+        self.assertEqual(self.estimation(), (Decimal('1000.00'), Decimal('250.00')))
+
+        Expense.objects.create(user=self.user, description='Laptop', amount=Decimal('200.00'), expense_date=date(2025, 1, 12))
+        self.assertEqual(self.estimation(), (Decimal('800.00'), Decimal('200.00')))
+
+        payment.status = 'refunded'
+        payment.save()
+        self.assertEqual(self.estimation(), (Decimal('-200.00'), Decimal('0.00'))) # never negative
+        self.pay('400.00')
+        self.assertEqual(self.estimation(), (Decimal('200.00'), Decimal('50.00')))
+
+        incremental = self.estimation()
+        self.assertEqual(tax.reconcile(user_ids=[self.user.pk]), 0) # nothing for the full recompute to correct
+        self.assertEqual(self.estimation(), incremental)
+
+    def test_set_aside_is_assigned_before_taxable_income(self):
+        # MySQL evaluates SET left to right: assigning taxable_income first would compute
+        # the set-aside from the already incremented value
+        with CaptureQueriesContext(connection) as queries:
+            tax.apply_rollup_deltas({(self.user.pk, date(2025, 1, 1)): {'payments_received': Decimal('100.00')}})
+        sql = next(query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE'))
+        self.assertLess(sql.index('estimated_amount_set_aside'), sql.index(f"{connection.ops.quote_name('taxable_income')} ="))
+        self.assertEqual(self.estimation(), (Decimal('100.00'), Decimal('25.00')))
+
+
+@override_settings(
+    CACHES={**settings.CACHES, 'singletons': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'singletons'}},
+    USER_SINGLETON_CACHE={**settings.USER_SINGLETON_CACHE, 'SHARED_CACHE': 'singletons'},
+)
+class SingletonCacheTests(TestCase):
+    # the LocMem 'singletons' alias stands in for the shared tier every worker sees
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('cached', 'cached@example.com', 'pw')
+        TaxEstimation.objects.create(user=cls.user, tax_percentage=Decimal('20.00'), estimated_amount_set_aside=Decimal('10.00'))
+
+    def setUp(self):
+        for local in singletons.local_caches.values():
+            local.clear()
+        caches['singletons'].clear()
+
+    def set_aside(self):
+        return singletons.get_tax_estimation(self.user.pk).estimated_amount_set_aside
+
+    def test_repeat_reads_cost_no_query(self):
+        before = singletons.stats()['TaxEstimation']
+        with self.assertNumQueries(2):
+            self.assertEqual(self.set_aside(), Decimal('10.00'))
+            self.assertIsNone(singletons.get_setting(self.user.pk))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.set_aside(), Decimal('10.00'))
+            self.assertIsNone(singletons.get_setting(self.user.pk)) # "no row" is cached too
+        after = singletons.stats()['TaxEstimation']
+        self.assertEqual((after['hits'] - before['hits'], after['misses'] - before['misses']), (1, 1))
+
+    def test_writes_invalidate(self):
+        self.set_aside()
+        with self.captureOnCommitCallbacks(execute=True):
+            estimation = TaxEstimation.objects.get(pk=self.user.pk)
+            estimation.estimated_amount_set_aside = Decimal('20.00')
+            estimation.save()
+        self.assertEqual(self.set_aside(), Decimal('20.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tax.apply_rollup_deltas({(self.user.pk, date(2025, 1, 1)): {'payments_received': Decimal('500.00')}}) # queryset.update()
+        self.assertEqual(self.set_aside(), Decimal('100.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            estimation.delete()
+        self.assertIsNone(singletons.get_tax_estimation(self.user.pk))
+
+    def test_other_processes_local_copies_are_not_served(self):
+        self.set_aside()
+        local = singletons.local_caches[TaxEstimation]
+        stale = dict(local._entries)
+        with self.captureOnCommitCallbacks(execute=True):
+            TaxEstimation.objects.filter(pk=self.user.pk).update(estimated_amount_set_aside=Decimal('30.00'))
+            singletons.invalidate(TaxEstimation, [self.user.pk])
+        local._entries.update(stale) # as if this worker had not seen the invalidation
+        self.assertEqual(self.set_aside(), Decimal('30.00'))
+
+    @override_settings(USER_SINGLETON_CACHE={**settings.USER_SINGLETON_CACHE, 'SHARED_CACHE': None})
+    def test_without_a_shared_tier_tax_estimation_is_not_cached(self):
+        self.set_aside()
+        singletons.get_setting(self.user.pk)
+        with self.assertNumQueries(1): # the TaxEstimation; the Setting comes from the local tier
+            self.set_aside()
+            singletons.get_setting(self.user.pk)
+
+    @override_settings(USER_SINGLETON_CACHE={**settings.USER_SINGLETON_CACHE, 'SHARED_CACHE': None})
+    def test_repeat_reads_within_a_request_are_free(self):
+        from .middleware import SingletonMemoMiddleware
+
+        def view(request):
+            with self.assertNumQueries(1):
+                for _ in range(3):
+                    self.assertEqual(self.set_aside(), Decimal('10.00'))
+            with self.captureOnCommitCallbacks(execute=True):
+                TaxEstimation.objects.filter(pk=self.user.pk).update(estimated_amount_set_aside=Decimal('20.00'))
+                singletons.invalidate(TaxEstimation, [self.user.pk])
+            with self.assertNumQueries(1): # the request's own write dropped its entry
+                self.assertEqual(self.set_aside(), Decimal('20.00'))
+            return 'response'
+
+        middleware = SingletonMemoMiddleware(view)
+        self.assertEqual(middleware(None), 'response')
+        self.assertIsNone(singletons.request_memo.get())
+        TaxEstimation.objects.filter(pk=self.user.pk).update(estimated_amount_set_aside=Decimal('30.00'))
+        # nothing outlives the request: the next one reads the row again
+        self.assertEqual(self.set_aside(), Decimal('30.00'))
+
+
+class TimesheetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('timesheet', 'timesheet@example.com', 'pw')
+        Setting.objects.create(user=cls.user, timezone='America/New_York')
+        cls.acme = Client.objects.create(user=cls.user, name='Acme')
+        utc = dt_timezone.utc
+        # Monday 2025-03-03 21:30 in New York, no duration_minutes: 90 minutes from start/end
+        TimeEntry.objects.create(user=cls.user, client=cls.acme, project_name='Site', hourly_rate=Decimal('80.00'),
+                                 start_time=datetime(2025, 3, 4, 2, 30, tzinfo=utc), end_time=datetime(2025, 3, 4, 4, 0, tzinfo=utc))
+        TimeEntry.objects.create(user=cls.user, client=cls.acme, project_name='Site', hourly_rate=Decimal('80.00'), is_billed=True,
+                                 start_time=datetime(2025, 3, 3, 15, 0, tzinfo=utc), duration_minutes=30)
+        TimeEntry.objects.create(user=cls.user, project_name='Admin', start_time=datetime(2025, 3, 10, 15, 0, tzinfo=utc), duration_minutes=60)
+        TimeEntry.objects.create(user=cls.user, project_name='Admin', start_time=datetime(2025, 4, 1, 15, 0, tzinfo=utc), duration_minutes=60)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_buckets_use_the_users_timezone(self):
+        timesheets.user_timezone(self.user.pk) # warm the Setting cache
+        with self.assertNumQueries(5): # totals + one GROUP BY per grouping, whatever the number of entries
+            response = self.api.get(reverse('timesheet'), {'from': '2025-03-01', 'to': '2025-03-31'})
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(data['timezone'], 'America/New_York')
+        self.assertEqual(data['totals'], {'entries': 3, 'hours': '3.00', 'billable_hours': '2.00', 'billed_hours': '0.50', 'billable_amount': '160.00'})
+        self.assertEqual([(row['date'], row['hours']) for row in data['days']], [('2025-03-03', '2.00'), ('2025-03-10', '1.00')])
+        self.assertEqual([(row['week'], row['start'], row['entries']) for row in data['weeks']], [('2025-W10', '2025-03-03', 2), ('2025-W11', '2025-03-10', 1)])
+        self.assertEqual([(row['client_name'], row['billable_amount']) for row in data['clients']], [('Acme', '160.00'), (None, '0.00')])
+        self.assertEqual([row['project_name'] for row in data['projects']], ['Site', 'Admin'])
+
+    def test_grouping_and_filters(self):
+        response = self.api.get(reverse('timesheet'), {'from': '2025-03-01', 'to': '2025-04-30', 'group': 'week', 'client': self.acme.pk})
+        self.assertEqual(list(response.data), ['from', 'to', 'timezone', 'totals', 'weeks'])
+        self.assertEqual(response.data['totals']['hours'], '2.00')
+        self.assertEqual(self.api.get(reverse('timesheet'), {'group': 'month'}).status_code, 400)
+        self.assertEqual(self.api.get(reverse('timesheet'), {'from': '2025-04-01', 'to': '2025-03-01'}).status_code, 400)
+
+
+class ProfitAndLossTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('ledger', 'ledger@example.com', 'pw')
+        client = Client.objects.create(user=cls.user, name='Acme')
+        invoice = Invoice.objects.create(user=cls.user, client=client, invoice_number='PL-1', issue_date=date(2025, 1, 10),
+                                         due_date=date(2025, 2, 10), total_amount=Decimal('1000.00'), status='sent',
+                                         payment_gateway_fee=Decimal('5.00'))
+        Payment.objects.create(invoice=invoice, user=cls.user, amount=Decimal('600.00'), fee_charged=Decimal('17.70'), status='completed',
+                               payment_date=datetime(2025, 1, 20, tzinfo=dt_timezone.utc))
+        Payment.objects.create(invoice=invoice, user=cls.user, amount=Decimal('400.00'), status='pending',
+                               payment_date=datetime(2025, 2, 20, tzinfo=dt_timezone.utc))
+        Expense.objects.create(user=cls.user, description='Hosting', amount=Decimal('50.00'), category='Software', expense_date=date(2025, 1, 3))
+        cls.travel = Expense.objects.create(user=cls.user, description='Train', amount=Decimal('30.00'), category='Travel', expense_date=date(2025, 2, 3))
+        Expense.objects.create(user=cls.user, description='Misc', amount=Decimal('10.00'), expense_date=date(2025, 2, 4))
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def report(self, **params):
+        with self.assertNumQueries(2):
+            response = self.api.get(reverse('report-profit-and-loss'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_monthly_income_expenses_and_net(self):
+        data = self.report(**{'from': '2025-01', 'to': '2025-12'})
+        self.assertEqual(data['months'][0], {
+            'month': '2025-01', 'payments_received': '600.00', 'fees': '22.70', 'income': '577.30',
+            'expenses': '50.00', 'expenses_by_category': {'Software': '50.00'}, 'net': '527.30',
+        })
+        self.assertEqual(data['months'][1]['expenses_by_category'], {'Travel': '30.00', 'Uncategorised': '10.00'})
+        self.assertEqual(data['totals']['net'], '487.30')
+
+    def test_buckets_follow_writes_and_rebuild_matches(self):
+        self.travel.category = 'Software'
+        self.travel.save()
+        before = self.report()
+        self.assertEqual(before['months'][1]['expenses_by_category'], {'Software': '30.00', 'Uncategorised': '10.00'})
+        rollups.rebuild(user_ids=[self.user.pk])
+        self.assertEqual(self.report(), before)
+
+
+class ReceivablesAgingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('aging', 'aging@example.com', 'pw')
+        cls.acme = Client.objects.create(user=cls.user, name='Acme')
+        globex = Client.objects.create(user=cls.user, name='Globex')
+
+        def invoice(client, number, due, total, status='sent'):
+            return Invoice.objects.create(user=cls.user, client=client, invoice_number=number, issue_date=due - timedelta(days=30),
+                                          due_date=due, total_amount=Decimal(total), status=status)
+
+        as_of = date(2025, 6, 30)
+        invoice(cls.acme, 'AG-1', as_of + timedelta(days=5), '100.00') # current
+        invoice(cls.acme, 'AG-2', as_of, '200.00') # due today: 0-30
+        cls.partly_paid = invoice(cls.acme, 'AG-3', as_of - timedelta(days=45), '300.00')
+        invoice(globex, 'AG-4', as_of - timedelta(days=120), '400.00', status='overdue')
+        invoice(globex, 'AG-5', as_of - timedelta(days=70), '999.00', status='draft')
+        Payment.objects.create(invoice=cls.partly_paid, user=cls.user, amount=Decimal('50.00'), status='completed',
+                               payment_date=datetime(2025, 6, 1, tzinfo=dt_timezone.utc))
+        Payment.objects.create(invoice=cls.partly_paid, user=cls.user, amount=Decimal('250.00'), status='completed',
+                               payment_date=datetime(2025, 7, 15, tzinfo=dt_timezone.utc))
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def aging(self, as_of):
+        with self.assertNumQueries(1):
+            response = self.api.get(reverse('report-aging'), {'as_of': as_of})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_balances_are_bucketed_per_client(self):
+        data = self.aging('2025-06-30')
+        self.assertEqual(data['totals'], {
+            'invoices': 4, 'current': '100.00', 'days_0_30': '200.00', 'days_31_60': '250.00',
+            'days_61_90': '0.00', 'days_over_90': '400.00', 'total': '950.00',
+        })
+        self.assertEqual([(row['client_name'], row['total']) for row in data['clients']], [('Acme', '550.00'), ('Globex', '400.00')])
+
+    def test_as_of_ignores_later_payments_and_invoices(self):
+        later = self.aging('2025-07-31')
+        self.assertEqual(later['clients'][0]['client_name'], 'Globex')
+        self.assertEqual(later['totals']['days_31_60'], '200.00') # AG-2, now 31 days late; AG-3 is paid off
+        earlier = self.aging('2025-04-01')
+        self.assertEqual(earlier['totals']['total'], '400.00') # only AG-4 was issued by then
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False})
+class PaymentIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('payee', 'payee@example.com', 'pw')
+        client = Client.objects.create(user=cls.user, name='Acme')
+        for number in ('ING-1', 'ING-2'):
+            Invoice.objects.create(user=cls.user, client=client, invoice_number=number, issue_date=date(2025, 5, 1),
+                                   due_date=date(2025, 5, 31), total_amount=Decimal('500.00'), status='sent')
+        other = CustomUser.objects.create_user('stranger', 'stranger@example.com', 'pw')
+        other_invoice = Invoice.objects.create(user=other, client=Client.objects.create(user=other, name='Other'), invoice_number='OTH-1',
+                                               issue_date=date(2025, 5, 1), due_date=date(2025, 5, 31), total_amount=Decimal('10.00'))
+        Payment.objects.create(user=other, invoice=other_invoice, amount=Decimal('10.00'), transaction_id='tx-taken',
+                               payment_date=datetime(2025, 5, 2, tzinfo=dt_timezone.utc))
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def records(self, count, amount='100.00'):
+        return [
+            {'transaction_id': f'tx-{i}', 'invoice_number': f'ING-{i % 2 + 1}', 'amount': amount, 'status': 'completed',
+             'payment_date': '2025-05-10T12:00:00Z', 'fee_charged': '2.90'}
+            for i in range(count)
+        ]
+
+    def ingest(self, records):
+        return self.api.post(reverse('payment-ingest'), records, format='json')
+
+    def received(self):
+        return MonthlySummary.objects.get(user=self.user, month=date(2025, 5, 1)).payments_received
+
+    def test_resubmission_is_idempotent(self):
+        response = self.ingest(self.records(20))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['rejected']), (20, 0, 0))
+        self.assertEqual(self.received(), Decimal('2000.00'))
+
+        with self.assertNumQueries(4): # invoice numbers, then the stored transaction_ids inside a savepoint; nothing to write
+            report = payments.ingest(self.user, self.records(20))
+        self.assertEqual((report['created'], report['updated'], report['unchanged']), (0, 0, 20))
+
+        response = self.ingest(self.records(25, amount='120.00'))
+        self.assertEqual((response.data['created'], response.data['updated']), (5, 20))
+        self.assertEqual(Payment.objects.filter(user=self.user).count(), 25)
+        self.assertEqual(self.received(), Decimal('3000.00'))
+
+    def test_replayed_change_moves_the_rollups_once(self):
+        self.ingest(self.records(4))
+        changed = self.records(4, amount='150.00')
+        with CaptureQueriesContext(connection) as queries:
+            first = payments.ingest(self.user, changed)
+        replay = payments.ingest(self.user, changed)
+        self.assertEqual((first['updated'], replay['updated'], replay['unchanged']), (4, 0, 4))
+        if connection.features.has_select_for_update:
+            self.assertTrue(any('FOR UPDATE' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(self.received(), Decimal('600.00'))
+        expected = MonthlySummary.objects.values_list('payments_received', 'fees_amount').get(user=self.user, month=date(2025, 5, 1))
+        rollups.rebuild(user_ids=[self.user.pk])
+        self.assertEqual(MonthlySummary.objects.values_list('payments_received', 'fees_amount').get(user=self.user, month=date(2025, 5, 1)), expected)
+
+    def test_bad_rows_are_rejected_individually(self):
+        records = self.records(3)
+        records[0]['invoice_number'] = 'OTH-1' # another user's invoice
+        records[1]['transaction_id'] = 'tx-taken'
+        records.append(dict(records[2]))
+        response = self.ingest(records)
+        self.assertEqual((response.data['created'], response.data['rejected']), (1, 3))
+        self.assertEqual([error['index'] for error in response.data['errors']], [0, 1, 3])
+        self.assertEqual(Payment.objects.get(transaction_id='tx-taken').amount, Decimal('10.00'))
+        self.assertEqual(self.ingest(records[:2]).status_code, 400)
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False})
+class PaymentApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('payer', 'payer@example.com', 'pw')
+        own = Client.objects.create(user=cls.user, name='Acme')
+        cls.invoice = Invoice.objects.create(user=cls.user, client=own, invoice_number='OWN-1', issue_date=date(2025, 5, 1),
+                                             due_date=date(2999, 1, 1), total_amount=Decimal('100.00'), status='sent')
+        cls.payment = Payment.objects.create(user=cls.user, invoice=cls.invoice, amount=Decimal('10.00'), status='pending',
+                                             payment_date=datetime(2025, 5, 2, tzinfo=dt_timezone.utc))
+        victim = CustomUser.objects.create_user('victim', 'victim@example.com', 'pw')
+        cls.foreign = Invoice.objects.create(user=victim, client=Client.objects.create(user=victim, name='Other'),
+                                             invoice_number='VIC-1', issue_date=date(2025, 5, 1), due_date=date(2999, 1, 1),
+                                             total_amount=Decimal('100.00'), status='sent')
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_other_users_invoices_are_rejected(self):
+        data = {'invoice': self.foreign.pk, 'user': self.user.pk, 'amount': '100.00', 'status': 'completed',
+                'payment_date': '2025-05-10T12:00:00Z'}
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.api.post(reverse('payment-list-create'), data)
+            updated = self.api.patch(reverse('payment-detail-update-destroy', args=[self.payment.pk]), {'invoice': self.foreign.pk})
+        self.assertEqual((created.status_code, updated.status_code), (400, 400))
+        self.assertIn('invoice', created.data)
+        self.assertIn('invoice', updated.data)
+        self.assertFalse(Payment.objects.filter(invoice=self.foreign).exists())
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.status, 'sent')
+
+        created = self.api.post(reverse('payment-list-create'), {**data, 'invoice': self.invoice.pk})
+        self.assertEqual(created.status_code, 201)
+
+
+class ReconciliationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('reconciler', 'reconciler@example.com', 'pw')
+        cls.client_row = Client.objects.create(user=cls.user, name='Acme')
+
+    def invoice(self, number, total='100.00', status='sent', due=date(2025, 1, 31)):
+        return Invoice.objects.create(user=self.user, client=self.client_row, invoice_number=number, issue_date=date(2025, 1, 1),
+                                      due_date=due, total_amount=Decimal(total), status=status)
+
+    def pay(self, invoice, amount, status='completed', transaction_id=None):
+        return Payment.objects.create(user=self.user, invoice=invoice, amount=Decimal(amount), status=status, transaction_id=transaction_id,
+                                      payment_date=datetime(2025, 1, 15, tzinfo=dt_timezone.utc))
+
+    def test_payment_changes_settle_and_reopen_the_invoice(self):
+        invoice = self.invoice('REC-1')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pay(invoice, '40.00')
+            payment = self.pay(invoice, '60.00')
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.status, 'paid')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.status = 'refunded'
+            payment.save()
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.status, 'overdue') # due date has passed
+        self.assertEqual(AuditLog.objects.filter(entity_type='Invoice', entity_id=invoice.pk).count(), 2)
+
+    def test_moving_a_payment_reopens_the_invoice_it_paid(self):
+        first, second = self.invoice('REC-7', due=date(2999, 1, 1)), self.invoice('REC-8', due=date(2999, 1, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            payment = self.pay(first, '100.00')
+        api = APIClient()
+        api.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = api.patch(reverse('payment-detail-update-destroy', args=[payment.pk]), {'invoice': second.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        statuses = dict(Invoice.objects.filter(pk__in=[first.pk, second.pk]).values_list('invoice_number', 'status'))
+        self.assertEqual(statuses, {'REC-7': 'sent', 'REC-8': 'paid'})
+
+    def test_full_run_in_chunks_reports_discrepancies(self):
+        overpaid, underpaid, settled = self.invoice('REC-2'), self.invoice('REC-3'), self.invoice('REC-4', status='overdue')
+        draft = self.invoice('REC-5', status='draft')
+        reopened = self.invoice('REC-6', status='paid', due=date(2999, 1, 1))
+        for invoice, amount in ((overpaid, '120.00'), (underpaid, '30.00'), (settled, '100.00'), (draft, '100.00')):
+            self.pay(invoice, amount)
+
+        report = reconciliation.reconcile_all(user_ids=[self.user.pk], chunk_size=2)
+        self.assertEqual({name: report[name] for name in ('invoices', 'paid', 'reopened', 'overpaid', 'underpaid')},
+                         {'invoices': 4, 'paid': 2, 'reopened': 1, 'overpaid': 1, 'underpaid': 1})
+        self.assertEqual({row['invoice_number']: row['difference'] for row in report['discrepancies']}, {'REC-2': '20.00', 'REC-3': '-70.00'})
+        statuses = dict(Invoice.objects.filter(user=self.user).values_list('invoice_number', 'status'))
+        self.assertEqual(statuses, {'REC-2': 'paid', 'REC-3': 'sent', 'REC-4': 'paid', 'REC-5': 'draft', 'REC-6': 'sent'})
+        self.assertEqual(reconciliation.reconcile_all(user_ids=[self.user.pk])['paid'], 0) # nothing left to move
+
+
+class AuditArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('auditor', 'auditor@example.com', 'pw')
+        cls.other = CustomUser.objects.create_user('bystander', 'bystander@example.com', 'pw')
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = Path(root.name)
+        archive_config = override_settings(AUDIT_ARCHIVE={**settings.AUDIT_ARCHIVE, 'ROOT': root.name})
+        archive_config.enable()
+        self.addCleanup(archive_config.disable)
+
+    def log(self, user, when, action='update'):
+        row = AuditLog.objects.create(user=user, action=action, entity_type='Invoice', entity_id=1, ip_address='127.0.0.1')
+        AuditLog.objects.filter(pk=row.pk).update(timestamp=when) # timestamp is auto_now_add
+        row.timestamp = when
+        return row
+
+    def archive_month(self, year, month, limit=1000):
+        return audit_archive.archive_chunk(audit_archive.month_start(year, month), audit_archive.month_start(year, month + 1), limit)
+
+    def ids(self, rows):
+        return [row.id for row in rows]
+
+    def test_segment_round_trip_and_checksum(self):
+        mine = [self.log(self.user, datetime(2024, 1, day, tzinfo=dt_timezone.utc)) for day in (3, 1, 2)]
+        theirs = self.log(self.other, datetime(2024, 1, 2, tzinfo=dt_timezone.utc), action='delete')
+        self.assertEqual(self.archive_month(2024, 1), 4)
+        self.assertFalse(AuditLog.objects.exists())
+
+        segment = AuditArchiveSegment.objects.get()
+        data = (self.root / segment.path).read_bytes()
+        self.assertEqual((segment.row_count, segment.size_bytes, segment.month), (4, len(data), date(2024, 1, 1)))
+        self.assertEqual(segment.sha256, hashlib.sha256(data).hexdigest())
+
+        entry = segment.entries.get(user_id=self.user.pk)
+        self.assertEqual((entry.row_count, entry.min_timestamp, entry.max_timestamp), (3, mine[1].timestamp, mine[0].timestamp))
+        rows = audit_archive._read(segment.path, entry.offset, entry.length) # only this user's gzip member
+        self.assertEqual(sorted(self.ids(rows)), sorted(self.ids(mine)))
+        self.assertEqual({(row.timestamp, row.action, row.ip_address) for row in rows},
+                         {(row.timestamp, row.action, row.ip_address) for row in mine})
+        self.assertEqual(len(audit_archive._read(segment.path)), 4) # the members concatenate into one gzip stream
+        self.assertEqual(self.ids(audit_archive.ArchiveQuery(user_id=self.other.pk)), [theirs.id])
+
+    def test_archive_query_merges_segments_in_keyset_order(self):
+        rows = [self.log(self.user, datetime(2024, 1, day, 12, tzinfo=dt_timezone.utc)) for day in range(1, 8)]
+        rows.append(self.log(self.user, rows[3].timestamp, action='create')) # tie on the timestamp
+        self.other_row = self.log(self.other, datetime(2024, 1, 5, tzinfo=dt_timezone.utc))
+        while self.archive_month(2024, 1, limit=3):
+            pass
+        self.assertEqual(AuditArchiveSegment.objects.count(), 3)
+
+        newest_first = sorted(rows, key=audit_archive.rank)
+        self.assertEqual(self.ids(audit_archive.ArchiveQuery(user_id=self.user.pk)), self.ids(newest_first))
+        self.assertEqual(self.ids(audit_archive.ArchiveQuery(user_id=self.user.pk, reverse=True)), self.ids(reversed(newest_first)))
+
+        boundary = newest_first[2]
+        cursor = {'t': boundary.timestamp, 'i': boundary.id}
+        self.assertEqual(self.ids(audit_archive.ArchiveQuery(user_id=self.user.pk, cursor=cursor)), self.ids(newest_first[3:]))
+        self.assertEqual(self.ids(audit_archive.ArchiveQuery(user_id=self.user.pk, cursor=cursor, reverse=True)),
+                         self.ids(reversed(newest_first[:2])))
+        self.assertEqual(self.ids(audit_archive.ArchiveQuery(user_id=self.user.pk, action='create')), [rows[-1].id])
+        since, until = datetime(2024, 1, 3, tzinfo=dt_timezone.utc), datetime(2024, 1, 5, tzinfo=dt_timezone.utc)
+        self.assertEqual(self.ids(audit_archive.ArchiveQuery(since=since, until=until)), # every user, time-bounded
+                         self.ids(sorted([row for row in rows if since <= row.timestamp <= until]
+                                         + [self.other_row], key=audit_archive.rank)))
+
+    def test_merge_tiers_interleaves_hot_and_archived_rows(self):
+        archived = [self.log(self.user, datetime(2024, 1, day, tzinfo=dt_timezone.utc)) for day in (1, 2, 3)]
+        self.archive_month(2024, 1)
+        hot = [self.log(self.user, datetime(2024, 2, day, tzinfo=dt_timezone.utc)) for day in (1, 2)]
+        hot.append(self.log(self.user, datetime(2024, 1, 2, 12, tzinfo=dt_timezone.utc))) # a late write into an archived month
+        hot_rows = sorted(hot, key=audit_archive.rank)
+
+        merged = audit_archive.merge_tiers(hot_rows, audit_archive.ArchiveQuery(user_id=self.user.pk), 5)
+        expected = sorted(archived + hot, key=audit_archive.rank)
+        self.assertEqual(self.ids(merged), self.ids(expected[:5]))
+
+        with mock.patch.object(audit_archive, '_read') as read:
+            page = audit_archive.merge_tiers(hot_rows, audit_archive.ArchiveQuery(user_id=self.user.pk), 2)
+        read.assert_not_called() # the full hot page sorts before every archived row
+        self.assertEqual(self.ids(page), self.ids(hot_rows[:2]))
+
+    def test_audit_log_list_pages_across_tiers(self):
+        rows = [self.log(self.user, datetime(2024, 1, day, tzinfo=dt_timezone.utc)) for day in (1, 2, 3)]
+        self.archive_month(2024, 1)
+        rows += [self.log(self.user, datetime(2024, 2, day, tzinfo=dt_timezone.utc)) for day in (1, 2)]
+        self.log(self.other, datetime(2024, 2, 3, tzinfo=dt_timezone.utc))
+        api = APIClient()
+        api.force_authenticate(self.user)
+
+        seen, response = [], api.get(reverse('auditlog-list'), {'page_size': 2})
+        while True:
+            seen += [row['id'] for row in response.data['results']]
+            if not response.data['next']:
+                break
+            response = api.get(response.data['next'])
+        self.assertEqual(seen, self.ids(sorted(rows, key=audit_archive.rank)))
+        back = api.get(response.data['previous'])
+        self.assertEqual([row['id'] for row in back.data['results']], seen[2:4])
+
+    def test_retention_archives_old_months_and_drops_expired_rows(self):
+        now = timezone.now()
+        current = self.log(self.user, now)
+        recent = self.log(self.user, audit_archive.months_ago(2, now) + timedelta(days=1))
+        old = [self.log(self.user, audit_archive.months_ago(4, now) + timedelta(days=day)) for day in (1, 2)]
+        self.log(self.user, audit_archive.months_ago(90, now) + timedelta(days=1)) # past retention
+        call_command('audit_retention', '--hot-months=3', '--retention-months=84', stdout=StringIO())
+
+        # only the rows now in a segment left the table; the expired one is gone from both tiers
+        self.assertEqual(set(AuditLog.objects.values_list('id', flat=True)), {current.id, recent.id})
+        self.assertEqual(AuditArchiveSegment.objects.count(), 1)
+        self.assertEqual(self.ids(audit_archive.ArchiveQuery(user_id=self.user.pk)), self.ids(sorted(old, key=audit_archive.rank)))
+
+        out = StringIO()
+        call_command('audit_retention', '--hot-months=3', stdout=out)
+        self.assertIn('Archived 0 rows into 0 segments', out.getvalue())
+        self.assertEqual(AuditArchiveSegment.objects.count(), 1)
+
+    def test_retention_drops_expired_segments(self):
+        old = self.log(self.user, audit_archive.months_ago(10) + timedelta(days=1))
+        call_command('audit_retention', '--hot-months=3', '--retention-months=12', stdout=StringIO())
+        path = self.root / AuditArchiveSegment.objects.get().path
+        self.assertTrue(path.exists())
+
+        call_command('audit_retention', '--hot-months=3', '--retention-months=6', stdout=StringIO())
+        self.assertFalse(AuditArchiveSegment.objects.exists())
+        self.assertFalse(path.exists())
+        self.assertEqual(list(audit_archive.ArchiveQuery(user_id=old.user_id)), [])
+
+
+class AuditWriterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('writer', 'writer@example.com', 'pw')
+
+    def writer(self, queue_size=100, batch_size=2):
+        writer = audit.AuditWriter(queue_size=queue_size, batch_size=batch_size, flush_interval_ms=10, asynchronous=True)
+        patcher = mock.patch.object(writer, '_ensure_thread') # drained by flush() from the test thread
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return writer
+
+    def submit(self, writer, count):
+        for n in range(count):
+            writer.submit(AuditLog(user=self.user, action=f'action {n}'))
+
+    def test_flush_writes_the_queue_in_batches(self):
+        writer = self.writer()
+        self.submit(writer, 5)
+        self.assertFalse(AuditLog.objects.exists()) # nothing is written on the request thread
+        with self.assertNumQueries(3):
+            writer.flush()
+        self.assertEqual(AuditLog.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(writer.stats(), {'queued': 0, 'enqueued': 5, 'written': 5, 'dropped': 0, 'failed': 0, 'flushes': 3})
+
+    def test_full_queue_drops_and_counts(self):
+        writer = self.writer(queue_size=3)
+        self.submit(writer, 5)
+        self.assertEqual(writer.stats()['queued'], 3)
+        writer.flush()
+        self.assertEqual(list(AuditLog.objects.order_by('id').values_list('action', flat=True)), ['action 0', 'action 1', 'action 2'])
+        self.assertEqual((writer.written, writer.dropped), (3, 2))
+
+    def test_failed_batches_are_counted(self):
+        writer = self.writer()
+        self.submit(writer, 3)
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=RuntimeError('database is gone')), \
+                self.assertLogs('accounts.audit', 'ERROR'):
+            writer.flush()
+        self.assertEqual((writer.written, writer.failed), (0, 3))
+
+    def test_counters_stay_exact_under_concurrent_submits(self):
+        writer = self.writer(queue_size=1000)
+        threads = [threading.Thread(target=self.submit, args=(writer, 500)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((writer.enqueued, writer.dropped), (1000, 1000))
+
+    def test_background_thread_batches_until_shutdown(self):
+        writer = audit.AuditWriter(queue_size=100, batch_size=2, flush_interval_ms=10, asynchronous=True)
+        batches = []
+        with mock.patch.object(writer, '_write', side_effect=batches.append):
+            self.submit(writer, 5)
+            writer.shutdown()
+        self.assertFalse(writer._thread.is_alive())
+        self.assertEqual(sum(len(batch) for batch in batches), 5)
+        self.assertLessEqual(max(len(batch) for batch in batches), 2)
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False})
+class AuditLogMiddlewareTests(TransactionTestCase):
+    # autocommit, as in production: the signal receivers record on commit, before the middleware finishes
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('audited', 'audited@example.com', 'pw')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def entries(self):
+        return list(AuditLog.objects.order_by('id').values_list('action', 'entity_type', 'entity_id', 'user_id', 'ip_address'))
+
+    def test_model_writes_get_one_entry_per_row(self):
+        response = self.api.post(reverse('client-list-create'), {'name': 'Initech', 'user': self.user.pk}, REMOTE_ADDR='10.0.0.7')
+        self.assertEqual(response.status_code, 201)
+        pk = response.data['id']
+        self.api.delete(reverse('client-detail-update-destroy', args=[pk]), REMOTE_ADDR='10.0.0.7')
+        self.assertEqual(self.entries(), [
+            ('create', 'Client', pk, self.user.pk, '10.0.0.7'),
+            ('delete', 'Client', pk, self.user.pk, '10.0.0.7'),
+        ]) # no request-level entries on top
+
+    def test_writes_without_signals_get_a_request_level_entry(self):
+        rows = [{'description': 'Train', 'amount': '12.50', 'expense_date': '2025-01-02'}] * 2
+        response = self.api.post(reverse('expense-bulk'), rows, format='json', REMOTE_ADDR='10.0.0.8')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.entries(), [('POST expense-bulk', 'Expense', None, self.user.pk, '10.0.0.8')])
+
+    def test_reads_and_rejected_writes_are_not_audited(self):
+        self.api.get(reverse('client-list-create'))
+        self.assertEqual(self.api.post(reverse('client-list-create'), {}).status_code, 400)
+        with override_settings(AUDIT_LOG={'ASYNC': False, 'ENABLED': False}):
+            self.api.post(reverse('client-list-create'), {'name': 'Hooli', 'user': self.user.pk})
+        self.assertEqual(self.entries(), [])
+
+
+class OverdueSweepTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('sweeper', 'sweeper@example.com', 'pw')
+        cls.client_row = Client.objects.create(user=cls.user, name='Acme')
+
+    def invoice(self, number, due, status='sent'):
+        return Invoice.objects.create(user=self.user, client=self.client_row, invoice_number=number, issue_date=date(2025, 1, 1),
+                                      due_date=due, total_amount=Decimal('100.00'), status=status)
+
+    def statuses(self):
+        return dict(Invoice.objects.values_list('invoice_number', 'status'))
+
+    def test_only_past_due_sent_invoices_move(self):
+        today = date(2025, 3, 1)
+        late = [self.invoice(f'OD-{n}', date(2025, 2, 20 + n)) for n in range(3)]
+        self.invoice('OD-today', today)
+        self.invoice('OD-draft', date(2025, 1, 31), status='draft')
+        self.invoice('OD-paid', date(2025, 1, 31), status='paid')
+
+        self.assertEqual(overdue.sweep_overdue(today=today, chunk_size=2), 3)
+        self.assertEqual(self.statuses(), {'OD-0': 'overdue', 'OD-1': 'overdue', 'OD-2': 'overdue',
+                                           'OD-today': 'sent', 'OD-draft': 'draft', 'OD-paid': 'paid'})
+        logged = AuditLog.objects.filter(action=overdue.ACTION)
+        self.assertEqual(sorted(logged.values_list('entity_type', 'entity_id', 'user_id')),
+                         sorted(('Invoice', invoice.pk, self.user.pk) for invoice in late))
+        self.assertEqual(overdue.sweep_overdue(today=today), 0) # nothing left, nothing logged twice
+        self.assertEqual(logged.count(), 3)
+
+    def test_scheduler_runs_the_configured_sweep(self):
+        self.invoice('OD-job', date(2000, 1, 1))
+        jobs = {'sweep_overdue': {'callable': 'accounts.overdue.sweep_overdue', 'interval': 3600}}
+        with override_settings(SCHEDULER={'ENABLED': False, 'JOBS': jobs}):
+            sweeper, = scheduler.scheduler_from_settings().jobs
+        broken = scheduler.Job('broken', mock.Mock(side_effect=RuntimeError('boom')), 60)
+        runner = scheduler.Scheduler([sweeper, broken])
+        with mock.patch('accounts.scheduler.close_old_connections'): # keep the test transaction's connection
+            runner.run_job(sweeper)
+            with self.assertLogs('accounts.scheduler', 'ERROR'):
+                runner.run_job(broken)
+        self.assertEqual((sweeper.runs, sweeper.failures, sweeper.last_result), (1, 0, 1))
+        self.assertEqual((broken.runs, broken.failures), (1, 1))
+        self.assertEqual(self.statuses(), {'OD-job': 'overdue'})
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False})
+class CsvImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('importer', 'importer@example.com', 'pw')
+        Client.objects.create(user=cls.user, name='Acme')
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def upload(self, resource, text, encoding='utf-8'):
+        upload = SimpleUploadedFile(f'{resource}.csv', text.encode(encoding), content_type='text/csv')
+        return self.api.post(reverse('import', args=[resource]), {'file': upload}, format='multipart')
+
+    def expenses(self, *amounts):
+        return 'description,amount,expense_date\n' + ''.join(f'Taxi,{amount},2025-01-0{n + 1}\n' for n, amount in enumerate(amounts))
+
+    def test_import_reports_created_duplicates_and_errors(self):
+        text = self.expenses('10.00', '20.00', 'lots', '10.00') + 'Taxi,10.00,2025-01-01\n' # last row repeats the first
+        response = self.upload('expenses', text)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({name: response.data[name] for name in ('rows', 'created', 'duplicates')}, {'rows': 5, 'created': 3, 'duplicates': 1})
+        self.assertEqual([error['line'] for error in response.data['errors']], [4])
+        self.assertIn('amount', response.data['errors'][0]['errors'])
+        self.assertEqual(MonthlySummary.objects.get(user=self.user).expenses_amount, Decimal('40.00'))
+
+        again = self.upload('expenses', text) # re-running the same file is a no-op
+        self.assertEqual((again.data['created'], again.data['duplicates']), (0, 4))
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 3)
+
+    def test_duplicates_across_batches_are_caught_by_the_database(self):
+        text = self.expenses('1.00', '2.00', '3.00') + 'Taxi,1.00,2025-01-01\n'
+        with override_settings(IMPORT_BATCH_SIZE=2):
+            response = self.upload('expenses', text)
+        self.assertEqual((response.data['created'], response.data['duplicates']), (3, 1))
+
+    def test_rows_committed_by_a_concurrent_import_count_as_duplicates(self):
+        text = self.expenses('5.00', '6.00', '7.00')
+        second_row = imports._clean({'description': 'Taxi', 'amount': '6.00', 'expense_date': '2025-01-02'})
+        check = imports._existing_hashes
+
+        def racing_check(model, user, digests):
+            # the other import commits the second row between our duplicate check and the INSERT
+            if not Expense.objects.exists():
+                Expense.objects.create(user=user, description='Taxi', amount=Decimal('6.00'), expense_date=date(2025, 1, 2),
+                                       import_hash=imports.row_hash(second_row))
+                return set()
+            return check(model, user, digests)
+
+        with mock.patch.object(imports, '_existing_hashes', side_effect=racing_check):
+            response = self.upload('expenses', text)
+        self.assertEqual((response.data['created'], response.data['duplicates']), (2, 1))
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(MonthlySummary.objects.get(user=self.user).expenses_amount, Decimal('18.00')) # the failed INSERT left no rollup
+
+    def test_time_entries_resolve_client_names(self):
+        text = ('client,description,start_time,duration_minutes\n'
+                'acme ,Design,2025-01-02T09:00:00Z,90\n'
+                'Globex,Build,2025-01-03T09:00:00Z,30\n')
+        response = self.upload('time-entries', text)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'], [{'line': 3, 'errors': {'client': ["Unknown client 'Globex'."]}}])
+        self.assertEqual(TimeEntry.objects.get(user=self.user).client.name, 'Acme')
+
+    def test_rejected_uploads(self):
+        self.assertEqual(self.upload('invoices', self.expenses('1.00')).status_code, 404)
+        self.assertEqual(self.api.post(reverse('import', args=['expenses']), {}, format='multipart').status_code, 400)
+        self.assertEqual(self.upload('expenses', 'description,amount\nCafé,1.00\n', encoding='latin-1').status_code, 400)
+
+
+class MonthlySummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('summarised', 'summarised@example.com', 'pw')
+        cls.client_row = Client.objects.create(user=cls.user, name='Acme')
+
+    def buckets(self):
+        summaries = {row.pop('month'): row for row in MonthlySummary.objects.filter(user=self.user).values('month', *rollups.SUMMARY_FIELDS)}
+        categories = {(month, category): amount for month, category, amount in MonthlyExpenseCategory.objects
+                      .filter(user=self.user).exclude(amount=0).values_list('month', 'category', 'amount')}
+        return summaries, categories
+
+    def assertMatchesRebuild(self):
+        # the incremental buckets equal a recomputation from the source tables (empty buckets aside)
+        summaries, categories = self.buckets()
+        summaries = {month: row for month, row in summaries.items() if any(row.values())}
+        rollups.rebuild(user_ids=[self.user.pk])
+        self.assertEqual((summaries, categories), self.buckets())
+
+    def field(self, month, name):
+        return MonthlySummary.objects.filter(user=self.user, month=month).values_list(name, flat=True).first()
+
+    def test_invoices_count_once_issued(self):
+        invoice = Invoice.objects.create(user=self.user, client=self.client_row, invoice_number='MS-1', issue_date=date(2025, 1, 10),
+                                         due_date=date(2025, 2, 10), total_amount=Decimal('100.00'), payment_gateway_fee=Decimal('3.00'))
+        self.assertIsNone(self.field(date(2025, 1, 1), 'invoiced_amount')) # drafts are not invoiced
+        invoice.status = 'sent'
+        invoice.save()
+        self.assertEqual((self.field(date(2025, 1, 1), 'invoiced_amount'), self.field(date(2025, 1, 1), 'fees_amount')),
+                         (Decimal('100.00'), Decimal('3.00')))
+
+        invoice.issue_date = date(2025, 2, 1)
+        invoice.total_amount = Decimal('150.00')
+        invoice.save()
+        self.assertEqual(self.field(date(2025, 1, 1), 'invoiced_amount'), 0)
+        self.assertEqual(self.field(date(2025, 2, 1), 'invoiced_amount'), Decimal('150.00'))
+        self.assertMatchesRebuild()
+
+        invoice.delete()
+        self.assertEqual(self.field(date(2025, 2, 1), 'invoiced_amount'), 0)
+        self.assertMatchesRebuild()
+
+    def test_payments_time_entries_and_expenses(self):
+        invoice = Invoice.objects.create(user=self.user, client=self.client_row, invoice_number='MS-2', issue_date=date(2025, 3, 1),
+                                         due_date=date(2025, 3, 31), total_amount=Decimal('80.00'), status='sent')
+        payment = Payment.objects.create(user=self.user, invoice=invoice, amount=Decimal('80.00'), fee_charged=Decimal('2.00'),
+                                         payment_date=datetime(2025, 3, 5, tzinfo=dt_timezone.utc), status='completed')
+        entry = TimeEntry.objects.create(user=self.user, client=self.client_row, start_time=datetime(2025, 3, 2, 9, tzinfo=dt_timezone.utc),
+                                         end_time=datetime(2025, 3, 2, 10, 30, tzinfo=dt_timezone.utc))
+        expense = Expense.objects.create(user=self.user, description='Train', amount=Decimal('12.50'), expense_date=date(2025, 3, 3), category='Travel')
+        march = date(2025, 3, 1)
+        self.assertEqual((self.field(march, 'payments_received'), self.field(march, 'tracked_minutes'),
+                          self.field(march, 'billed_minutes'), self.field(march, 'expenses_amount')),
+                         (Decimal('80.00'), 90, 0, Decimal('12.50')))
+        self.assertEqual(self.buckets()[1], {(march, 'Travel'): Decimal('12.50')})
+
+        payment.status = 'refunded'
+        payment.save()
+        entry.is_billed = True
+        entry.save(update_fields=['is_billed'])
+        expense.category = 'Meals'
+        expense.save()
+        self.assertEqual((self.field(march, 'payments_received'), self.field(march, 'billed_minutes')), (0, 90))
+        self.assertEqual(self.buckets()[1], {(march, 'Meals'): Decimal('12.50')})
+        self.assertMatchesRebuild()
+
+        for row in (payment, entry, expense, invoice):
+            row.delete()
+        self.assertMatchesRebuild()
+        self.assertFalse(any(any(row.values()) for row in self.buckets()[0].values()))
+
+    def test_saves_that_leave_the_sources_alone_do_not_touch_the_buckets(self):
+        expense = Expense.objects.create(user=self.user, description='Train', amount=Decimal('12.50'), expense_date=date(2025, 3, 3))
+        expense.description = 'Train to the client'
+        with CaptureQueriesContext(connection) as queries:
+            expense.save(update_fields=['description'])
+        self.assertFalse([query for query in queries if MonthlySummary._meta.db_table in query['sql']])
+
+    def test_deleting_the_user_does_not_recreate_buckets(self):
+        Expense.objects.create(user=self.user, description='Train', amount=Decimal('12.50'), expense_date=date(2025, 3, 3))
+        self.user.delete()
+        self.assertFalse(MonthlySummary.objects.exists())
+        self.assertFalse(MonthlyExpenseCategory.objects.exists())
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False})
+class BulkWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('bulk', 'bulk@example.com', 'pw')
+        cls.other = CustomUser.objects.create_user('neighbour', 'neighbour@example.com', 'pw')
+        cls.client_row = Client.objects.create(user=cls.user, name='Acme')
+        cls.foreign_client = Client.objects.create(user=cls.other, name='Not yours')
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.url = reverse('expense-bulk')
+
+    def expense(self, amount='10.00', **fields):
+        return {'description': 'Taxi', 'amount': amount, 'expense_date': '2025-01-02', **fields}
+
+    def expenses_amount(self):
+        return MonthlySummary.objects.get(user=self.user, month=date(2025, 1, 1)).expenses_amount
+
+    def test_create_keeps_valid_rows_and_reports_the_rest(self):
+        rows = [self.expense('10.00'), self.expense('ten'), self.expense('5.50'), 'not a row']
+        inserts = f'INSERT INTO {connection.ops.quote_name(Expense._meta.db_table)}'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['amount'] for row in response.data['results']], ['10.00', '5.50'])
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 3])
+        self.assertIn('amount', response.data['errors'][0]['errors'])
+        self.assertEqual(len([query for query in queries if query['sql'].startswith(inserts)]), 1) # one bulk INSERT
+        self.assertEqual(set(Expense.objects.values_list('user_id', flat=True)), {self.user.pk})
+        self.assertEqual(self.expenses_amount(), Decimal('15.50'))
+
+        response = self.api.post(self.url, [self.expense('ten')], format='json')
+        self.assertEqual(response.status_code, 400) # nothing valid to write
+        self.assertEqual(response.data['results'], [])
+
+    def test_request_shape_and_row_limit(self):
+        self.assertEqual(self.api.post(self.url, self.expense(), format='json').status_code, 400) # not a list
+        with override_settings(BULK_MAX_ROWS=2):
+            response = self.api.post(self.url, [self.expense()] * 3, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(self.api.delete(self.url, {'ids': [1, 2, 3]}, format='json').status_code, 400)
+            self.assertEqual(self.api.post(self.url, [self.expense()] * 2, format='json').status_code, 201)
+        self.assertEqual(Expense.objects.count(), 2)
+
+    def test_update_only_touches_the_users_rows(self):
+        mine = [Expense.objects.create(user=self.user, description='Taxi', amount=Decimal('10.00'), expense_date=date(2025, 1, 2)) for _ in range(2)]
+        theirs = Expense.objects.create(user=self.other, description='Taxi', amount=Decimal('10.00'), expense_date=date(2025, 1, 2))
+        response = self.api.patch(self.url, [{'id': mine[0].pk, 'amount': '25.00'}, {'id': theirs.pk, 'amount': '1.00'},
+                                             {'amount': '1.00'}, {'id': mine[1].pk, 'amount': 'x'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], [mine[0].pk])
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3])
+        self.assertEqual(list(Expense.objects.order_by('pk').values_list('amount', flat=True)),
+                         [Decimal('25.00'), Decimal('10.00'), Decimal('10.00')])
+        self.assertEqual(self.expenses_amount(), Decimal('35.00'))
+
+    def test_repeated_ids_are_row_errors(self):
+        expense = Expense.objects.create(user=self.user, description='Taxi', amount=Decimal('10.00'), expense_date=date(2025, 1, 2))
+        response = self.api.patch(self.url, [{'id': expense.pk, 'amount': '25.00'}, {'id': expense.pk, 'amount': '30.00'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+        self.assertEqual(self.expenses_amount(), Decimal('25.00')) # counted once
+
+    def test_created_rows_come_back_with_ids_when_the_insert_returns_none(self):
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False): # MySQL
+            response = self.api.post(self.url, [self.expense('1.00'), self.expense('2.00')], format='json')
+        self.assertEqual(response.status_code, 201)
+        ids = [row['id'] for row in response.data['results']]
+        self.assertEqual(dict(Expense.objects.filter(pk__in=ids).values_list('pk', 'amount')), dict(zip(ids, [Decimal('1.00'), Decimal('2.00')])))
+        patched = self.api.patch(self.url, [{'id': ids[0], 'amount': '3.00'}], format='json')
+        self.assertEqual(patched.data['errors'], [])
+        self.assertEqual(self.api.delete(self.url, {'ids': ids}, format='json').data, {'deleted': 2})
+
+    def test_delete_only_removes_the_users_rows(self):
+        mine = Expense.objects.create(user=self.user, description='Taxi', amount=Decimal('10.00'), expense_date=date(2025, 1, 2))
+        theirs = Expense.objects.create(user=self.other, description='Taxi', amount=Decimal('10.00'), expense_date=date(2025, 1, 2))
+        self.assertEqual(self.api.delete(self.url, {'ids': [mine.pk, 'x']}, format='json').status_code, 400)
+        response = self.api.delete(self.url, {'ids': [mine.pk, theirs.pk]}, format='json')
+        self.assertEqual(response.data, {'deleted': 1})
+        self.assertEqual(list(Expense.objects.values_list('pk', flat=True)), [theirs.pk])
+        self.assertEqual(self.expenses_amount(), 0)
+
+    def test_time_entries_reject_other_users_clients(self):
+        rows = [{'client': self.client_row.pk, 'start_time': '2025-01-02T09:00:00Z', 'duration_minutes': 60},
+                {'client': self.foreign_client.pk, 'start_time': '2025-01-02T11:00:00Z', 'duration_minutes': 30}]
+        response = self.api.post(reverse('timeentry-bulk'), rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['errors'][0]['index'], 1)
+        self.assertIn('client', response.data['errors'][0]['errors'])
+        self.assertEqual(MonthlySummary.objects.get(user=self.user, month=date(2025, 1, 1)).tracked_minutes, 60)
+
+
+
+class QueryParamTests(TestCase):
+    def test_datetime_params_accept_bare_dates_as_whole_days(self):
+        params = {'from': '2025-01-02', 'to': '2025-01-02', 'at': '2025-01-02T10:30:00Z'}
+        self.assertEqual(datetime_param(params, 'from'), datetime(2025, 1, 2, tzinfo=dt_timezone.utc))
+        self.assertEqual(datetime_param(params, 'to', end_of_day=True), datetime(2025, 1, 2, 23, 59, 59, 999999, tzinfo=dt_timezone.utc))
+        self.assertEqual(datetime_param(params, 'at', end_of_day=True), datetime(2025, 1, 2, 10, 30, tzinfo=dt_timezone.utc))
+        for value in ('2025-02-30', 'soon'):
+            with self.assertRaises(ValidationError):
+                datetime_param({'to': value}, 'to', end_of_day=True)
+
+    def test_time_entry_range_includes_the_last_day(self):
+        user = CustomUser.objects.create_user('ranged', 'ranged@example.com', 'pw')
+        TimeEntry.objects.create(user=user, start_time=datetime(2025, 1, 2, 9, tzinfo=dt_timezone.utc), duration_minutes=30)
+        api = APIClient()
+        api.force_authenticate(user)
+        response = api.get(reverse('timeentry-list-create'), {'start_after': '2025-01-02', 'start_before': '2025-01-02'})
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('exporter', 'exporter@example.com', 'pw')
+        other = CustomUser.objects.create_user('private', 'private@example.com', 'pw')
+        cls.expenses = [Expense.objects.create(user=cls.user, description=f'Taxi, seat {n}', amount=Decimal(f'{n}.50'),
+                                               expense_date=date(2025, 1, n + 1), category='Travel' if n % 2 else None)
+                        for n in range(5)]
+        Expense.objects.create(user=other, description='Hidden', amount=Decimal('1.00'), expense_date=date(2025, 1, 2))
+        client = Client.objects.create(user=cls.user, name='Acme')
+        cls.entry = TimeEntry.objects.create(user=cls.user, client=client, start_time=datetime(2025, 1, 2, 9, 30, tzinfo=dt_timezone.utc),
+                                             duration_minutes=45, hourly_rate=Decimal('80.00'))
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def export(self, resource, query=None, **headers):
+        response = self.api.get(reverse('export', args=[resource]), query, **headers)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_has_the_users_rows_in_the_date_range(self):
+        with override_settings(EXPORT_CHUNK_SIZE=2): # several primary-key chunks
+            response, body = self.export('expenses', {'format': 'csv', 'from': '2025-01-02', 'to': '2025-01-04'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="expenses.csv"')
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(list(rows[0]), [header for header, _ in exports.export_columns(Expense)])
+        self.assertNotIn('import_hash', rows[0])
+        self.assertEqual([row['id'] for row in rows], [str(expense.pk) for expense in self.expenses[1:4]])
+        self.assertEqual((rows[0]['description'], rows[0]['amount'], rows[0]['category'], rows[0]['is_reimbursable'], rows[0]['user']),
+                         ('Taxi, seat 1', '1.50', 'Travel', 'false', str(self.user.pk)))
+        self.assertEqual(rows[1]['category'], '') # None
+
+    def test_ndjson_lines_match_the_api_representation(self):
+        with override_settings(EXPORT_CHUNK_SIZE=2):
+            response, body = self.export('expenses', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(lines, [json.loads(JSONRenderer().render(ExpenseSerializer(expense).data)) for expense in self.expenses])
+
+        _, body = self.export('time-entries', {'format': 'ndjson', 'from': '2025-01-02', 'to': '2025-01-02'})
+        self.assertEqual(json.loads(body), json.loads(JSONRenderer().render(TimeEntrySerializer(self.entry).data)))
+
+    def test_negotiation_and_unknown_resources(self):
+        response, _ = self.export('expenses', HTTP_ACCEPT='text/csv')
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertEqual(self.api.get(reverse('export', args=['expenses']), HTTP_ACCEPT='application/json').status_code, 406)
+        self.assertEqual(self.api.get(reverse('export', args=['clients']), {'format': 'csv'}).status_code, 404)
+        self.assertEqual(APIClient().get(reverse('export', args=['expenses']), {'format': 'csv'}).status_code, 403)
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False})
+class BillTimeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('biller', 'biller@example.com', 'pw')
+        cls.client_row = Client.objects.create(user=cls.user, name='Acme')
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def entry(self, day, minutes=60, client=None, user=None, **fields):
+        return TimeEntry.objects.create(user=user or self.user, client=client or self.client_row, duration_minutes=minutes,
+                                        start_time=datetime(2025, 1, day, 9, tzinfo=dt_timezone.utc), **fields)
+
+    def bill(self, **data):
+        payload = {'client': self.client_row.pk, 'invoice_number': 'BT-1', 'issue_date': '2025-02-01', 'due_date': '2025-02-28', **data}
+        return self.api.post(reverse('invoice-bill-time'), payload, format='json')
+
+    def assertMatchesRebuildOf(self, summary):
+        rollups.rebuild(user_ids=[self.user.pk])
+        rebuilt = MonthlySummary.objects.get(user=self.user, month=summary.month)
+        self.assertEqual((summary.tracked_minutes, summary.billed_minutes), (rebuilt.tracked_minutes, rebuilt.billed_minutes))
+
+    def test_claims_only_the_clients_unbilled_time_in_range(self):
+        claimed = [self.entry(2, 90, project_name='Site', hourly_rate=Decimal('100.00')),
+                   self.entry(3, 30, project_name='Site', hourly_rate=Decimal('100.00')),
+                   self.entry(4, 45)] # billed at the default rate
+        left = [self.entry(1), # before start
+                self.entry(20), # after end
+                self.entry(5, is_billed=True), # already billed
+                self.entry(5, minutes=None), # still running
+                self.entry(5, client=Client.objects.create(user=self.user, name='Globex'))]
+
+        response = self.bill(start='2025-01-02T00:00:00Z', end='2025-01-10T00:00:00Z', hourly_rate='60.00', status='sent')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['billed_entries'], 3)
+        invoice = Invoice.objects.get(invoice_number='BT-1')
+        self.assertEqual(set(invoice.time_entries_billed.values_list('pk', flat=True)), {entry.pk for entry in claimed})
+        self.assertFalse(TimeEntry.objects.filter(pk__in=[entry.pk for entry in left], invoice__isnull=False).exists())
+        self.assertEqual(sorted(invoice.items.values_list('quantity', 'unit_price', 'amount')),
+                         [(Decimal('0.75'), Decimal('60.00'), Decimal('45.00')), (Decimal('2.00'), Decimal('100.00'), Decimal('200.00'))])
+        self.assertEqual((invoice.status, invoice.total_amount), ('sent', Decimal('245.00')))
+        summary = MonthlySummary.objects.get(user=self.user, month=date(2025, 1, 1))
+        self.assertEqual(summary.billed_minutes, 90 + 30 + 45 + 60) # plus the entry that was already billed
+        self.assertMatchesRebuildOf(summary)
+
+    def test_failures_roll_back_the_claim(self):
+        self.assertEqual(self.bill().status_code, 400) # nothing to bill
+        entry = self.entry(2) # no rate on the entry and no default
+        response = self.bill()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('hourly_rate', response.data)
+        self.assertFalse(Invoice.objects.exists())
+        entry.refresh_from_db()
+        self.assertEqual((entry.is_billed, entry.invoice_id), (False, None))
+        foreign = Client.objects.create(user=CustomUser.objects.create_user('x', 'x@example.com', 'pw'), name='Theirs')
+        self.assertIn('client', self.bill(client=foreign.pk, hourly_rate='50.00').data)
+
+    def test_query_count_does_not_depend_on_the_number_of_entries(self):
+        counts = []
+        for size in (2, 40):
+            user = CustomUser.objects.create_user(f'biller{size}', f'biller{size}@example.com', 'pw')
+            client = Client.objects.create(user=user, name='Acme')
+            for n in range(size):
+                self.entry(1 + n % 28, client=client, user=user, project_name=f'P{n % 2}', hourly_rate=Decimal('50.00'))
+            with CaptureQueriesContext(connection) as queries:
+                invoice = billing.bill_time(user, client, f'BT-{size}', date(2025, 2, 1), date(2025, 2, 28))
+            self.assertEqual(invoice.billed_entries, size)
+            self.assertEqual(invoice.items.count(), 2)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
@@ -0,0 +1,126 @@
+# PayAsYouGo/backend/accounts/timesheets.py
+#
+# Timesheet rollups for /api/timesheet/: hours and billable amounts per day,
+# ISO week, client and project over a date range, in the user's timezone.
+#
+# Every grouping is one GROUP BY query over TimeEntry, with the day / week
+# boundaries truncated by the database in the user's Setting.timezone and the
+# minutes taken from expressions.entry_minutes(), so entries without
+# duration_minutes are measured from start_time/end_time.  The work done in
+# Python is proportional to the number of buckets, not the number of entries.
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate, TruncWeek
+from django.utils import timezone
+
+from . import singletons
+from .expressions import entry_minutes
+from .models import TimeEntry
+
+CENTS = Decimal('0.01')
+
+GROUPINGS = ('day', 'week', 'client', 'project')
+
+
+def user_timezone(user_id):
+    """The user's Setting.timezone, or the site default when unset or unknown."""
+    setting = singletons.get_setting(user_id)
+    name = setting.timezone if setting is not None else None
+    if name:
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return timezone.get_default_timezone()
+
+
+def entries_between(user_id, start, end, tz):
+    """Entries whose start_time falls on the local days ``start``..``end`` (inclusive) in ``tz``."""
+    return TimeEntry.objects.filter(
+        user_id=user_id,
+        start_time__gte=datetime.combine(start, time.min, tzinfo=tz),
+        start_time__lt=datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+
+def _measures():
+    minutes = entry_minutes()
+    rated = Q(hourly_rate__isnull=False)
+    money = DecimalField(max_digits=20, decimal_places=2)
+    return {
+        'entries': Count('pk'),
+        'minutes': Coalesce(Sum(minutes), Value(0)),
+        'billable_minutes': Coalesce(Sum(Case(When(rated, then=minutes), default=Value(0), output_field=IntegerField())), Value(0)),
+        'billed_minutes': Coalesce(Sum(Case(When(is_billed=True, then=minutes), default=Value(0), output_field=IntegerField())), Value(0)),
+        # sum of minutes * rate; divided by 60 once per bucket so rounding happens once
+        'rate_minutes': Coalesce(Sum(minutes * F('hourly_rate'), output_field=money), Value(Decimal('0')), output_field=money),
+    }
+
+
+def _hours(minutes):
+    return f'{(Decimal(minutes) / 60).quantize(CENTS, ROUND_HALF_UP)}'
+
+
+def _bucket(row):
+    return {
+        'entries': row['entries'],
+        'hours': _hours(row['minutes']),
+        'billable_hours': _hours(row['billable_minutes']),
+        'billed_hours': _hours(row['billed_minutes']),
+        'billable_amount': f"{(Decimal(row['rate_minutes']) / 60).quantize(CENTS, ROUND_HALF_UP)}",
+    }
+
+
+def _by_day(entries, tz):
+    rows = entries.annotate(day=TruncDate('start_time', tzinfo=tz)).values('day').annotate(**_measures()).order_by('day')
+    return [{'date': row['day'].isoformat(), **_bucket(row)} for row in rows]
+
+
+def _by_week(entries, tz):
+    rows = entries.annotate(week=TruncWeek('start_time', tzinfo=tz)).values('week').annotate(**_measures()).order_by('week')
+    weeks = []
+    for row in rows:
+        monday = timezone.localtime(row['week'], tz).date()
+        year, week, _ = monday.isocalendar()
+        weeks.append({'week': f'{year}-W{week:02d}', 'start': monday.isoformat(), **_bucket(row)})
+    return weeks
+
+
+def _by_client(entries, tz):
+    rows = entries.values('client', 'client__name').annotate(**_measures()).order_by('-minutes', 'client')
+    return [{'client': row['client'], 'client_name': row['client__name'], **_bucket(row)} for row in rows]
+
+
+def _by_project(entries, tz):
+    rows = entries.values('project_name').annotate(**_measures()).order_by('-minutes', 'project_name')
+    return [{'project_name': row['project_name'], **_bucket(row)} for row in rows]
+
+
+GROUPERS = {'day': _by_day, 'week': _by_week, 'client': _by_client, 'project': _by_project}
+
+
+def timesheet(user_id, start, end, group_by=GROUPINGS, client=None, tz=None):
+    """
+    Totals plus one list of buckets per name in ``group_by`` (keys 'days',
+    'weeks', 'clients', 'projects') for entries started on ``start``..``end``
+    in the user's timezone.
+    """
+    tz = tz or user_timezone(user_id)
+    entries = entries_between(user_id, start, end, tz)
+    if client is not None:
+        entries = entries.filter(client_id=client)
+    entries = entries.order_by()
+
+    report = {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'timezone': str(tz),
+        'totals': _bucket(entries.aggregate(**_measures())),
+    }
+    for name in group_by:
+        report[f'{name}s'] = GROUPERS[name](entries, tz)
+    return report
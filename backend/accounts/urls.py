@@ -1,21 +1,43 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
+from .async_views import (
+    AsyncClientListView,
+    AsyncExpenseListView,
+    AsyncInvoiceListView,
+    AsyncSummaryView,
+    AsyncTaxEstimationView,
+    AsyncTimeEntryListView,
+)
 from .views import (
+    BillTimeView,
     AuditLogListView,
+    AuditLogQueryView,
     CustomUserViewSet,
     ClientListCreateView,
     ClientRetrieveUpdateDestroyView,
+    ExpenseBulkView,
     ExpenseListCreateView,
+    ExportView,
     ExpenseRetrieveUpdateDestroyView,
+    ImportView,
     InvoiceListCreateView,
+    PaymentIngestView,
+    PaymentListCreateView,
+    PaymentRetrieveUpdateDestroyView,
+    ProfitAndLossView,
+    ReceivablesAgingView,
     RegisterView,
+    SearchView,
     InvoiceRetrieveUpdateDestroyView,
     SettingListCreateView,
     SettingRetrieveUpdateDestroyView,
+    SummaryView,
     TaxEstimationView,
+    TimeEntryBulkView,
     TimeEntryListCreateView,
-    TimeEntryRetrieveUpdateDestroyView
+    TimeEntryRetrieveUpdateDestroyView,
+    TimesheetView
 )
 
 router = DefaultRouter()
@@ -26,14 +48,35 @@ urlpatterns = [
     path('clients/', ClientListCreateView.as_view(), name='client-list-create'),
     path('clients/<int:pk>/', ClientRetrieveUpdateDestroyView.as_view(), name='client-detail-update-destroy'),
     path('invoices/', InvoiceListCreateView.as_view(), name='invoice-list-create'),
+    path('invoices/bill-time/', BillTimeView.as_view(), name='invoice-bill-time'),
     path('invoices/<int:pk>/', InvoiceRetrieveUpdateDestroyView.as_view(), name='invoice-detail-update-destroy'),
     path('time-entries/', TimeEntryListCreateView.as_view(), name='timeentry-list-create'),
     path('time-entries/<int:pk>/', TimeEntryRetrieveUpdateDestroyView.as_view(), name='timeentry-detail-update-destroy'),
+    path('time-entries/bulk/', TimeEntryBulkView.as_view(), name='timeentry-bulk'),
     path('expenses/', ExpenseListCreateView.as_view(), name='expense-list-create'),
     path('expenses/<int:pk>/', ExpenseRetrieveUpdateDestroyView.as_view(), name='expense-detail-update-destroy'),
+    path('expenses/bulk/', ExpenseBulkView.as_view(), name='expense-bulk'),
+    path('payments/', PaymentListCreateView.as_view(), name='payment-list-create'),
+    path('payments/<int:pk>/', PaymentRetrieveUpdateDestroyView.as_view(), name='payment-detail-update-destroy'),
+    path('payments/ingest/', PaymentIngestView.as_view(), name='payment-ingest'),
     path('tax-estimation/', TaxEstimationView.as_view(), name='taxestimation-detail'),
     path('settings/', SettingListCreateView.as_view(), name='setting-list-create'),
     path('settings/<int:pk>/', SettingRetrieveUpdateDestroyView.as_view(), name='setting-detail-update-destroy'),
     path('audit-logs/', AuditLogListView.as_view(), name='auditlog-list'),
+    path('admin/audit-logs/', AuditLogQueryView.as_view(), name='auditlog-admin-query'),
+    path('summary/', SummaryView.as_view(), name='summary'),
+    path('reports/profit-and-loss/', ProfitAndLossView.as_view(), name='report-profit-and-loss'),
+    path('reports/aging/', ReceivablesAgingView.as_view(), name='report-aging'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('timesheet/', TimesheetView.as_view(), name='timesheet'),
+    path('export/<str:resource>/', ExportView.as_view(), name='export'),
+    path('import/<str:resource>/', ImportView.as_view(), name='import'),
+    # async (ASGI) variants of the read-heavy endpoints, GET only
+    path('async/clients/', AsyncClientListView.as_view(), name='async-client-list'),
+    path('async/invoices/', AsyncInvoiceListView.as_view(), name='async-invoice-list'),
+    path('async/time-entries/', AsyncTimeEntryListView.as_view(), name='async-timeentry-list'),
+    path('async/expenses/', AsyncExpenseListView.as_view(), name='async-expense-list'),
+    path('async/tax-estimation/', AsyncTaxEstimationView.as_view(), name='async-taxestimation-detail'),
+    path('async/summary/', AsyncSummaryView.as_view(), name='async-summary'),
     path('', include(router.urls)),
 ]
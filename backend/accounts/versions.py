@@ -0,0 +1,68 @@
+# PayAsYouGo/backend/accounts/versions.py
+#
+# Per-user, per-resource change counters (ResourceVersion) behind the list ETags.
+#
+# Every write to a user's rows bumps the counter of that resource (the model name)
+# with a single UPDATE; signals.py does it for ordinary saves and deletes, code
+# paths that bypass signals (bulk_create, queryset.update()) call bump() themselves.
+# Counters are only created when a validator is first computed (current()), so a
+# bump never needs to INSERT: if no counter exists yet, no ETag can depend on it.
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ResourceVersion
+
+
+def bump(user_id, *resources):
+    if user_id is None:
+        return
+    ResourceVersion.objects.filter(user_id=user_id, resource__in=resources).update(
+        version=F('version') + 1, updated_at=timezone.now()
+    )
+
+
+def bump_users(user_ids, *resources):
+    """bump() for many users at once (set-based writers such as the overdue sweeper)."""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        ResourceVersion.objects.filter(user_id__in=user_ids, resource__in=resources).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
+
+
+def current(user_id, resources):
+    """``{resource: (version, updated_at)}`` for ``resources``, creating missing counters."""
+    found = {
+        resource: (version, updated_at) for resource, version, updated_at
+        in ResourceVersion.objects.filter(user_id=user_id, resource__in=resources)
+        .values_list('resource', 'version', 'updated_at')
+    }
+    missing = [resource for resource in resources if resource not in found]
+    if missing:
+        # A concurrent request may create the same counters; it starts them at 0 as well.
+        now = timezone.now()
+        ResourceVersion.objects.bulk_create(
+            [ResourceVersion(user_id=user_id, resource=resource, updated_at=now) for resource in missing],
+            ignore_conflicts=True,
+        )
+        found.update((resource, (0, now)) for resource in missing)
+    return found
+
+
+async def acurrent(user_id, resources):
+    """current() with the async ORM."""
+    found = {
+        resource: (version, updated_at) async for resource, version, updated_at
+        in ResourceVersion.objects.filter(user_id=user_id, resource__in=resources)
+        .values_list('resource', 'version', 'updated_at')
+    }
+    missing = [resource for resource in resources if resource not in found]
+    if missing:
+        now = timezone.now()
+        await ResourceVersion.objects.abulk_create(
+            [ResourceVersion(user_id=user_id, resource=resource, updated_at=now) for resource in missing],
+            ignore_conflicts=True,
+        )
+        found.update((resource, (0, now)) for resource in missing)
+    return found
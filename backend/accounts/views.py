@@ -1,20 +1,29 @@
 # PayAsYouGo/backend/accounts/views.py
 
+import io
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import generics, viewsets, permissions
 
 # --- 确保导入以下所有内容 ---
-from rest_framework.exceptions import NotFound # <-- 导入 NotFound
+from rest_framework.exceptions import NotFound, ValidationError # <-- 导入 NotFound
 from rest_framework.views import APIView      # <-- 导入 APIView
 from rest_framework.response import Response  # <-- 导入 Response
+from rest_framework.parsers import MultiPartParser
 from rest_framework import status             # <-- 导入 status
 # --- 导入结束 ---
 # ... (确保导入了其他需要的模块和模型)
-from rest_framework.authtoken.models import Token # <-- 导入 Token model
 from django.contrib.auth import authenticate      # <-- 导入 authenticate 函数
 from rest_framework.permissions import AllowAny   # <-- 确保导入 AllowAny (或者 permissions.AllowAny)
 
 from rest_framework.permissions import IsAuthenticated # 假设你需要用户登录才能访问
-from .models import AuditLog, CustomUser, Client, Expense, Invoice, InvoiceItem, Payment, Setting, TaxEstimation, TimeEntry # 导入你需要操作的模型
+from .models import AuditLog, CustomUser, Client, Expense, Invoice, InvoiceItem, MonthlySummary, Payment, Setting, TaxEstimation, TimeEntry # 导入你需要操作的模型
 from .serializers import ( # <-- 修改这里，列出所有你需要的序列化器
     CustomUserSerializer,
     ClientSerializer,
@@ -27,9 +36,26 @@ from .serializers import ( # <-- 修改这里，列出所有你需要的序列
     TaxEstimationSerializer,  # <--
     SettingSerializer,        # <--
     AuditLogSerializer,
+    MonthlySummarySerializer,
+    TimeEntryBulkSerializer,
+    ExpenseBulkSerializer,
+    BillTimeSerializer,
+    as_pk,
     UserLoginResponseSerializer        # <--
 )
 from accounts import serializers
+from . import payments, reports, rollups, search, singletons, tax, timesheets
+from .audit_archive import ArchiveQuery, merge_tiers
+from .authentication import get_token_for_user
+from .billing import bill_time
+from .conditional import ConditionalGetMixin, conditional_response, make_etag, set_validators
+from .expressions import with_balance
+from .fieldsets import SparseFieldsMixin
+from .exports import EXPORTS, STREAMERS, export_columns
+from .imports import IMPORTS, import_csv
+from .renderers import CSVRenderer, NDJSONRenderer
+from .pagination import KeysetPagination
+from .params import bool_param, date_param, datetime_param
 
 # 自定义登录视图
 class CustomLoginView(APIView):
@@ -43,15 +69,15 @@ class CustomLoginView(APIView):
         user = authenticate(username=username, password=password)
 
         if user:
-            # 如果认证成功，获取或创建一个 Token
-            token, created = Token.objects.get_or_create(user=user)
+            # 如果认证成功，获取 Token (优先读缓存，只有用户还没有 Token 时才写库)
+            token_key = get_token_for_user(user)
             
             # 使用 UserLoginResponseSerializer 序列化用户数据
             user_serializer = UserLoginResponseSerializer(user)
 
             # 返回 Token 和序列化后的用户数据
             return Response({
-                'token': token.key,
+                'token': token_key,
                 'user': user_serializer.data # <-- 在响应中包含用户数据
             }, status=status.HTTP_200_OK)
         else:
@@ -74,16 +100,20 @@ class CustomUserViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated] # 只有认证用户才能访问
 
 # Client 的通用视图 (列表创建和详情更新删除)
-class ClientListCreateView(generics.ListCreateAPIView):
+class ClientListCreateView(SparseFieldsMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination # 按 (user_id, created_at, id) 游标分页
+
+    def get_queryset(self): # 仅返回当前用户的客户
+        return self.queryset.filter(user=self.request.user)
 
     # 确保新创建的客户端与当前登录用户关联
     def perform_create(self, serializer):
         serializer.save(user=self.request.user) # 假设 Client 模型中有 user 字段
 
-class ClientRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class ClientRetrieveUpdateDestroyView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
     permission_classes = [IsAuthenticated]
@@ -92,22 +122,80 @@ class ClientRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         return self.queryset.filter(user=self.request.user)
 
 
+# 发票读取模型：附带 amount_paid / balance 注解，?expand=items,payments,client 时嵌套关联数据
+# 关联数据通过 select_related / prefetch_related 加载，查询次数与分页大小无关
+class InvoiceReadMixin:
+    expandable = ('items', 'payments', 'client')
+    etag_resources = ('InvoiceItem', 'Payment', 'Client') # 余额和展开内容依赖这些资源, ETag 需随之变化
+
+    def get_expand(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return set()
+        expand = {part.strip() for part in self.request.query_params.get('expand', '').split(',') if part.strip()}
+        unknown = expand.difference(self.expandable)
+        if unknown:
+            raise ValidationError({'expand': f"Unknown expansion: {', '.join(sorted(unknown))}. Choose from {', '.join(self.expandable)}."})
+        return expand
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        return context
+
+    def get_read_queryset(self):
+        expand = self.get_expand()
+        queryset = with_balance(self.queryset.filter(user=self.request.user))
+        if 'client' in expand:
+            queryset = queryset.select_related('client')
+        prefetch = [name for name in ('items', 'payments') if name in expand]
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
 # Invoice 的通用视图 (类似 Client)
-class InvoiceListCreateView(generics.ListCreateAPIView):
+class InvoiceListCreateView(InvoiceReadMixin, SparseFieldsMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self): # 仅返回当前用户的发票，可按状态和到期日过滤 (索引 user, status, due_date)
+        queryset = self.get_read_queryset()
+        params = self.request.query_params
+        if params.get('status'):
+            queryset = queryset.filter(status=params['status'])
+        due_after = date_param(params, 'due_after')
+        if due_after:
+            queryset = queryset.filter(due_date__gte=due_after)
+        due_before = date_param(params, 'due_before')
+        if due_before:
+            queryset = queryset.filter(due_date__lte=due_before)
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user) # 假设 Invoice 模型中有 user 字段
 
-class InvoiceRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class InvoiceRetrieveUpdateDestroyView(InvoiceReadMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return self.queryset.filter(user=self.request.user)
+        if self.request.method not in permissions.SAFE_METHODS:
+            return self.queryset.filter(user=self.request.user)
+        return self.get_read_queryset()
+
+# 将客户未开票的工时一次性生成发票 (按项目和时薪汇总成账单项)
+class BillTimeView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None):
+        serializer = BillTimeSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        invoice = bill_time(request.user, **serializer.validated_data)
+        data = InvoiceSerializer(invoice, context={'expand': {'items'}}).data
+        data['billed_entries'] = invoice.billed_entries
+        return Response(data, status=status.HTTP_201_CREATED)
 
 # ... 为其他每个模型定义相应的视图 (ListCreateAPIView 和 RetrieveUpdateDestroyAPIView)
 
@@ -155,16 +243,28 @@ class InvoiceItemRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView
         # 否则，只能看到自己发票下的账单项
         return self.queryset.filter(invoice__user=self.request.user)
 
-class TimeEntryListCreateView(generics.ListCreateAPIView):
+class TimeEntryListCreateView(SparseFieldsMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = TimeEntry.objects.all()
     serializer_class = TimeEntrySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     def perform_create(self, serializer):
         serializer.save(user=self.request.user) # 假设 TimeEntry 有 user 字段
-    def get_queryset(self): # 仅返回当前用户的工时
-        return self.queryset.filter(user=self.request.user)
-
-class TimeEntryRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+    def get_queryset(self): # 仅返回当前用户的工时，可按开始时间和是否已开票过滤
+        queryset = self.queryset.filter(user=self.request.user)
+        params = self.request.query_params
+        start_after = datetime_param(params, 'start_after')
+        if start_after:
+            queryset = queryset.filter(start_time__gte=start_after)
+        start_before = datetime_param(params, 'start_before', end_of_day=True)
+        if start_before:
+            queryset = queryset.filter(start_time__lte=start_before)
+        is_billed = bool_param(params, 'is_billed')
+        if is_billed is not None:
+            queryset = queryset.filter(is_billed=is_billed)
+        return queryset
+
+class TimeEntryRetrieveUpdateDestroyView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = TimeEntry.objects.all()
     serializer_class = TimeEntrySerializer
     permission_classes = [IsAuthenticated]
@@ -172,27 +272,90 @@ class TimeEntryRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         return self.queryset.filter(user=self.request.user)
 
 # 费用 (类似工时)
-class ExpenseListCreateView(generics.ListCreateAPIView):
+class ExpenseListCreateView(SparseFieldsMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
-    def get_queryset(self):
-        return self.queryset.filter(user=self.request.user)
-
-class ExpenseRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+    def get_queryset(self): # 可按费用日期过滤 (索引 user, expense_date)
+        queryset = self.queryset.filter(user=self.request.user)
+        params = self.request.query_params
+        date_from = date_param(params, 'date_from')
+        if date_from:
+            queryset = queryset.filter(expense_date__gte=date_from)
+        date_to = date_param(params, 'date_to')
+        if date_to:
+            queryset = queryset.filter(expense_date__lte=date_to)
+        return queryset
+
+class ExpenseRetrieveUpdateDestroyView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
     def get_queryset(self):
         return self.queryset.filter(user=self.request.user)
     
+# 批量写入：一次请求同步成百上千条记录
+# POST 批量创建，PATCH 批量更新 (每行需要 id)，DELETE {"ids": [...]} 批量删除
+# 每行单独校验，无效行在 errors 中按索引返回，不影响其余有效行
+class BulkWriteView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return self.queryset.filter(user=self.request.user)
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('many', True)
+        kwargs.setdefault('max_length', settings.BULK_MAX_ROWS)
+        return super().get_serializer(*args, **kwargs)
+
+    def post(self, request, format=None):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True) # 只会因请求结构错误 (非列表、超过上限) 失败
+        return self._write(serializer, status.HTTP_201_CREATED, user=request.user)
+
+    def patch(self, request, format=None):
+        ids = [as_pk(row.get('id')) for row in request.data if isinstance(row, dict)] if isinstance(request.data, list) else []
+        instances = self.get_queryset().in_bulk([pk for pk in ids if pk is not None])
+        serializer = self.get_serializer(instances, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        return self._write(serializer, status.HTTP_200_OK)
+
+    def delete(self, request, format=None):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or len(ids) > settings.BULK_MAX_ROWS or any(as_pk(pk) is None for pk in ids):
+            return Response({'ids': [f'Expected a list of at most {settings.BULK_MAX_ROWS} ids.']}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic(), rollups.batch():
+            _, per_model = self.get_queryset().filter(pk__in=[as_pk(pk) for pk in ids]).delete()
+        deleted = per_model.get(self.queryset.model._meta.label, 0)
+        return Response({'deleted': deleted}, status=status.HTTP_200_OK)
+
+    def _write(self, serializer, success_status, **save_kwargs):
+        errors = [{'index': index, 'errors': detail} for index, detail in sorted(serializer.row_errors.items())]
+        if not serializer.validated_data:
+            return Response({'results': [], 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic(), rollups.batch():
+            serializer.save(**save_kwargs)
+        return Response({'results': serializer.data, 'errors': errors}, status=success_status)
+
+
+class TimeEntryBulkView(BulkWriteView):
+    queryset = TimeEntry.objects.all()
+    serializer_class = TimeEntryBulkSerializer
+
+
+class ExpenseBulkView(BulkWriteView):
+    queryset = Expense.objects.all()
+    serializer_class = ExpenseBulkSerializer
+
 # 支付 (Payment) 视图
-class PaymentListCreateView(generics.ListCreateAPIView):
+class PaymentListCreateView(SparseFieldsMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    staff_sees_all = True # 管理员列表包含所有用户的支付, 不能用自己的版本计数做 ETag
 
     # 确保新创建的支付记录与当前登录用户关联
     def perform_create(self, serializer):
@@ -210,10 +373,24 @@ class PaymentListCreateView(generics.ListCreateAPIView):
         return self.queryset.filter(user=self.request.user)
 
 
-class PaymentRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+# 支付批量导入：处理商的批量文件和回调, 按 transaction_id 幂等 upsert
+# POST [{"transaction_id", "invoice_number", "amount", "payment_date", ...}, ...]
+# 返回 created / updated / unchanged / rejected 计数, 无效行在 errors 中按索引返回
+class PaymentIngestView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None):
+        report = payments.ingest(request.user, request.data)
+        if report['rejected'] and not (report['created'] or report['updated'] or report['unchanged']):
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class PaymentRetrieveUpdateDestroyView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    staff_sees_all = True
 
     # 确保用户只能修改或删除自己的支付记录
     def get_queryset(self):
@@ -261,10 +438,17 @@ class TaxEstimationView(APIView):
 
     def get(self, request, format=None):
         try:
-            # 尝试获取当前用户的税务预估设置
-            tax_estimation = TaxEstimation.objects.get(user=request.user)
+            # 尝试获取当前用户的税务预估设置 (按主键取一行, 预留金额由 accounts/tax.py 增量维护)
+            tax_estimation = singletons.get_tax_estimation(request.user.pk) # 读缓存 (accounts/singletons.py), 通常零查询
+            if tax_estimation is None:
+                raise TaxEstimation.DoesNotExist
+            # 条件请求: 未变化时直接返回 304, 不再序列化
+            etag = make_etag(request, tax_estimation.updated_at.isoformat())
+            not_modified = conditional_response(request, etag, tax_estimation.updated_at)
+            if not_modified is not None:
+                return not_modified
             serializer = TaxEstimationSerializer(tax_estimation)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return set_validators(Response(serializer.data, status=status.HTTP_200_OK), etag, tax_estimation.updated_at)
         except TaxEstimation.DoesNotExist:
             # 如果没有找到，返回 404 Not Found，并提示前端进行创建
             return Response(
@@ -275,18 +459,23 @@ class TaxEstimationView(APIView):
     def post(self, request, format=None):
         # 尝试更新现有设置
         try:
-            tax_estimation = TaxEstimation.objects.get(user=request.user)
+            tax_estimation = TaxEstimation.objects.get(pk=request.user.pk)
+            previous_percentage = tax_estimation.tax_percentage
             serializer = TaxEstimationSerializer(tax_estimation, data=request.data, partial=True)
             if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data, status=status.HTTP_200_OK) # 更新成功返回 200 OK
+                tax_estimation = serializer.save()
+                if tax_estimation.tax_percentage != previous_percentage:
+                    tax.recalculate(tax_estimation) # 税率变化: 用已存的应税收入重算, 不扫描付款
+                return Response(TaxEstimationSerializer(tax_estimation).data, status=status.HTTP_200_OK) # 更新成功返回 200 OK
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except TaxEstimation.DoesNotExist:
             # 如果不存在，则创建新设置
             serializer = TaxEstimationSerializer(data=request.data)
             if serializer.is_valid():
-                serializer.save(user=request.user) # 确保关联当前用户
-                return Response(serializer.data, status=status.HTTP_201_CREATED) # 创建成功返回 201 Created
+                tax_estimation = serializer.save(user=request.user) # 确保关联当前用户
+                tax.reconcile(user_ids=[request.user.pk]) # 首次创建时计算一次基数, 之后增量更新
+                tax_estimation.refresh_from_db()
+                return Response(TaxEstimationSerializer(tax_estimation).data, status=status.HTTP_201_CREATED) # 创建成功返回 201 Created
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def put(self, request, format=None): # PUT 也可以用来更新
@@ -320,7 +509,7 @@ class TaxEstimationRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIVi
         return self.queryset.filter(user=self.request.user)
 
 # 设置 (与税务预估类似，通常是 OneToOneField)
-class SettingListCreateView(generics.ListCreateAPIView): # 或 RetrieveUpdateAPIView
+class SettingListCreateView(ConditionalGetMixin, generics.ListCreateAPIView): # 或 RetrieveUpdateAPIView
     queryset = Setting.objects.all()
     serializer_class = SettingSerializer
     permission_classes = [IsAuthenticated]
@@ -329,19 +518,277 @@ class SettingListCreateView(generics.ListCreateAPIView): # 或 RetrieveUpdateAPI
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class SettingRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class SettingRetrieveUpdateDestroyView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Setting.objects.all()
     serializer_class = SettingSerializer
     permission_classes = [IsAuthenticated]
     def get_queryset(self):
         return self.queryset.filter(user=self.request.user)
 
+    # 读取自己的设置走缓存 (accounts/singletons.py); 写操作仍读数据库, 保存后由信号回写缓存
+    def get_cached_setting(self, pk):
+        if str(pk) != str(self.request.user.pk):
+            return None
+        return singletons.get_setting(self.request.user.pk)
+
+    def get_row_updated_at(self, lookup_value):
+        setting = self.get_cached_setting(lookup_value)
+        return setting.updated_at if setting is not None else None
+
+    def get_object(self):
+        if self.request.method in permissions.SAFE_METHODS:
+            setting = self.get_cached_setting(self.kwargs['pk'])
+            if setting is None:
+                raise NotFound()
+            return setting
+        return super().get_object()
+
 # AuditLog (可能只有 List 或 Read-only)
-class AuditLogListView(generics.ListAPIView):
+class AuditLogTiersMixin:
+    """热表 (AuditLogs) 与归档段 (audit_archive) 合并分页, 调用方看不出数据在哪一层"""
+    pagination_class = KeysetPagination
+    keyset_fields = ('timestamp', 'id') # AuditLog 没有 created_at 字段
+
+    def get_time_bounds(self):
+        params = self.request.query_params
+        return datetime_param(params, 'since'), datetime_param(params, 'until', end_of_day=True)
+
+    def get_archive_filters(self):
+        # 与 get_queryset 相同的条件, 传给 ArchiveQuery
+        return {}
+
+    def get_queryset(self):
+        queryset = self.queryset
+        since, until = self.get_time_bounds()
+        if since:
+            queryset = queryset.filter(timestamp__gte=since)
+        if until:
+            queryset = queryset.filter(timestamp__lte=until)
+        return queryset.filter(**self.get_archive_filters())
+
+    def paginate_queryset(self, queryset):
+        since, until = self.get_time_bounds()
+        filters = self.get_archive_filters()
+        hot = self.paginator.fetcher(queryset, view=self)
+
+        def fetch(cursor, reverse, limit):
+            archive = ArchiveQuery(since=since, until=until, cursor=cursor, reverse=reverse, **filters)
+            return merge_tiers(hot(cursor, reverse, limit), archive, limit)
+
+        return self.paginator.paginate_rows(fetch, self.request, view=self)
+
+
+class AuditLogListView(AuditLogTiersMixin, generics.ListAPIView):
     queryset = AuditLog.objects.all()
     serializer_class = AuditLogSerializer
     permission_classes = [IsAuthenticated]
-    # 审计日志通常只读，且可能只显示当前用户的相关日志
-    def get_queryset(self):
-        return self.queryset.filter(user=self.request.user) # 假设你想只看自己的日志网址 ( accounts/urls.py)：
+    # 审计日志通常只读，且只显示当前用户的相关日志
+
+    def get_archive_filters(self):
+        return {'user_id': self.request.user.pk}
+
+
+# 管理员审计查询：必须带 since, 可按用户 / 操作 / 实体过滤
+class AuditLogQueryView(AuditLogTiersMixin, generics.ListAPIView):
+    queryset = AuditLog.objects.all()
+    serializer_class = AuditLogSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def get_time_bounds(self):
+        since, until = super().get_time_bounds()
+        if since is None:
+            raise ValidationError({'since': 'Admin audit queries must be time-bounded.'})
+        return since, until
+
+    def get_archive_filters(self):
+        params = self.request.query_params
+        filters = {}
+        for name, field in (('user', 'user_id'), ('entity_id', 'entity_id')):
+            if params.get(name):
+                try:
+                    filters[field] = int(params[name])
+                except ValueError:
+                    raise ValidationError({name: 'Expected an integer.'})
+        for name in ('action', 'entity_type'):
+            if params.get(name):
+                filters[name] = params[name]
+        return filters
+
+
+
+# 仪表盘汇总：只读取按月预聚合的 MonthlySummary，不扫描原始表
+class SummaryView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, format=None):
+        try:
+            start = self._parse_month(request.query_params.get('from'))
+            end = self._parse_month(request.query_params.get('to'))
+        except ValueError:
+            return Response({'detail': "'from' and 'to' must be formatted as YYYY-MM."}, status=status.HTTP_400_BAD_REQUEST)
+
+        buckets = MonthlySummary.objects.filter(user=request.user)
+        # 未结余额与时间范围无关：所有已开票金额 - 所有已收款
+        lifetime = buckets.aggregate(invoiced=Sum('invoiced_amount'), received=Sum('payments_received'))
+
+        if start:
+            buckets = buckets.filter(month__gte=start)
+        if end:
+            buckets = buckets.filter(month__lte=end)
+        months = MonthlySummarySerializer(buckets.order_by('month'), many=True).data
+        return Response(self.summarize(lifetime, months), status=status.HTTP_200_OK)
+
+    @staticmethod
+    def summarize(lifetime, months):
+        totals = {name: Decimal('0') for name in ('invoiced_amount', 'payments_received', 'expenses_amount')}
+        minutes = {'tracked_minutes': 0, 'billed_minutes': 0}
+        for row in months:
+            for name in totals:
+                totals[name] += Decimal(row[name])
+            for name in minutes:
+                minutes[name] += row[name]
+
+        return {
+            'totals': {
+                'invoiced_amount': f"{totals['invoiced_amount']:.2f}",
+                'payments_received': f"{totals['payments_received']:.2f}",
+                'outstanding_balance': f"{(lifetime['invoiced'] or 0) - (lifetime['received'] or 0):.2f}",
+                'tracked_hours': f"{Decimal(minutes['tracked_minutes']) / 60:.2f}",
+                'billed_hours': f"{Decimal(minutes['billed_minutes']) / 60:.2f}",
+                'expenses_amount': f"{totals['expenses_amount']:.2f}",
+            },
+            'months': months,
+        }
+
+    @staticmethod
+    def _parse_month(value): # 'YYYY-MM' -> 当月第一天
+        if not value:
+            return None
+        year, month = value.split('-')
+        return date(int(year), int(month), 1)
+
+
+# 损益表：/api/reports/profit-and-loss/?from=YYYY-MM&to=YYYY-MM
+# 只读取按月预聚合的 MonthlySummary / MonthlyExpenseCategory (见 accounts/reports.py)
+class ProfitAndLossView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, format=None):
+        try:
+            start = SummaryView._parse_month(request.query_params.get('from'))
+            end = SummaryView._parse_month(request.query_params.get('to'))
+        except ValueError:
+            return Response({'detail': "'from' and 'to' must be formatted as YYYY-MM."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(reports.profit_and_loss(request.user.pk, start, end), status=status.HTTP_200_OK)
+
 
+# 应收账龄：/api/reports/aging/?as_of=YYYY-MM-DD (默认今天)
+# 按客户分组的单条聚合查询, 余额按逾期天数分桶 (见 accounts/reports.py)
+class ReceivablesAgingView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, format=None):
+        as_of = date_param(request.query_params, 'as_of') or timezone.localdate()
+        return Response(reports.receivables_aging(request.user.pk, as_of), status=status.HTTP_200_OK)
+
+
+# 全文搜索：/api/search/?q=acme migration&type=Invoice,Client&limit=20
+# 每个词需精确或前缀匹配, 按权重排序 (倒排索引见 accounts/search.py)
+class SearchView(APIView):
+    permission_classes = [IsAuthenticated]
+    max_limit = 100
+
+    def get(self, request, format=None):
+        query = request.query_params.get('q', '').strip()
+        if not search.tokenize(query):
+            raise ValidationError({'q': 'Enter at least one word to search for.'})
+        types = [name for name in request.query_params.get('type', '').split(',') if name]
+        unknown = [name for name in types if name not in search.ENTITY_TYPES]
+        if unknown:
+            raise ValidationError({'type': f"Unknown type '{unknown[0]}'. Choose from: {', '.join(search.ENTITY_TYPES)}."})
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), self.max_limit)
+        except ValueError:
+            raise ValidationError({'limit': 'Expected a number.'})
+        results = search.search(request.user.pk, query, entity_types=types, limit=limit)
+        return Response({'query': query, 'results': results}, status=status.HTTP_200_OK)
+
+
+# 工时汇总：/api/timesheet/?from=YYYY-MM-DD&to=YYYY-MM-DD&group=day,week,client,project&client=<id>
+# 按用户 Setting.timezone 在数据库中分组聚合 (见 accounts/timesheets.py)
+class TimesheetView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, format=None):
+        params = request.query_params
+        group_by = [name for name in params.get('group', ','.join(timesheets.GROUPINGS)).split(',') if name]
+        unknown = [name for name in group_by if name not in timesheets.GROUPINGS]
+        if unknown:
+            raise ValidationError({'group': f"Unknown grouping '{unknown[0]}'. Choose from: {', '.join(timesheets.GROUPINGS)}."})
+        client = as_pk(params['client']) if params.get('client') else None
+        if params.get('client') and client is None:
+            raise ValidationError({'client': 'Expected a client id.'})
+
+        tz = timesheets.user_timezone(request.user.pk)
+        today = timezone.localdate(timezone=tz)
+        end = date_param(params, 'to') or today
+        start = date_param(params, 'from') or end.replace(day=1) # 默认：当月至今
+        if start > end:
+            raise ValidationError({'to': "'to' must not be before 'from'."})
+        report = timesheets.timesheet(
+            request.user.pk, start, end, group_by=list(dict.fromkeys(group_by)),
+            client=client, tz=tz,
+        )
+        return Response(report, status=status.HTTP_200_OK)
+
+
+# 流式导出：/api/export/<resource>/?format=csv|ndjson&from=YYYY-MM-DD&to=YYYY-MM-DD
+# 也可以通过 Accept: text/csv / application/x-ndjson 选择格式
+class ExportView(APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+
+    def get(self, request, resource, format=None):
+        if resource not in EXPORTS:
+            raise NotFound(detail=f"Unknown export '{resource}'. Choose one of: {', '.join(EXPORTS)}.")
+        model, date_field = EXPORTS[resource]
+        queryset = model.objects.filter(user=request.user)
+
+        params = request.query_params
+        is_datetime = model._meta.get_field(date_field).get_internal_type() == 'DateTimeField'
+        if is_datetime:
+            start, end = datetime_param(params, 'from'), datetime_param(params, 'to', end_of_day=True)
+        else:
+            start, end = date_param(params, 'from'), date_param(params, 'to')
+        if start:
+            queryset = queryset.filter(**{f'{date_field}__gte': start})
+        if end:
+            queryset = queryset.filter(**{f'{date_field}__lte': end})
+
+        export_format = request.accepted_renderer.format
+        response = StreamingHttpResponse(
+            STREAMERS[export_format](queryset, export_columns(model)),
+            content_type=f'{request.accepted_renderer.media_type}; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{export_format}"'
+        return response
+
+
+# CSV 批量导入：POST /api/import/<resource>/，multipart 字段 file
+# 按批校验和写入，重复导入同一文件会根据内容哈希跳过已导入的行
+class ImportView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, resource, format=None):
+        if resource not in IMPORTS:
+            raise NotFound(detail=f"Unknown import '{resource}'. Choose one of: {', '.join(IMPORTS)}.")
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': ['A CSV file is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            report = import_csv(resource, stream, request.user)
+        except UnicodeDecodeError:
+            return Response({'file': ['The file must be UTF-8 encoded CSV.']}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
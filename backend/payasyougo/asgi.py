@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'payasyougo.settings')
 
 application = get_asgi_application()
+
+# periodic maintenance jobs (settings.SCHEDULER), only in server processes, not in manage.py commands
+from django.conf import settings  # noqa: E402
+if settings.SCHEDULER['ENABLED']:
+    from accounts import scheduler  # noqa: E402
+    scheduler.start()
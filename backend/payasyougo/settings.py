@@ -1,4 +1,5 @@
 from pathlib import Path
+import importlib.util
 import os
 from dotenv import load_dotenv # <-- Make sure this line exists
 
@@ -28,12 +29,106 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',  # For browser session auth (e.g., Django Admin)
-        'rest_framework.authentication.TokenAuthentication',    # For API token auth (e.g., Postman)
+        'accounts.authentication.CachedTokenAuthentication',    # For API token auth (e.g., Postman); TokenAuthentication with a cached lookup
+    ],
+    # orjson-backed JSON (same bytes as DRF's JSONRenderer) and, when msgpack is installed,
+    # application/msgpack, chosen by the Accept / Content-Type headers (accounts/renderers.py, parsers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'accounts.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        *(['accounts.renderers.MessagePackRenderer'] if importlib.util.find_spec('msgpack') else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'accounts.parsers.FastJSONParser',
+        *(['accounts.parsers.MessagePackParser'] if importlib.util.find_spec('msgpack') else []),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     # If you previously had a custom exception handler, you can add it back here, ensure the path is correct
     # 'EXCEPTION_HANDLER': 'your_app_name.custom_exceptions.custom_exception_handler',
 }
 
+# 'default' stays per process; REDIS_URL adds a 'shared' alias that every worker sees, for the
+# caches that must agree across processes (DATABASE_ROUTING['PIN_CACHE'] and the SHARED_CACHE tiers below)
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+if os.environ.get('REDIS_URL'):
+    CACHES['shared'] = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.environ['REDIS_URL']}
+SHARED_CACHE = 'shared' if 'shared' in CACHES else None
+
+# Token -> user cache used by accounts.authentication.CachedTokenAuthentication
+TOKEN_AUTH_CACHE = {
+    'TTL': 60,            # seconds a token stays in each process's local cache (re-checked against the shared tier)
+    'LOCAL_ONLY_TTL': 5,  # ... without a shared tier: how long a revoked token can still work on other workers
+    'MAX_SIZE': 10000,    # tokens kept per process
+    'SHARED_CACHE': os.environ.get('TOKEN_AUTH_SHARED_CACHE') or SHARED_CACHE,  # CACHES alias shared by all workers
+    'SHARED_TTL': 300,
+}
+
+# Per-user Setting / TaxEstimation cache (accounts.singletons)
+USER_SINGLETON_CACHE = {
+    'TTL': 300,           # seconds a row stays in each process's local cache (re-checked against the shared tier)
+    'MAX_SIZE': 10000,    # users kept per model and process
+    # CACHES alias shared by all workers; without one TaxEstimation is not cached (accounts/singletons.py)
+    'SHARED_CACHE': os.environ.get('USER_SINGLETON_SHARED_CACHE') or SHARED_CACHE,
+    'SHARED_TTL': 600,
+}
+
+# Cursor pagination for the list endpoints (accounts.pagination.KeysetPagination)
+PAGINATION_PAGE_SIZE = int(os.environ.get('PAGINATION_PAGE_SIZE', 50))
+PAGINATION_MAX_PAGE_SIZE = int(os.environ.get('PAGINATION_MAX_PAGE_SIZE', 500)) # Upper bound for ?page_size=
+
+# Responses smaller than this are sent uncompressed (accounts.middleware.GZipLargeResponsesMiddleware)
+GZIP_MIN_LENGTH = int(os.environ.get('GZIP_MIN_LENGTH', 1024))
+
+# Bulk write endpoints (/api/time-entries/bulk/, /api/expenses/bulk/)
+BULK_MAX_ROWS = int(os.environ.get('BULK_MAX_ROWS', 5000)) # rows accepted per request
+BULK_WRITE_BATCH_SIZE = 500 # rows per INSERT / UPDATE statement
+
+# Payment ingestion (/api/payments/ingest/), upserted by transaction_id
+PAYMENT_INGEST_MAX_ROWS = int(os.environ.get('PAYMENT_INGEST_MAX_ROWS', 10000)) # records accepted per request
+
+# Streaming exports (/api/export/<resource>/)
+EXPORT_CHUNK_SIZE = 2000 # rows fetched per SELECT while streaming
+
+# CSV imports (/api/import/<resource>/ and manage.py import_csv)
+IMPORT_BATCH_SIZE = 1000 # rows validated and inserted per transaction
+
+# Audit trail for mutating /api/ requests (accounts.middleware.AuditLogMiddleware + accounts.audit)
+AUDIT_LOG = {
+    'ENABLED': True,
+    'ASYNC': True,              # write from a background thread; False writes inline
+    'QUEUE_SIZE': 10000,        # records buffered per process before new ones are dropped
+    'BATCH_SIZE': 500,          # records per bulk INSERT
+    'FLUSH_INTERVAL_MS': 200,   # max time a record waits in the queue
+    'PATH_PREFIX': '/api/',
+    'TRUST_X_FORWARDED_FOR': os.environ.get('AUDIT_TRUST_X_FORWARDED_FOR') == '1',  # only behind a trusted proxy
+}
+
+# Overdue sweeper (accounts.overdue; manage.py sweep_overdue)
+OVERDUE_SWEEP_CHUNK_SIZE = 1000 # invoices updated per transaction
+
+# Invoice/payment reconciliation (accounts.reconciliation, manage.py reconcile_invoices)
+RECONCILE_CHUNK_SIZE = 1000 # invoices reconciled per transaction
+
+# In-process periodic jobs (accounts.scheduler), started by wsgi.py / asgi.py
+SCHEDULER = {
+    'ENABLED': os.environ.get('SCHEDULER_ENABLED') == '1',
+    'JOBS': {
+        'sweep_overdue': {'callable': 'accounts.overdue.sweep_overdue', 'interval': 3600},
+        'reconcile_invoices': {'callable': 'accounts.reconciliation.reconcile_all', 'interval': 86400},
+    },
+}
+
+# Audit log tiers (accounts.audit_archive); enforced by `manage.py audit_retention`
+AUDIT_ARCHIVE = {
+    'ROOT': os.environ.get('AUDIT_ARCHIVE_ROOT', os.path.join(BASE_DIR, 'audit_archive')),
+    'HOT_MONTHS': 3,            # months (incl. the current one) kept in the AuditLogs table
+    'RETENTION_MONTHS': 84,     # months kept at all, older segments and rows are deleted
+    'SEGMENT_ROWS': 20000,      # rows per archive segment / per delete transaction
+}
+
 # Application definition
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
@@ -62,11 +157,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'accounts.middleware.GZipLargeResponsesMiddleware', # before anything that reads or writes the body
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware', # Ensure this comes before CommonMiddleware
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.AuditLogMiddleware', # after authentication, see accounts/audit.py
+    'accounts.middleware.DatabaseRoutingMiddleware', # read replicas, see accounts/routers.py
+    'accounts.middleware.SingletonMemoMiddleware', # per-request memo, see accounts/singletons.py
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -109,6 +208,21 @@ DATABASES = {
     }
 }
 
+# Read replicas: DB_REPLICA_HOSTS=host1,host2 adds aliases replica1, replica2 ... with the
+# primary's credentials.  The tests never create them (TEST MIRROR), see payasyougo/test_settings.py.
+for number, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['accounts.routers.PrimaryReplicaRouter']
+
+# Primary/replica routing (accounts.routers + accounts.middleware.DatabaseRoutingMiddleware)
+DATABASE_ROUTING = {
+    'REPLICAS': [alias for alias in DATABASES if alias != 'default'],
+    'STICKY_SECONDS': int(os.environ.get('DB_STICKY_SECONDS', 10)),  # reads stay on the primary this long after a write
+    # CACHES alias shared by all workers; required with replicas (checked at startup, accounts.E001-E003)
+    'PIN_CACHE': os.environ.get('DB_ROUTING_PIN_CACHE') or SHARED_CACHE,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -0,0 +1,22 @@
+# Settings for running the test suite without MySQL:
+#   python manage.py test --settings=payasyougo.test_settings
+# Two SQLite databases stand in for the primary and a read replica.  Routing to the
+# replica is off by default (most tests only use 'default'); the router tests in
+# accounts/tests.py switch it on with override_settings.  Audit records are written
+# inline: the background writer would use its own connection to the test database
+# (AuditWriterTests start it on purpose).
+
+from .settings import *  # noqa: F401,F403
+from .settings import AUDIT_LOG, DATABASE_ROUTING
+
+SECRET_KEY = SECRET_KEY or 'test-secret-key'  # noqa: F405
+
+# In memory: a connection opened outside the test databases must not leave files behind.
+DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+    'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+}
+
+DATABASE_ROUTING = {**DATABASE_ROUTING, 'REPLICAS': []}
+
+AUDIT_LOG = {**AUDIT_LOG, 'ASYNC': False}
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'payasyougo.settings')
 
 application = get_wsgi_application()
+
+# periodic maintenance jobs (settings.SCHEDULER), only in server processes, not in manage.py commands
+from django.conf import settings  # noqa: E402
+if settings.SCHEDULER['ENABLED']:
+    from accounts import scheduler  # noqa: E402
+    scheduler.start()
@@ -45,4 +45,16 @@ api.interceptors.response.use(
   }
 );
 
-export default api;
\ No newline at end of file
+// 读取分页列表接口 ({ next, previous, results }) 的全部结果: 沿着 next 链接逐页请求
+// 用于下拉框等需要用户全部数据的地方; 列表页请用 next / previous 翻页
+export async function fetchAllPages(url, config = {}) {
+  let response = await api.get(url, config);
+  const rows = [...response.data.results];
+  while (response.data.next) {
+    response = await api.get(response.data.next); // next 是完整 URL, 已包含查询参数
+    rows.push(...response.data.results);
+  }
+  return rows;
+}
+
+export default api;
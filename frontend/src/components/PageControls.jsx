@@ -0,0 +1,22 @@
+import React from 'react';
+import { Box, Button } from '@mui/material';
+
+// Previous / Next buttons for the cursor-paginated list endpoints ({ next, previous, results }).
+// `previous` and `next` are the page URLs from the last response; onNavigate loads one of them.
+function PageControls({ previous, next, onNavigate }) {
+  if (!previous && !next) {
+    return null; // everything fits on one page
+  }
+  return (
+    <Box sx={{ display: 'flex', justifyContent: 'space-between', mt: 2 }}>
+      <Button disabled={!previous} onClick={() => onNavigate(previous)}>
+        Previous
+      </Button>
+      <Button disabled={!next} onClick={() => onNavigate(next)}>
+        Next
+      </Button>
+    </Box>
+  );
+}
+
+export default PageControls;
@@ -10,11 +10,14 @@ import DeleteIcon from '@mui/icons-material/Delete';
 import AddIcon from '@mui/icons-material/Add';
 import { useNavigate } from 'react-router-dom'; // For navigation
 import api from '../api'; // Import your wrapped Axios instance
+import PageControls from '../components/PageControls';
 
 function ClientsPage() {
   const [clients, setClients] = useState([]);
   const [loading, setLoading] = useState(true); // Loading state
   const [error, setError] = useState(null);     // Error message
+  const [pageUrl, setPageUrl] = useState('/clients'); // current page; next / previous links replace it
+  const [links, setLinks] = useState({ next: null, previous: null });
   const [deleteDialogOpen, setDeleteDialogOpen] = useState(false); // Control delete confirmation dialog
   const [clientToDelete, setClientToDelete] = useState(null); // Store the client to be deleted
   const navigate = useNavigate(); // Get navigation function
@@ -22,14 +25,15 @@ function ClientsPage() {
   // --- useEffect: Fetch client list when component loads ---
   useEffect(() => {
     fetchClients();
-  }, []); // Empty array means run only once on mount
+  }, [pageUrl]); // Refetch whenever Previous / Next moves to another page
 
   const fetchClients = async () => {
     setLoading(true); // Start loading
     setError(null);   // Clear previous errors
     try {
-      const response = await api.get('/clients'); // Call backend API to get client list
-      setClients(response.data); // Update client state
+      const response = await api.get(pageUrl); // Call backend API to get client list
+      setClients(response.data.results);
+      setLinks({ next: response.data.next, previous: response.data.previous });
     } catch (err) {
       console.error("Failed to fetch clients:", err);
       // Provide user-friendly error messages based on error type
@@ -136,6 +140,8 @@ function ClientsPage() {
         </List>
       )}
 
+      <PageControls previous={links.previous} next={links.next} onNavigate={setPageUrl} />
+
       {/* Delete confirmation dialog */}
       <Dialog
         open={deleteDialogOpen}
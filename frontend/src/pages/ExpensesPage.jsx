@@ -9,23 +9,27 @@ import AddIcon from '@mui/icons-material/Add';
 import ImageSearchIcon from '@mui/icons-material/ImageSearch';
 import { useNavigate } from 'react-router-dom';
 import api from '../api';
+import PageControls from '../components/PageControls';
 
 function ExpensesPage() {
   const [expenses, setExpenses] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [pageUrl, setPageUrl] = useState('/expenses'); // current page; next / previous links replace it
+  const [links, setLinks] = useState({ next: null, previous: null });
   const navigate = useNavigate();
 
   useEffect(() => {
     fetchExpenses();
-  }, []);
+  }, [pageUrl]);
 
   const fetchExpenses = async () => {
     setLoading(true);
     setError(null);
     try {
-      const response = await api.get('/expenses');
-      setExpenses(response.data);
+      const response = await api.get(pageUrl);
+      setExpenses(response.data.results);
+      setLinks({ next: response.data.next, previous: response.data.previous });
     } catch (err) {
       console.error("Failed to fetch expenses:", err);
       setError("Failed to load expense list.");
@@ -116,6 +120,8 @@ function ExpensesPage() {
           ))}
         </List>
       )}
+
+      <PageControls previous={links.previous} next={links.next} onNavigate={setPageUrl} />
     </Container>
   );
 }
@@ -6,7 +6,7 @@ import {
 import AddCircleIcon from '@mui/icons-material/AddCircle';
 import RemoveCircleIcon from '@mui/icons-material/RemoveCircle';
 import { useNavigate, useParams } from 'react-router-dom';
-import api from '../api';
+import api, { fetchAllPages } from '../api';
 
 function InvoiceFormPage() {
   const { id } = useParams();
@@ -28,8 +28,8 @@ function InvoiceFormPage() {
     // Fetch client list for dropdown menu
     const fetchClients = async () => {
       try {
-        const response = await api.get('/clients');
-        setClients(response.data);
+        // every client, not just the first page of the cursor-paginated list
+        setClients(await fetchAllPages('/clients', { params: { page_size: 500 } }));
       } catch (err) {
         console.error("Failed to fetch clients for dropdown:", err);
         setError("Failed to load client list. Please try again later.");
@@ -10,23 +10,27 @@ import DeleteIcon from '@mui/icons-material/Delete';
 import AddIcon from '@mui/icons-material/Add';
 import { useNavigate } from 'react-router-dom';
 import api from '../api';
+import PageControls from '../components/PageControls';
 
 function InvoicesPage() {
   const [invoices, setInvoices] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [pageUrl, setPageUrl] = useState('/invoices'); // current page; next / previous links replace it
+  const [links, setLinks] = useState({ next: null, previous: null });
   const navigate = useNavigate();
 
   useEffect(() => {
     fetchInvoices();
-  }, []);
+  }, [pageUrl]);
 
   const fetchInvoices = async () => {
     setLoading(true);
     setError(null);
     try {
-      const response = await api.get('/invoices');
-      setInvoices(response.data);
+      const response = await api.get(pageUrl);
+      setInvoices(response.data.results);
+      setLinks({ next: response.data.next, previous: response.data.previous });
     } catch (err) {
       console.error("Failed to fetch invoices:", err);
       setError("Failed to load invoice list.");
@@ -107,6 +111,8 @@ function InvoicesPage() {
           ))}
         </List>
       )}
+
+      <PageControls previous={links.previous} next={links.next} onNavigate={setPageUrl} />
     </Container>
   );
 }
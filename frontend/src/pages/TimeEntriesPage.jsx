@@ -8,23 +8,27 @@ import DeleteIcon from '@mui/icons-material/Delete';
 import AddIcon from '@mui/icons-material/Add';
 import { useNavigate } from 'react-router-dom';
 import api from '../api';
+import PageControls from '../components/PageControls';
 
 function TimeEntriesPage() {
   const [timeEntries, setTimeEntries] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [pageUrl, setPageUrl] = useState('/time-entries'); // current page; next / previous links replace it
+  const [links, setLinks] = useState({ next: null, previous: null });
   const navigate = useNavigate();
 
   useEffect(() => {
     fetchTimeEntries();
-  }, []);
+  }, [pageUrl]);
 
   const fetchTimeEntries = async () => {
     setLoading(true);
     setError(null);
     try {
-      const response = await api.get('/time-entries');
-      setTimeEntries(response.data);
+      const response = await api.get(pageUrl);
+      setTimeEntries(response.data.results);
+      setLinks({ next: response.data.next, previous: response.data.previous });
     } catch (err) {
       console.error("Failed to fetch time entries:", err);
       setError("Failed to load time entries.");
@@ -105,6 +109,8 @@ function TimeEntriesPage() {
           ))}
         </List>
       )}
+
+      <PageControls previous={links.previous} next={links.next} onNavigate={setPageUrl} />
     </Container>
   );
 }
@@ -5,7 +5,7 @@ import {
   Container, Typography, TextField, Button, Box, CircularProgress, Alert, MenuItem
 } from '@mui/material';
 import { useNavigate, useParams } from 'react-router-dom';
-import api from '../api';
+import api, { fetchAllPages } from '../api';
 
 function TimeEntryFormPage() {
   const { id } = useParams();
@@ -27,8 +27,8 @@ function TimeEntryFormPage() {
     // Fetch client list for dropdown menu
     const fetchClients = async () => {
       try {
-        const response = await api.get('/clients');
-        setClients(response.data);
+        // every client, not just the first page of the cursor-paginated list
+        setClients(await fetchAllPages('/clients', { params: { page_size: 500 } }));
       } catch (err) {
         console.error("Failed to fetch clients for dropdown:", err);
         setError("Failed to load client list. Please try again later.");